@@ -7,78 +7,33 @@
 # Download AND update metadata automatically (default behavior)
 #       python quran_downloader.py --reciter_name "Mishari Rashid al-`Afasy"
 #       python quran_downloader.py --update_metadata --folder "Maher_al-Muaiqly"
+#
+# The reciter list is cached in cache/catalog/ (refetched in the background after a
+# week, --refresh refetches it now) and names are matched with the catalog_index
+# trigram index; requests, tqdm and mutagen are imported only by the commands that use them.
 
 
 import os
+import sys
 import argparse
-import requests
 from urllib.parse import quote
-from tqdm import tqdm
-import unicodedata
-import difflib
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3, TIT2, TALB, TPE1, TPE2, TRCK, APIC, ID3NoHeaderError
+
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from catalog_cache import cached_catalog
+from catalog_index import SOURCES, load_index
+from http_scheduler import get_scheduler
+from http_transport import get_session
+from audio_store import unshare
+from quran_metadata import ALBUM_TITLE, SURAH_NAMES_UZ, TOTAL_SURAHS, surah_title
+from uz_translit import to_latin
 
 # -------------------- CONSTANTS --------------------
 QA_API = "https://quranicaudio.com/api"
 QA_DOWNLOAD = "https://download.quranicaudio.com/quran/"
-TOTAL_SURAHS = 114
 COVER_IMAGE = "quran.png"  # Place your image in script folder
 
-# -------------------- SURAH NAMES --------------------
-SURAH_NAMES_UZ = [
-    "Fotiha","Baqara","Oli Imron","Niso","Moida","An'om","A'rof","Anfol","Tavba",
-    "Yunus","Hud","Yusuf","Ra'd","Ibrohim","Hijr","Nahl","Isro","Kahf","Maryam",
-    "Toho","Anbiyo","Haj","Mo'minun","Nur","Furqon","Shuaro","Naml","Qasos",
-    "Ankabut","Rum","Luqmon","Sajda","Ahzob","Saba'","Fotir","Yosin","Soffat",
-    "Sod","Zumar","G'ofir","Fussilat","Shuro","Zuxruf","Duxon","Josiya","Ahqof",
-    "Muhammad","Fath","Hujurot","Qof","Zoriyot","Tur","Najm","Qamar","Rahmon",
-    "Voqi'a","Hadid","Mujodala","Hashr","Mumtahana","Soff","Juma","Munofiqun",
-    "Tag'obun","Taloq","Tahrim","Mulk","Qalam","Haaqqa","Ma'orij","Nuh","Jin",
-    "Muzzammil","Muddassir","Qiyomat","Inson","Mursalot","Naba'","Nozi'ot",
-    "Abasa","Takvir","Infitor","Mutoffifun","Inshiqoq","Buruj","Toriq","A'lo",
-    "G'oshiya","Fajr","Balad","Shams","Layl","Zuho","Sharh","Tiyn","Alaq","Qadr",
-    "Bayyina","Zalzala","Odiyot","Qori'a","Takosur","Asr","Humaza","Fil","Quraysh",
-    "Mo'un","Kavsar","Kofirun","Nasr","Masad","Ixlos","Falaq","Nos"
-]
-
-SURAH_NAMES_EN = [
-    "Al-Fatihah","Al-Baqarah","Aal-E-Imran","An-Nisa","Al-Ma'idah","Al-An'am",
-    "Al-A'raf","Al-Anfal","At-Tawbah","Yunus","Hud","Yusuf","Ar-Ra'd","Ibrahim",
-    "Al-Hijr","An-Nahl","Al-Isra","Al-Kahf","Maryam","Ta-Ha","Al-Anbiya","Al-Hajj",
-    "Al-Mu'minun","An-Nur","Al-Furqan","Ash-Shu'ara","An-Naml","Al-Qasas",
-    "Al-Ankabut","Ar-Rum","Luqman","As-Sajdah","Al-Ahzab","Saba","Fatir","Ya-Sin",
-    "As-Saffat","Sad","Az-Zumar","Ghafir","Fussilat","Ash-Shura","Az-Zukhruf",
-    "Ad-Dukhan","Al-Jathiyah","Al-Ahqaf","Muhammad","Al-Fath","Al-Hujurat",
-    "Qaf","Adh-Dhariyat","At-Tur","An-Najm","Al-Qamar","Ar-Rahman","Al-Waqi'ah",
-    "Al-Hadid","Al-Mujadila","Al-Hashr","Al-Mumtahanah","As-Saff","Al-Jumu'ah",
-    "Al-Munafiqun","At-Taghabun","At-Talaq","At-Tahrim","Al-Mulk","Al-Qalam",
-    "Al-Haqqah","Al-Ma'arij","Nuh","Al-Jinn","Al-Muzzammil","Al-Muddaththir",
-    "Al-Qiyamah","Al-Insan","Al-Mursalat","An-Naba","An-Nazi'at","Abasa",
-    "At-Takwir","Al-Infitar","Al-Mutaffifin","Al-Inshiqaq","Al-Buruj","At-Tariq",
-    "Al-A'la","Al-Ghashiyah","Al-Fajr","Al-Balad","Ash-Shams","Al-Layl",
-    "Ad-Duha","Ash-Sharh","At-Tin","Al-Alaq","Al-Qadr","Al-Bayyinah",
-    "Az-Zalzalah","Al-Adiyat","Al-Qari'ah","At-Takathur","Al-Asr","Al-Humazah",
-    "Al-Fil","Quraysh","Al-Ma'un","Al-Kawthar","Al-Kafirun","An-Nasr",
-    "Al-Masad","Al-Ikhlas","Al-Falaq","An-Nas"
-]
-
-SURAH_NAMES_AR = [
-    "الفاتحة","البقرة","آل عمران","النساء","المائدة","الأنعام","الأعراف",
-    "الأنفال","التوبة","يونس","هود","يوسف","الرعد","إبراهيم","الحجر","النحل",
-    "الإسراء","الكهف","مريم","طه","الأنبياء","الحج","المؤمنون","النور","الفرقان",
-    "الشعراء","النمل","القصص","العنكبوت","الروم","لقمان","السجدة","الأحزاب",
-    "سبإ","فاطر","يس","الصافات","ص","الزمر","غافر","فصلت","الشورى","الزخرف",
-    "الدخان","الجاثية","الأحقاف","محمد","الفتح","الحجرات","ق","الذاريات",
-    "الطور","النجم","القمر","الرحمن","الواقعة","الحديد","المجادلة","الحشر",
-    "الممتحنة","الصف","الجمعة","المنافقون","التغابن","الطلاق","التحريم","الملك",
-    "القلم","الحاقة","المعارج","نوح","الجن","المزمل","المدثر","القيامة","الإنسان",
-    "المرسلات","النبأ","النازعات","عبس","التكوير","الإنفطار","المطففين",
-    "الإنشقاق","البروج","الطارق","الأعلى","الغاشية","الفجر","البلد","الشمس",
-    "الليل","الضحى","الشرح","التين","العلق","القدر","البينة","الزلزلة",
-    "العاديات","القارعة","التكاثر","العصر","الهمزة","الفيل","قريش","الماعون",
-    "الكوثر","الكافرون","النصر","المسد","الإخلاص","الفلق","الناس"
-]
+# Surah names (Uzbek / English / Arabic) come from quran_metadata
 
 # Tags that may contain personal information
 PERSONAL_INFO_TAGS = [
@@ -87,76 +42,53 @@ PERSONAL_INFO_TAGS = [
 ]
 
 # -------------------- LIST RECITERS --------------------
-def list_reciters():
-    """Display all available reciters from QuranicAudio API."""
-    response = requests.get(f"{QA_API}/qaris", timeout=15)
+def fetch_qaris_live():
+    response = get_scheduler().get(get_session(), f"{QA_API}/qaris", timeout=15)
     response.raise_for_status()
+    return response.json()
+
+def fetch_qaris(refresh=False):
+    """QuranicAudio reciter list, from the cache/catalog/ snapshot when it is fresh."""
+    return cached_catalog(SOURCES["qaris"]["snapshot"], fetch_qaris_live, refresh=refresh, background=True)
+
+def list_reciters(refresh=False):
+    """Display all available reciters from QuranicAudio API."""
     print("\nAvailable QuranicAudio Reciters:\n")
-    for r in response.json():
+    for r in fetch_qaris(refresh=refresh):
         print(f"- {r['name']}")
     print()
 
 # -------------------- GET RECITER BY NAME --------------------
-def get_reciter_by_name(reciter_name):
+def get_reciter_by_name(reciter_name, refresh=False):
     """
-    Find reciter information by name.
+    Find reciter information by name, using the on-disk name index
+    (exact match first, then the closest fuzzy match). No substring matching:
+    a short query like "ma" must not silently pick a reciter to download.
     
     Args:
         reciter_name: Name of the reciter to search for
+        refresh: Refetch the reciter list first
         
     Returns:
         Tuple of (reciter_name, relative_path)
     """
-    response = requests.get(f"{QA_API}/qaris", timeout=15)
-    response.raise_for_status()
+    index = load_index("qaris", fetch=fetch_qaris_live, refresh=refresh)
 
-    def _normalize(s):
-        if not s:
-            return ""
-        s = s.strip().lower()
-        # Normalize common quote/apostrophe variants to a simple apostrophe
-        for ch in ("`", "´", "’", "‘", "ʻ", "ʼ", "ʿ"):
-            s = s.replace(ch, "'")
-        # Remove diacritics
-        s = unicodedata.normalize("NFKD", s)
-        s = "".join(ch for ch in s if not unicodedata.combining(ch))
-        # Remove remaining punctuation except spaces and alphanumerics
-        s = "".join(ch for ch in s if ch.isalnum() or ch.isspace())
-        s = " ".join(s.split())
-        return s
-
-    items = []
-    norm_map = {}
-    for r in response.json():
-        name = r.get("name", "")
-        rel = r.get("relative_path")
-        n = _normalize(name)
-        items.append((name, rel, n))
-        norm_map[n] = (name, rel)
-
-    target = _normalize(reciter_name)
-
-    # Exact normalized match
-    if target in norm_map:
-        name, rel = norm_map[target]
-        if not rel:
-            raise ValueError(f"Reciter '{name}' has no downloadable audio.")
-        return name, rel
-
-    # Fuzzy match: try to suggest/auto-select closest reciter
-    normalized_keys = [n for (_, _, n) in items]
-    close = difflib.get_close_matches(target, normalized_keys, n=1, cutoff=0.6)
-    if close:
-        matched_norm = close[0]
-        matched_name, matched_rel = norm_map[matched_norm]
-        if not matched_rel:
-            raise ValueError(f"Reciter '{matched_name}' has no downloadable audio.")
-        print(f"Using closest match for reciter: '{matched_name}' (requested: '{reciter_name}')")
-        return matched_name, matched_rel
+    entry = index.exact(reciter_name)
+    if entry is None:
+        # Fuzzy match: auto-select the closest reciter
+        close = index.search(reciter_name, limit=1, cutoff=0.6)
+        if close:
+            entry = close[0][1]
+            print(f"Using closest match for reciter: '{entry['name']}' (requested: '{reciter_name}')")
+
+    if entry is not None:
+        if not entry.get("relative_path"):
+            raise ValueError(f"Reciter '{entry['name']}' has no downloadable audio.")
+        return entry["name"], entry["relative_path"]
 
     # If nothing found, prepare helpful error with suggestions
-    suggestions = difflib.get_close_matches(target, normalized_keys, n=5, cutoff=0.4)
-    suggestion_names = [norm_map[s][0] for s in suggestions]
+    suggestion_names = [e["name"] for _, e in index.search(reciter_name, limit=5, cutoff=0.4)]
     suggestion_text = "\n".join(f"- {n}" for n in suggestion_names) if suggestion_names else ""
 
     raise ValueError(
@@ -175,6 +107,10 @@ def tag_mp3_simple(file_path, surah_no, reciter):
         surah_no: Surah number (1-114)
         reciter: Name of the reciter
     """
+    from mutagen.mp3 import MP3
+    from mutagen.id3 import ID3, TIT2, TALB, TPE1, TRCK, APIC
+
+    unshare(file_path)  # a file added to the audio store by hand gets its own copy before tagging
     audio = MP3(file_path, ID3=ID3)
     if audio.tags is None:
         audio.add_tags()
@@ -182,7 +118,7 @@ def tag_mp3_simple(file_path, surah_no, reciter):
     # Title / Artist / Album / Track
     title = f"{surah_no:03}. {SURAH_NAMES_UZ[surah_no - 1]} surasi – Quroni Karim"
     audio.tags.add(TIT2(encoding=3, text=title))
-    audio.tags.add(TPE1(encoding=3, text=reciter))
+    audio.tags.add(TPE1(encoding=3, text=to_latin(reciter)))
     audio.tags.add(TALB(encoding=3, text="Quroni Karim"))
     audio.tags.add(TRCK(encoding=3, text=f"{surah_no}/114"))
 
@@ -205,6 +141,35 @@ def tag_mp3_simple(file_path, surah_no, reciter):
     audio.save()
 
 # -------------------- DOWNLOAD --------------------
+def download_surah(url, file_path, surah_no, reciter):
+    """
+    Download one surah through the shared request scheduler (rate limited,
+    retries 429/5xx). Returns True on success.
+    """
+    import requests
+
+    try:
+        r = get_scheduler().get(get_session(), url, stream=True, timeout=20)
+        if r.status_code != 200:
+            r.close()
+            print(f"Failed: {os.path.basename(file_path)} (HTTP {r.status_code})")
+            return False
+        # Write to a temporary name so an interrupted download is retried next run
+        tmp_path = file_path + ".part"
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in r.iter_content(8192):
+                    if chunk:
+                        f.write(chunk)
+        finally:
+            r.close()
+        os.replace(tmp_path, file_path)
+    except requests.RequestException as e:
+        print(f"Failed: {os.path.basename(file_path)} ({e})")
+        return False
+    tag_mp3_simple(file_path, surah_no, reciter)
+    return True
+
 def download_quran(reciter_name, relative_path, auto_update_metadata=True):
     """
     Download all 114 Surahs for a given reciter.
@@ -214,6 +179,8 @@ def download_quran(reciter_name, relative_path, auto_update_metadata=True):
         relative_path: Relative path for downloads from QuranicAudio
         auto_update_metadata: Automatically update metadata after download
     """
+    from tqdm import tqdm
+
     folder = reciter_name.replace(" ", "_")
     os.makedirs(folder, exist_ok=True)
     base_url = QA_DOWNLOAD + quote(relative_path)
@@ -222,6 +189,7 @@ def download_quran(reciter_name, relative_path, auto_update_metadata=True):
     print(f"Reciter: {reciter_name}")
     print(f"Folder : {folder}\n")
 
+    failed = []
     for i in tqdm(range(1, TOTAL_SURAHS + 1), desc="Downloading"):
         file_name = f"{i:03}.mp3"
         file_path = os.path.join(folder, file_name)
@@ -230,15 +198,23 @@ def download_quran(reciter_name, relative_path, auto_update_metadata=True):
         if os.path.exists(file_path):
             continue
 
-        r = requests.get(url, stream=True, timeout=20)
-        if r.status_code == 200:
-            with open(file_path, "wb") as f:
-                for chunk in r.iter_content(8192):
-                    if chunk:
-                        f.write(chunk)
-            tag_mp3_simple(file_path, i, reciter_name)
-        else:
-            print(f"Failed: {file_name}")
+        if not download_surah(url, file_path, i, reciter_name):
+            failed.append(i)
+
+    # Retry queue: give failed surahs one more pass once the host has had time to recover
+    if failed:
+        print(f"\n🔁 Retrying {len(failed)} failed download(s)...")
+        failed = [
+            i for i in failed
+            if not download_surah(base_url + f"{i:03}.mp3", os.path.join(folder, f"{i:03}.mp3"), i, reciter_name)
+        ]
+
+    for host in get_scheduler().summary():
+        print(f"📊 {host['host']}: {host['requests']} requests, {host['retries']} retries, {host['throttled']} throttled")
+    if failed:
+        print(f"❌ Still missing: {', '.join(f'{i:03}.mp3' for i in failed)}")
+        print("💡 Run the same command again to resume.")
+        return
 
     print(f"\n✅ Download completed! Files saved in: {folder}")
     
@@ -267,13 +243,18 @@ def update_metadata(folder, remove_comments=True, remove_personal_tags=True):
         remove_comments: Remove comment tags that may contain website/personal info
         remove_personal_tags: Remove tags that may contain owner/computer info
     """
+    from tqdm import tqdm
+    from mutagen.mp3 import MP3
+    from mutagen.id3 import ID3, TIT2, TALB, TPE1, TPE2, TRCK, APIC, ID3NoHeaderError
+
     if not os.path.exists(COVER_IMAGE):
         raise FileNotFoundError("Cover image 'quran.png' not found.")
 
     if not os.path.isdir(folder):
         raise NotADirectoryError("Provided folder does not exist.")
 
-    reciter_name = os.path.basename(folder).replace("_", " ").strip()
+    # Folder names typed in Uzbek Cyrillic are tagged in Latin like the titles
+    reciter_name = to_latin(os.path.basename(folder).replace("_", " ").strip())
 
     mp3_files = sorted(
         (f for f in os.listdir(folder) if f.lower().endswith(".mp3")),
@@ -292,6 +273,7 @@ def update_metadata(folder, remove_comments=True, remove_personal_tags=True):
     for index, file_name in enumerate(tqdm(mp3_files, desc="Processing"), start=1):
         file_path = os.path.join(folder, file_name)
 
+        unshare(file_path)
         try:
             audio = MP3(file_path, ID3=ID3)
         except ID3NoHeaderError:
@@ -315,16 +297,12 @@ def update_metadata(folder, remove_comments=True, remove_personal_tags=True):
                     pass
 
         # Add clean multilingual metadata
-        title = (
-            f"{index:03}. {SURAH_NAMES_EN[index-1]} | "
-            f"{SURAH_NAMES_UZ[index-1]} surasi | "
-            f"{SURAH_NAMES_AR[index-1]}"
-        )
+        title = surah_title(index)
 
         audio.tags.add(TIT2(encoding=3, text=title))
         audio.tags.add(TPE1(encoding=3, text=reciter_name))
         audio.tags.add(TPE2(encoding=3, text=reciter_name))
-        audio.tags.add(TALB(encoding=3, text="The Holy Qur'an | Quroni Karim | القرآن الكريم"))
+        audio.tags.add(TALB(encoding=3, text=ALBUM_TITLE))
         audio.tags.add(TRCK(encoding=3, text=f"{index}/{TOTAL_SURAHS}"))
 
         # Add cover art
@@ -362,6 +340,8 @@ def main():
                        help="Download Quran by reciter name (e.g. 'Maher al-Muaiqly')")
     parser.add_argument("--skip-metadata-update", action="store_true",
                        help="Skip automatic metadata update after download")
+    parser.add_argument("--refresh", action="store_true",
+                       help="Refetch the reciter list instead of using the cached copy in cache/catalog/")
     
     # Metadata update options
     parser.add_argument("--update_metadata", action="store_true",
@@ -377,12 +357,12 @@ def main():
 
     # List reciters
     if args.reciters:
-        list_reciters()
+        list_reciters(refresh=args.refresh)
         return
 
     # Download Quran
     if args.reciter_name:
-        name, path = get_reciter_by_name(args.reciter_name)
+        name, path = get_reciter_by_name(args.reciter_name, refresh=args.refresh)
         download_quran(name, path, auto_update_metadata=not args.skip_metadata_update)
         return
 
@@ -1,6 +1,7 @@
 # python update_metadata.py --folder C:\Quran\quran-subtitle-generator\output\Abu_Bakr_al_Shatri
 
 import os
+import sys
 import argparse
 from mutagen.mp3 import MP3
 from mutagen.id3 import (
@@ -9,64 +10,14 @@ from mutagen.id3 import (
 )
 from tqdm import tqdm
 
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from audio_store import unshare
+from quran_metadata import ALBUM_TITLE, TOTAL_SURAHS, surah_title
+
 # -------------------- CONSTANTS --------------------
-TOTAL_SURAHS = 114
 COVER_IMAGE = "quran.png"
 
-SURAH_NAMES_UZ = [
-    "Fotiha","Baqara","Oli Imron","Niso","Moida","Anʼom","Aʼrof","Anfol","Tavba",
-    "Yunus","Hud","Yusuf","Raʼd","Ibrohim","Hijr","Nahl","Isro","Kahf","Maryam",
-    "Toho","Anbiyo","Haj","Moʼminun","Nur","Furqon","Shuaro","Naml","Qasos",
-    "Ankabut","Rum","Luqmon","Sajda","Ahzob","Sabaʼ","Fotir","Yosin","Soffat",
-    "Sod","Zumar","Gʼofir","Fussilat","Shuro","Zuxruf","Duxon","Josiya","Ahqof",
-    "Muhammad","Fath","Hujurot","Qof","Zoriyot","Tur","Najm","Qamar","Rahmon",
-    "Voqiʼa","Hadid","Mujodala","Hashr","Mumtahana","Soff","Juma","Munofiqun",
-    "Tagʼobun","Taloq","Tahrim","Mulk","Qalam","Haaqqa","Maʼorij","Nuh","Jin",
-    "Muzzammil","Muddassir","Qiyomat","Inson","Mursalot","Nabaʼ","Noziʼot",
-    "Abasa","Takvir","Infitor","Mutoffifun","Inshiqoq","Buruj","Toriq","Aʼlo",
-    "Gʼoshiya","Fajr","Balad","Shams","Layl","Zuho","Sharh","Tiyn","Alaq","Qadr",
-    "Bayyina","Zalzala","Odiyot","Qoriʼa","Takosur","Asr","Humaza","Fil","Quraysh",
-    "Moʼun","Kavsar","Kofirun","Nasr","Masad","Ixlos","Falaq","Nos"
-]
-
-SURAH_NAMES_EN = [
-    "Al-Fatihah","Al-Baqarah","Aal-E-Imran","An-Nisa","Al-Ma'idah","Al-An'am",
-    "Al-A'raf","Al-Anfal","At-Tawbah","Yunus","Hud","Yusuf","Ar-Ra'd","Ibrahim",
-    "Al-Hijr","An-Nahl","Al-Isra","Al-Kahf","Maryam","Ta-Ha","Al-Anbiya","Al-Hajj",
-    "Al-Mu'minun","An-Nur","Al-Furqan","Ash-Shu'ara","An-Naml","Al-Qasas",
-    "Al-Ankabut","Ar-Rum","Luqman","As-Sajdah","Al-Ahzab","Saba","Fatir","Ya-Sin",
-    "As-Saffat","Sad","Az-Zumar","Ghafir","Fussilat","Ash-Shura","Az-Zukhruf",
-    "Ad-Dukhan","Al-Jathiyah","Al-Ahqaf","Muhammad","Al-Fath","Al-Hujurat",
-    "Qaf","Adh-Dhariyat","At-Tur","An-Najm","Al-Qamar","Ar-Rahman","Al-Waqi'ah",
-    "Al-Hadid","Al-Mujadila","Al-Hashr","Al-Mumtahanah","As-Saff","Al-Jumu'ah",
-    "Al-Munafiqun","At-Taghabun","At-Talaq","At-Tahrim","Al-Mulk","Al-Qalam",
-    "Al-Haqqah","Al-Ma'arij","Nuh","Al-Jinn","Al-Muzzammil","Al-Muddaththir",
-    "Al-Qiyamah","Al-Insan","Al-Mursalat","An-Naba","An-Nazi'at","Abasa",
-    "At-Takwir","Al-Infitar","Al-Mutaffifin","Al-Inshiqaq","Al-Buruj","At-Tariq",
-    "Al-A'la","Al-Ghashiyah","Al-Fajr","Al-Balad","Ash-Shams","Al-Layl",
-    "Ad-Duha","Ash-Sharh","At-Tin","Al-Alaq","Al-Qadr","Al-Bayyinah",
-    "Az-Zalzalah","Al-Adiyat","Al-Qari'ah","At-Takathur","Al-Asr","Al-Humazah",
-    "Al-Fil","Quraysh","Al-Ma'un","Al-Kawthar","Al-Kafirun","An-Nasr",
-    "Al-Masad","Al-Ikhlas","Al-Falaq","An-Nas"
-]
-
-SURAH_NAMES_AR = [
-    "الفاتحة","البقرة","آل عمران","النساء","المائدة","الأنعام","الأعراف",
-    "الأنفال","التوبة","يونس","هود","يوسف","الرعد","إبراهيم","الحجر","النحل",
-    "الإسراء","الكهف","مريم","طه","الأنبياء","الحج","المؤمنون","النور","الفرقان",
-    "الشعراء","النمل","القصص","العنكبوت","الروم","لقمان","السجدة","الأحزاب",
-    "سبإ","فاطر","يس","الصافات","ص","الزمر","غافر","فصلت","الشورى","الزخرف",
-    "الدخان","الجاثية","الأحقاف","محمد","الفتح","الحجرات","ق","الذاريات",
-    "الطور","النجم","القمر","الرحمن","الواقعة","الحديد","المجادلة","الحشر",
-    "الممتحنة","الصف","الجمعة","المنافقون","التغابن","الطلاق","التحريم","الملك",
-    "القلم","الحاقة","المعارج","نوح","الجن","المزمل","المدثر","القيامة","الإنسان",
-    "المرسلات","النبأ","النازعات","عبس","التكوير","الإنفطار","المطففين",
-    "الإنشقاق","البروج","الطارق","الأعلى","الغاشية","الفجر","البلد","الشمس",
-    "الليل","الضحى","الشرح","التين","العلق","القدر","البينة","الزلزلة",
-    "العاديات","القارعة","التكاثر","العصر","الهمزة","الفيل","قريش","الماعون",
-    "الكوثر","الكافرون","النصر","المسد","الإخلاص","الفلق","الناس"
-]
-
 # Tags that may contain personal information
 PERSONAL_INFO_TAGS = [
     'TOFN',  # Original filename
@@ -122,6 +73,7 @@ def update_metadata(folder, remove_comments=True, remove_personal_tags=True):
     for index, file_name in enumerate(tqdm(mp3_files, desc="Processing"), start=1):
         file_path = os.path.join(folder, file_name)
 
+        unshare(file_path)  # files linked from the audio store get their own copy before tagging
         try:
             audio = MP3(file_path, ID3=ID3)
         except ID3NoHeaderError:
@@ -145,16 +97,12 @@ def update_metadata(folder, remove_comments=True, remove_personal_tags=True):
                     pass  # Tag doesn't exist, skip
 
         # Add clean metadata
-        title = (
-            f"{index:03}. {SURAH_NAMES_EN[index-1]} | "
-            f"{SURAH_NAMES_UZ[index-1]} surasi | "
-            f"{SURAH_NAMES_AR[index-1]}"
-        )
+        title = surah_title(index)
 
         audio.tags.add(TIT2(encoding=3, text=title))
         audio.tags.add(TPE1(encoding=3, text=reciter_name))
         audio.tags.add(TPE2(encoding=3, text=reciter_name))
-        audio.tags.add(TALB(encoding=3, text="The Holy Qur'an | Quroni Karim | القرآن الكريم"))
+        audio.tags.add(TALB(encoding=3, text=ALBUM_TITLE))
         audio.tags.add(TRCK(encoding=3, text=f"{index}/{TOTAL_SURAHS}"))
 
         # Add cover art
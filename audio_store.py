@@ -0,0 +1,311 @@
+# Content-addressed audio store: one copy of every MP3 on disk, linked into each layout.
+#
+# Usage:
+#   python quran_srt_generator.py --all --reciter 7 --download-audio --audio-store
+#   python capcut_template_generator.py --audio-store
+#   python audio_store.py --add output/Mishari_Rashid_al_Afasy/audio
+#   python audio_store.py --stats
+#   python audio_store.py --gc --dry-run
+#
+# Layout (default cache/audio_store/):
+#   blobs/<ab>/<sha256>.<ext>   file contents, named by their SHA-256
+#   urls/<sha1 of URL>          "<sha256>\n<url>" for every downloaded URL
+#   links/<sha1 of view path>   "<sha256>\n<view path>" for symlinked views
+#
+# Consumers see ordinary files (output/<reciter>/audio/001.mp3, CapCut project
+# media) that are hardlinks to a blob, or symlinks when the store is on another
+# filesystem. Downloads look the URL up first and link the blob instead of
+# fetching it again. Code that edits audio in place (tag writers) calls
+# unshare() first so the shared blob never changes. --gc deletes blobs no view
+# links to any more. Telegram folders are left out: every file there is retagged
+# right after download, so its bytes would never stay shared.
+
+import argparse
+import hashlib
+import os
+import shutil
+import stat
+import time
+
+from file_lock import unique_tmp_path
+
+# ======================================================
+# CONFIG
+# ======================================================
+STORE_DIR = os.path.join("cache", "audio_store")
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".aac", ".opus", ".ogg", ".flac", ".wav")
+HASH_BLOCK = 1 << 20
+GC_GRACE_SECONDS = 3600   # blobs added within this window are never collected (a link may be in flight)
+
+# ======================================================
+# HELPERS
+# ======================================================
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def _write_record(path: str, sha256: str, value: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = unique_tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(f"{sha256}\n{value}\n")
+    os.replace(tmp_path, path)
+
+def _ext(name: str) -> str:
+    return os.path.splitext(name.split("?")[0])[1].lower() or ".mp3"
+
+def _blob_sha256(blob: str) -> str:
+    return os.path.splitext(os.path.basename(blob))[0]
+
+def _read_record(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            sha256, _, value = f.read().partition("\n")
+    except OSError:
+        return None, None
+    return sha256.strip(), value.strip()
+
+def _make_replaceable(path: str):
+    """Clear a read-only bit on `path` so os.replace onto it also works on Windows."""
+    if os.path.exists(path) and not os.path.islink(path):
+        mode = os.stat(path).st_mode
+        if not mode & stat.S_IWUSR:
+            os.chmod(path, mode | stat.S_IWUSR)
+
+def unshare(path: str) -> bool:
+    """
+    Give `path` its own writable copy if it is a store view (a symlink or a file
+    with other hardlinks), so it can be edited in place. Returns True if copied.
+    """
+    if not os.path.islink(path):
+        st = os.stat(path)
+        if st.st_nlink < 2 and st.st_mode & stat.S_IWUSR:
+            return False
+    tmp_path = unique_tmp_path(path)
+    shutil.copyfile(path, tmp_path)
+    _make_replaceable(path)
+    os.replace(tmp_path, path)
+    return True
+
+# ======================================================
+# STORE
+# ======================================================
+
+class AudioStore:
+    """Blob store rooted at `root`; every method is safe to call from several processes at once."""
+
+    def __init__(self, root: str = STORE_DIR, symlinks: bool = False):
+        self.root = root
+        self.symlinks = symlinks  # always symlink views instead of trying a hardlink first
+        for sub in ("blobs", "urls", "links"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    def describe(self) -> str:
+        return f"audio store {self.root}"
+
+    def blob_path(self, sha256: str, ext: str = ".mp3") -> str:
+        return os.path.join(self.root, "blobs", sha256[:2], sha256 + ext)
+
+    def _url_record(self, url: str) -> str:
+        from local_source import audio_key
+
+        return os.path.join(self.root, "urls", _key(audio_key(url)))
+
+    def lookup_url(self, url: str):
+        """Blob path for a previously downloaded URL, or None."""
+        sha256, _ = _read_record(self._url_record(url))
+        if not sha256:
+            return None
+        blob = self.blob_path(sha256, _ext(url))
+        return blob if os.path.exists(blob) else None
+
+    def link(self, blob: str, dst: str) -> str:
+        """Replace `dst` with a view of `blob`: a hardlink, or a symlink across filesystems."""
+        os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+        tmp_path = unique_tmp_path(dst)
+        if not self.symlinks:
+            try:
+                os.link(blob, tmp_path)
+                _make_replaceable(dst)
+                os.replace(tmp_path, dst)
+                return "hardlink"
+            except OSError:
+                pass
+        os.symlink(os.path.abspath(blob), tmp_path)
+        view = os.path.abspath(dst)
+        _write_record(os.path.join(self.root, "links", _key(view)), _blob_sha256(blob), view)
+        _make_replaceable(dst)
+        os.replace(tmp_path, dst)
+        return "symlink"
+
+    def add(self, path: str, url: str = None) -> str:
+        """Move `path` into the store (deduplicated), leave a view in its place and return its SHA-256."""
+        path_real = os.path.realpath(path)
+        sha256 = file_sha256(path_real)
+        blob = self.blob_path(sha256, _ext(path))
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            tmp_path = unique_tmp_path(blob)
+            # Same filesystem: the file itself becomes the blob. Its mode is left
+            # alone (a read-only bit would be shared by every view); unshare()
+            # is what keeps tag writers off the blob.
+            try:
+                os.link(path_real, tmp_path)
+            except OSError:
+                shutil.copyfile(path_real, tmp_path)
+            os.replace(tmp_path, blob)
+        if url:
+            _write_record(self._url_record(url), sha256, url)
+        if not os.path.samefile(path, blob) or (self.symlinks and not os.path.islink(path)):
+            self.link(blob, path)
+        return sha256
+
+    def copy(self, src: str, dst: str) -> str:
+        """Make `dst` a view of `src`'s content, adding it to the store if it is new (`src` is left as is)."""
+        blob = self.blob_path(file_sha256(src), _ext(src))
+        if os.path.exists(blob):
+            self.link(blob, dst)
+        else:
+            shutil.copy2(src, dst)
+            self.add(dst)
+        return dst
+
+    def fetch(self, url: str, dst: str) -> bool:
+        """Link a stored download of `url` to `dst`; False if the URL was never stored."""
+        blob = self.lookup_url(url)
+        if blob is None:
+            return False
+        self.link(blob, dst)
+        return True
+
+    # ------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------
+
+    def iter_blobs(self):
+        blobs_dir = os.path.join(self.root, "blobs")
+        for prefix in sorted(os.listdir(blobs_dir)):
+            folder = os.path.join(blobs_dir, prefix)
+            for name in sorted(os.listdir(folder)):
+                if not name.endswith(".tmp"):
+                    yield os.path.join(folder, name)
+
+    def symlinked_blobs(self, prune: bool = False) -> dict:
+        """{blob path: symlink view count}; records whose view is gone are deleted with prune=True."""
+        counts = {}
+        links_dir = os.path.join(self.root, "links")
+        for name in os.listdir(links_dir):
+            record = os.path.join(links_dir, name)
+            _, view = _read_record(record)
+            target = os.path.realpath(view) if view and os.path.islink(view) else None
+            if target and os.path.exists(target) and os.path.commonpath([target, os.path.realpath(self.root)]) == os.path.realpath(self.root):
+                counts[target] = counts.get(target, 0) + 1
+            elif prune:
+                os.remove(record)
+        return counts
+
+    def stats(self) -> dict:
+        symlinked = self.symlinked_blobs()
+        blobs = views = stored = saved = 0
+        for blob in self.iter_blobs():
+            st = os.stat(blob)
+            links = st.st_nlink - 1 + symlinked.get(os.path.realpath(blob), 0)
+            blobs += 1
+            views += links
+            stored += st.st_size
+            saved += st.st_size * max(0, links - 1)
+        urls = len(os.listdir(os.path.join(self.root, "urls")))
+        return {"blobs": blobs, "views": views, "urls": urls, "bytes": stored, "saved_bytes": saved}
+
+    def gc(self, dry_run: bool = False, grace_seconds: float = GC_GRACE_SECONDS):
+        """Delete blobs without views (and URL records pointing at them); returns (blobs, bytes)."""
+        symlinked = self.symlinked_blobs(prune=not dry_run)
+        now, removed, freed = time.time(), 0, 0
+        for blob in self.iter_blobs():
+            st = os.stat(blob)
+            if st.st_nlink > 1 or os.path.realpath(blob) in symlinked or now - st.st_ctime < grace_seconds:
+                continue
+            removed += 1
+            freed += st.st_size
+            if not dry_run:
+                os.remove(blob)
+        if not dry_run:
+            urls_dir = os.path.join(self.root, "urls")
+            for name in os.listdir(urls_dir):
+                sha256, url = _read_record(os.path.join(urls_dir, name))
+                if not sha256 or not os.path.exists(self.blob_path(sha256, _ext(url))):
+                    os.remove(os.path.join(urls_dir, name))
+        return removed, freed
+
+# ======================================================
+# ACTIVE STORE
+# ======================================================
+
+_active_store = None
+
+def set_store(store):
+    """Make `store` the one downloads and project copies go through (None = plain files)."""
+    global _active_store
+    _active_store = store
+
+def get_store():
+    return _active_store
+
+def copy_or_link(src: str, dst: str):
+    """shutil.copytree copy_function: audio files become store views, everything else is copied."""
+    store = get_store()
+    if store is None or not src.lower().endswith(AUDIO_EXTENSIONS):
+        return shutil.copy2(src, dst)
+    return store.copy(src, dst)
+
+# ======================================================
+# CLI
+# ======================================================
+
+def add_folders(store: AudioStore, folders) -> int:
+    added = 0
+    for folder in folders:
+        for root, _, files in os.walk(folder):
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    store.add(os.path.join(root, name))
+                    added += 1
+        print(f"✅ {folder}: audio files now linked to the store")
+    return added
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate audio files into a content-addressed store.")
+    parser.add_argument("--store", default=STORE_DIR, help=f"Store directory (default: {STORE_DIR})")
+    parser.add_argument("--add", nargs="+", metavar="FOLDER", help="Move every audio file under these folders into the store")
+    parser.add_argument("--symlink", action="store_true", help="Use symlinks instead of hardlinks for --add")
+    parser.add_argument("--stats", action="store_true", help="Print blob, view and space-saved counts")
+    parser.add_argument("--gc", action="store_true", help="Delete blobs that no file links to any more")
+    parser.add_argument("--dry-run", action="store_true", help="With --gc: only report what would be deleted")
+    args = parser.parse_args()
+
+    if not (args.add or args.stats or args.gc):
+        parser.error("Nothing to do: give --add, --stats or --gc")
+    store = AudioStore(args.store, symlinks=args.symlink)
+    if args.add:
+        for folder in args.add:
+            if not os.path.isdir(folder):
+                parser.error(f"Folder not found: {folder}")
+        print(f"📦 {add_folders(store, args.add)} file(s) added to {store.root}")
+    if args.gc:
+        removed, freed = store.gc(dry_run=args.dry_run)
+        verb = "Would delete" if args.dry_run else "Deleted"
+        print(f"🗑️ {verb} {removed} unreferenced blob(s), {freed / 1048576:.1f} MB")
+    if args.stats:
+        s = store.stats()
+        print(f"📦 {s['blobs']} blob(s), {s['bytes'] / 1048576:.1f} MB stored, {s['views']} view(s), "
+              f"{s['urls']} known URL(s); {s['saved_bytes'] / 1048576:.1f} MB saved by sharing")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+# Single-file Quran audiobook: all surah MP3s joined frame by frame, with ID3 chapters.
+#
+# Install:
+#   python -m pip install mutagen
+#
+# Usage:
+#   python audiobook.py Telegram/Maher_al-Muaiqly
+#   python audiobook.py output/Mishari_Rashid_al_Afasy/audio --reciter 7 --ayahs
+#   python audiobook.py Telegram/Maher_al-Muaiqly --surahs 78-114 -o juz_amma.mp3
+#
+# The MPEG audio frames of 001.mp3 ... 114.mp3 are copied into one file without
+# re-encoding (tags, Xing/LAME headers and junk between frames are dropped) and a
+# new Xing/Info frame describes the whole result, so players show the right
+# length and can seek. Input files are scanned first (frame headers only), then
+# streamed into the output in fixed-size blocks: memory use does not grow with
+# the output.
+#
+# The ID3v2.3 tag carries one CHAP frame per surah titled like update_metadata's
+# track titles ("036. Ya-Sin | Yosin surasi | يس") under a top-level CTOC. With
+# --ayahs --reciter ID, every surah also gets a CTOC of per-ayah CHAP frames built
+# from the reciter's timing store (cache/timings/<id>.qts); the timings must come
+# from the same recordings as the folder.
+
+import argparse
+import os
+import time
+
+from description_generator import format_surah_ranges, stored_timings
+from file_lock import unique_tmp_path
+from quran_metadata import ALBUM_TITLE, TOTAL_SURAHS, parse_surah_list, surah_name, surah_title
+from timing_store import TIMING_STORE_DIR, TimingStore, store_path
+from uz_translit import to_latin
+
+# ======================================================
+# CONFIG
+# ======================================================
+AUDIOBOOK_DIR = os.path.join("output", "audiobooks")
+COPY_BLOCK = 1 << 20          # bytes per read while scanning and copying
+
+# MPEG audio Layer III frame header tables, indexed by the header's version bits
+# (0 = MPEG 2.5, 2 = MPEG 2, 3 = MPEG 1)
+BITRATES_KBPS = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+SAMPLES_PER_FRAME = {3: 1152, 2: 576, 0: 576}
+
+AYAH_TITLE = "{name} {surah}:{ayah}"
+
+# ======================================================
+# MP3 FRAMES
+# ======================================================
+
+_HEADERS = {}
+
+def parse_frame_header(b1: int, b2: int, b3: int):
+    """(frame_bytes, samples, sample_rate, bitrate_kbps, mono, version) for a Layer III header, or None."""
+    key = (b1 << 16) | (b2 << 8) | b3
+    if key in _HEADERS:
+        return _HEADERS[key]
+    info = None
+    version, layer = (b1 >> 3) & 3, (b1 >> 1) & 3
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+    if (b1 & 0xE0) == 0xE0 and version != 1 and layer == 1 and 0 < bitrate_index < 15 and rate_index < 3:
+        bitrate = BITRATES_KBPS[version][bitrate_index]
+        sample_rate = SAMPLE_RATES[version][rate_index]
+        samples = SAMPLES_PER_FRAME[version]
+        length = samples // 8 * bitrate * 1000 // sample_rate + ((b2 >> 1) & 1)
+        info = (length, samples, sample_rate, bitrate, (b3 >> 6) == 3, version)
+    _HEADERS[key] = info
+    return info
+
+def side_info_size(version: int, mono: bool) -> int:
+    if version == 3:
+        return 17 if mono else 32
+    return 9 if mono else 17
+
+def audio_bounds(f, size: int):
+    """(start, end) of the data between a leading ID3v2 tag and a trailing ID3v1 tag."""
+    start, end = 0, size
+    f.seek(0)
+    head = f.read(10)
+    if len(head) == 10 and head[:3] == b"ID3":
+        start = 10 + ((head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]) + (10 if head[5] & 0x10 else 0)
+    if size - start >= 128:
+        f.seek(size - 128)
+        if f.read(3) == b"TAG":
+            end = size - 128
+    return start, end
+
+def is_vbr_header_frame(frame: bytes, version: int, mono: bool) -> bool:
+    tag = 4 + side_info_size(version, mono)
+    return frame[tag:tag + 4] in (b"Xing", b"Info") or frame[36:40] == b"VBRI"
+
+def scan_mp3(path: str) -> dict:
+    """
+    Walk the frame headers of one MP3 (reading COPY_BLOCK bytes at a time).
+    Returns {"ranges": [(start, end)], "frames", "samples", "bytes", "sample_rate",
+    "bitrates", "header"} where the ranges cover the audio frames only.
+    """
+    ranges, frames, samples, total = [], 0, 0, 0
+    sample_rate, header, bitrates = None, None, set()
+    with open(path, "rb") as f:
+        pos, end = audio_bounds(f, os.fstat(f.fileno()).st_size)
+        buf, buf_pos = b"", pos
+        while pos + 4 <= end:
+            i = pos - buf_pos
+            if i + 4 > len(buf):
+                f.seek(pos)
+                buf, buf_pos, i = f.read(min(COPY_BLOCK, end - pos)), pos, 0
+                if len(buf) < 4:
+                    break
+            info = buf[i] == 0xFF and parse_frame_header(buf[i + 1], buf[i + 2], buf[i + 3])
+            if not info or pos + info[0] > end or (sample_rate and info[2] != sample_rate):
+                # Not a frame: resync at the next 0xFF byte
+                nxt = buf.find(b"\xff", i + 1)
+                pos = buf_pos + (nxt if nxt >= 0 else len(buf))
+                continue
+            length, frame_samples, rate, bitrate, mono, version = info
+            if header is None:
+                if i + length > len(buf):
+                    f.seek(pos)
+                    buf, buf_pos, i = f.read(min(COPY_BLOCK, end - pos)), pos, 0
+                header = buf[i:i + 4]
+                sample_rate = rate
+                if is_vbr_header_frame(buf[i:i + length], version, mono):
+                    pos += length
+                    continue
+            if ranges and ranges[-1][1] == pos:
+                ranges[-1][1] = pos + length
+            else:
+                ranges.append([pos, pos + length])
+            frames += 1
+            samples += frame_samples
+            total += length
+            bitrates.add(bitrate)
+            pos += length
+    if not frames:
+        raise ValueError(f"No MPEG Layer III frames in {path}")
+    return {"ranges": ranges, "frames": frames, "samples": samples, "bytes": total,
+            "sample_rate": sample_rate, "bitrates": bitrates, "header": header}
+
+def build_vbr_header_frame(header: bytes, frames: int, audio_bytes: int, cbr: bool) -> bytes:
+    """A silent first frame with a Xing (VBR) or Info (CBR) tag giving the frame and byte counts."""
+    b1, b2, b3 = header[1] | 1, header[2] & 0x0D, header[3]  # no CRC, no padding
+    version, mono = (b1 >> 3) & 3, (b3 >> 6) == 3
+    offset = 4 + side_info_size(version, mono)
+    for bitrate_index in range(1, 15):
+        b2_try = (bitrate_index << 4) | b2
+        length = parse_frame_header(b1, b2_try, b3)[0]
+        if length >= offset + 16:
+            break
+    frame = bytearray(length)
+    frame[:4] = bytes((0xFF, b1, b2_try, b3))
+    frame[offset:offset + 16] = (b"Info" if cbr else b"Xing") + (3).to_bytes(4, "big") + \
+        frames.to_bytes(4, "big") + (audio_bytes + length).to_bytes(4, "big")
+    return bytes(frame)
+
+def copy_ranges(src: str, ranges, out):
+    with open(src, "rb") as f:
+        for start, end in ranges:
+            f.seek(start)
+            remaining = end - start
+            while remaining:
+                block = f.read(min(COPY_BLOCK, remaining))
+                if not block:
+                    raise IOError(f"{src} shrank while copying")
+                out.write(block)
+                remaining -= len(block)
+
+# ======================================================
+# CHAPTERS
+# ======================================================
+
+def source_cover_and_artist(path: str):
+    """(APIC frame or None, TPE1 text or None) from an MP3's ID3 tag."""
+    from mutagen.id3 import ID3, ID3NoHeaderError
+
+    try:
+        tags = ID3(path)
+    except ID3NoHeaderError:
+        return None, None
+    covers, artists = tags.getall("APIC"), tags.getall("TPE1")
+    return (covers[0] if covers else None), (str(artists[0].text[0]) if artists else None)
+
+def ayah_chapters(starts, surah_start: int, surah_end: int):
+    """[(start_ms, end_ms)] per ayah in the joined file; each ayah runs until the next begins."""
+    bounds = [surah_start] + [min(surah_start + int(s), surah_end) for s in starts[1:]] + [surah_end]
+    return [(bounds[i], max(bounds[i], bounds[i + 1])) for i in range(len(starts))]
+
+def build_tags(entries, reciter: str, cover, store: TimingStore = None):
+    """
+    ID3 tag for the audiobook. `entries` is [(surah, start_ms, end_ms)]; returns
+    (tags, ayah_chapter_count, surahs without timings).
+    """
+    from mutagen.id3 import (ID3, CHAP, CTOC, CTOCFlags, TALB, TIT2, TLEN, TPE1, TPE2)
+
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text=f"{ALBUM_TITLE} | {reciter}" if reciter else ALBUM_TITLE))
+    tags.add(TALB(encoding=3, text=ALBUM_TITLE))
+    if reciter:
+        tags.add(TPE1(encoding=3, text=reciter))
+        tags.add(TPE2(encoding=3, text=reciter))
+    tags.add(TLEN(encoding=3, text=str(entries[-1][2])))
+    if cover is not None:
+        tags.add(cover)
+
+    ayah_count, untimed = 0, []
+    for surah, start, end in entries:
+        tags.add(CHAP(element_id=f"s{surah:03}", start_time=start, end_time=end,
+                      sub_frames=[TIT2(encoding=3, text=surah_title(surah))]))
+        if store is None:
+            continue
+        timings = stored_timings(store, surah)
+        if timings is None:
+            untimed.append(surah)
+            continue
+        children = []
+        name = surah_name(surah, "en")
+        for ayah, (a_start, a_end) in enumerate(ayah_chapters(timings[0], start, end), start=1):
+            element_id = f"s{surah:03}a{ayah:03}"
+            tags.add(CHAP(element_id=element_id, start_time=a_start, end_time=a_end,
+                          sub_frames=[TIT2(encoding=3, text=AYAH_TITLE.format(name=name, surah=surah, ayah=ayah))]))
+            children.append(element_id)
+        tags.add(CTOC(element_id=f"toc{surah:03}", flags=CTOCFlags.ORDERED, child_element_ids=children,
+                      sub_frames=[TIT2(encoding=3, text=surah_title(surah))]))
+        ayah_count += len(children)
+
+    tags.add(CTOC(element_id="toc", flags=CTOCFlags.TOP_LEVEL | CTOCFlags.ORDERED,
+                  child_element_ids=[f"s{surah:03}" for surah, _, _ in entries],
+                  sub_frames=[TIT2(encoding=3, text=ALBUM_TITLE)]))
+    return tags, ayah_count, untimed
+
+# ======================================================
+# BUILD
+# ======================================================
+
+def build_audiobook(folder: str, output: str, surahs, reciter: str = None, store: TimingStore = None) -> dict:
+    missing = [s for s in surahs if not os.path.exists(os.path.join(folder, f"{s:03}.mp3"))]
+    if missing:
+        raise FileNotFoundError(f"Missing surah file(s) in {folder}: {format_surah_ranges(missing)}")
+
+    started = time.time()
+    scans, sample_rate = [], None
+    for surah in surahs:
+        scan = scan_mp3(os.path.join(folder, f"{surah:03}.mp3"))
+        if sample_rate and scan["sample_rate"] != sample_rate:
+            raise ValueError(f"{surah:03}.mp3 is {scan['sample_rate']} Hz, the others are {sample_rate} Hz; "
+                             f"frames with different sample rates cannot be joined without re-encoding")
+        sample_rate = scan["sample_rate"]
+        scans.append((surah, scan))
+    print(f"🔎 Scanned {len(scans)} file(s) in {time.time() - started:.1f}s")
+
+    entries, samples = [], 0
+    for surah, scan in scans:
+        start = samples * 1000 // sample_rate
+        samples += scan["samples"]
+        entries.append((surah, start, samples * 1000 // sample_rate))
+
+    cover, artist = source_cover_and_artist(os.path.join(folder, f"{surahs[0]:03}.mp3"))
+    if reciter is None:
+        reciter = artist or to_latin(os.path.basename(os.path.normpath(folder)).replace("_", " ").strip())
+    tags, ayah_count, untimed = build_tags(entries, reciter, cover, store)
+
+    frames = sum(scan["frames"] for _, scan in scans)
+    audio_bytes = sum(scan["bytes"] for _, scan in scans)
+    cbr = len(set().union(*(scan["bitrates"] for _, scan in scans))) == 1
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    tmp_path = unique_tmp_path(output)
+    try:
+        open(tmp_path, "wb").close()
+        tags.save(tmp_path, v1=0, v2_version=3)
+        with open(tmp_path, "ab") as out:
+            out.write(build_vbr_header_frame(scans[0][1]["header"], frames, audio_bytes, cbr))
+            for surah, scan in scans:
+                copy_ranges(os.path.join(folder, f"{surah:03}.mp3"), scan["ranges"], out)
+        os.replace(tmp_path, output)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {"surahs": len(entries), "ayah_chapters": ayah_count, "untimed": untimed,
+            "duration_ms": entries[-1][2], "seconds": time.time() - started}
+
+# ======================================================
+# CLI
+# ======================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Join surah MP3s into one chaptered audiobook without re-encoding.")
+    parser.add_argument("folder", help="Folder with 001.mp3 ... 114.mp3 (Telegram downloads, output/<reciter>/audio)")
+    parser.add_argument("-o", "--output", type=str, help=f"Output MP3 (default: {AUDIOBOOK_DIR}/<folder name>.mp3)")
+    parser.add_argument("--surahs", default=f"1-{TOTAL_SURAHS}", help="Surahs to include, e.g. 1-114 or 78-114")
+    parser.add_argument("--reciter-name", type=str, help="Artist tag (default: the first file's artist or the folder name)")
+    parser.add_argument("--ayahs", action="store_true", help="Add per-ayah chapters from the timing store (needs --reciter)")
+    parser.add_argument("--reciter", type=int, help="Reciter ID whose cache/timings/<id>.qts matches these recordings")
+    parser.add_argument("--store-dir", default=TIMING_STORE_DIR, help=f"Timing store directory (default: {TIMING_STORE_DIR})")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"Folder not found: {args.folder}")
+    try:
+        surahs = parse_surah_list(args.surahs)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.ayahs and args.reciter is None:
+        parser.error("--ayahs needs --reciter ID for the timing store")
+    if args.ayahs and not os.path.exists(store_path(args.reciter, args.store_dir)):
+        parser.error(f"No timing store for reciter {args.reciter}: run quran_srt_generator.py --all --reciter {args.reciter} first")
+    output = args.output or os.path.join(AUDIOBOOK_DIR, os.path.basename(os.path.normpath(args.folder)) + ".mp3")
+
+    store = TimingStore(store_path(args.reciter, args.store_dir)) if args.ayahs else None
+    try:
+        result = build_audiobook(args.folder, output, surahs, args.reciter_name, store)
+    except (FileNotFoundError, ValueError) as e:
+        parser.error(str(e))
+    finally:
+        if store is not None:
+            store.close()
+
+    hours, rem = divmod(result["duration_ms"] // 1000, 3600)
+    print(f"✅ {output}: {result['surahs']} surah chapters, {result['ayah_chapters']} ayah chapters, "
+          f"{hours}:{rem // 60:02}:{rem % 60:02}, {os.path.getsize(output) / 1048576:.1f} MB "
+          f"in {result['seconds']:.1f}s")
+    if result["untimed"]:
+        print(f"⚠️ No timings stored for surah(s) {format_surah_ranges(result['untimed'])}: surah chapters only")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# Startup-time benchmark for the command-line entry points.
+#
+# Runs each entry point under `python -X importtime` several times and reports
+# the median wall time, the median total import time, the slowest top-level
+# imports and whether heavy optional packages (requests, mutagen, tqdm, ...)
+# were loaded at all. Listing commands are measured as they run in production,
+# i.e. from the cache/catalog/ snapshots: run each listing once beforehand.
+#
+# Usage (from the repository root):
+#   python benchmarks/startup_importtime.py
+#   python benchmarks/startup_importtime.py --repeat 10 --json cache/bench/startup.json
+#   python benchmarks/startup_importtime.py --baseline cache/bench/startup.json --tolerance 0.2
+#
+# With --baseline the script exits with status 1 when an entry point got slower
+# than the baseline by more than --tolerance (and --min-delta ms), for CI.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# ======================================================
+# CONFIG
+# ======================================================
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (script relative to the repository root, arguments)
+ENTRY_POINTS = {
+    "generator-help": ("quran_srt_generator.py", ["--help"]),
+    "generator-list-reciters": ("quran_srt_generator.py", ["--list-reciters"]),
+    "generator-list-translations": ("quran_srt_generator.py", ["--list-translations"]),
+    "downloader-help": ("Telegram/quran_downloader.py", ["--help"]),
+    "downloader-reciters": ("Telegram/quran_downloader.py", ["--reciters"]),
+    "metadata-surah": ("quran_metadata.py", ["--surah", "36"]),
+    "timing-store-help": ("timing_store.py", ["--help"]),
+    "render-videos-help": ("render_videos.py", ["--help"]),
+}
+
+# Packages that no help / listing command should need
+HEAVY_MODULES = ("requests", "urllib3", "httpx", "mutagen", "tqdm", "PIL", "numpy", "sqlite3", "cProfile")
+
+DEFAULT_REPEAT = 5
+TOP_IMPORTS = 5
+
+# ======================================================
+# MEASUREMENT
+# ======================================================
+
+def parse_importtime(stderr: str):
+    """Return [(module, self_us, cumulative_us, depth)] from -X importtime output (depth 0 = top level)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+def run_once(script: str, args, cwd: str):
+    cmd = [sys.executable, "-X", "importtime", os.path.join(REPO_ROOT, script)] + list(args)
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          text=True, encoding="utf-8", errors="replace")
+    wall_ms = (time.perf_counter() - started) * 1000
+    return wall_ms, proc.returncode, parse_importtime(proc.stderr)
+
+def measure(name: str, script: str, args, cwd: str, repeat: int) -> dict:
+    walls, totals, last_rows, status = [], [], [], 0
+    for _ in range(repeat):
+        wall_ms, status, rows = run_once(script, args, cwd)
+        walls.append(wall_ms)
+        # Top-level cumulative times add up to the whole import phase
+        totals.append(sum(cum for _, _, cum, depth in rows if depth == 0) / 1000)
+        last_rows = rows
+    loaded = {module for module, *_ in last_rows}
+    top = sorted((r for r in last_rows if r[3] == 0), key=lambda r: -r[2])[:TOP_IMPORTS]
+    return {
+        "name": name,
+        "command": " ".join([script] + list(args)),
+        "exit_code": status,
+        "wall_ms": round(statistics.median(walls), 1),
+        "import_ms": round(statistics.median(totals), 1),
+        "heavy": sorted(m for m in HEAVY_MODULES if m in loaded),
+        "top_imports": [{"module": m, "ms": round(cum / 1000, 1)} for m, _, cum, _ in top],
+    }
+
+# ======================================================
+# REPORTING
+# ======================================================
+
+def print_report(results):
+    print(f"\n{'entry point':<28} {'wall ms':>8} {'import ms':>10}  heavy modules / slowest imports")
+    for r in results:
+        heavy = ",".join(r["heavy"]) or "-"
+        top = ", ".join(f"{t['module']} {t['ms']:.0f}" for t in r["top_imports"][:3])
+        flag = "" if r["exit_code"] == 0 else f"  (exit {r['exit_code']})"
+        print(f"{r['name']:<28} {r['wall_ms']:>8.1f} {r['import_ms']:>10.1f}  {heavy} | {top}{flag}")
+
+def compare(results, baseline_path: str, tolerance: float, min_delta: float) -> bool:
+    """Print regressions against a saved --json file; True if none exceed the tolerance."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    ok = True
+    for r in results:
+        old = baseline.get(r["name"])
+        if not old:
+            continue
+        delta = r["wall_ms"] - old["wall_ms"]
+        if delta > min_delta and r["wall_ms"] > old["wall_ms"] * (1 + tolerance):
+            ok = False
+            print(f"❌ {r['name']}: {old['wall_ms']:.1f} ms -> {r['wall_ms']:.1f} ms (+{delta:.1f} ms)")
+        new_heavy = set(r["heavy"]) - set(old.get("heavy", []))
+        if new_heavy:
+            ok = False
+            print(f"❌ {r['name']}: now imports {', '.join(sorted(new_heavy))}")
+    if ok:
+        print(f"✅ No startup regressions against {baseline_path}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI startup time with python -X importtime.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"Runs per entry point (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--only", type=str, help=f"Comma-separated entry points: {','.join(ENTRY_POINTS)}")
+    parser.add_argument("--cwd", type=str, default=os.getcwd(),
+                        help="Working directory for the runs (where cache/catalog/ lives; default: current)")
+    parser.add_argument("--json", type=str, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=str, help="Compare with a JSON file from an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown vs --baseline (default: 0.2)")
+    parser.add_argument("--min-delta", type=float, default=5.0, help="Ignore slowdowns below this many ms (default: 5)")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(ENTRY_POINTS)
+    unknown = [n for n in names if n not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"Unknown entry point(s): {', '.join(unknown)}")
+
+    results = []
+    for name in names:
+        script, script_args = ENTRY_POINTS[name]
+        print(f"⏱️ {name} ...", flush=True)
+        results.append(measure(name, script, script_args, args.cwd, max(1, args.repeat)))
+    print_report(results)
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "repeat": args.repeat, "results": results}, f, indent=2)
+        print(f"✅ Results: {args.json}")
+    if args.baseline and not compare(results, args.baseline, args.tolerance, args.min_delta):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Micro-benchmark for text_normalize on a whole translation (6,236 ayahs).
+#
+# Compares the old per-ayah cleanup (strip_html + five re.sub calls, what
+# quran_srt_generator.clean_translation_text did) with text_normalize.clean_text
+# per ayah and clean_batch over the whole translation, and the old
+# digit-by-digit Arabic ayah numbers with the AYAH_MARKERS table. Outputs are
+# checked to be identical first. Without --input a built-in sample with
+# Quran.com-style footnotes is repeated to 6,236 ayahs.
+#
+# Usage (from the repository root):
+#   python benchmarks/text_normalize_bench.py
+#   python benchmarks/text_normalize_bench.py --input translation.txt --repeat 10   # one ayah per line
+
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from text_normalize import clean_batch, clean_text, number_arabic
+
+# ======================================================
+# CONFIG
+# ======================================================
+SAMPLE = [
+    "In the Name of Allah—the Most Compassionate, Most Merciful.<sup foot_note=\"75290\">1</sup>",
+    "All praise is for Allah—Lord of all worlds [i.e. everything that exists].² ",
+    "<i class=\"s\">Those</i> who believe in the unseen, establish prayer (and donate from what We have provided for them). 3",
+    "Барча ҳамду санолар  оламларнинг Робби Аллоҳ учундир.¹ [Изоҳ: ушбу оятда…]",
+    "",
+]
+AYAHS = 6236
+ARABIC_SAMPLE = "بِسْمِ ٱللَّهِ ٱلرَّحْمَـٰنِ ٱلرَّحِيمِ"
+DEFAULT_REPEAT = 5
+
+# ======================================================
+# CANDIDATES
+# ======================================================
+
+def old_clean(text: str) -> str:
+    """Baseline: the previous implementation."""
+    if not text:
+        return ""
+    text = re.sub(r"<[^>]+>", "", text or "").strip()
+    text = re.sub(r"\[.*?\]", "", text)
+    text = re.sub(r"[¹²³⁴⁵⁶⁷⁸⁹⁰]+", "", text)
+    text = re.sub(r"\s*\d+\s*$", "", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+def old_per_ayah(texts):
+    return [old_clean(t) for t in texts]
+
+def clean_per_ayah(texts):
+    return [clean_text(t) for t in texts]
+
+def old_arabic(texts):
+    return [f"{t} ﴿{''.join(chr(0x0660 + int(d)) for d in str(i))}﴾" for i, t in enumerate(texts, start=1)]
+
+CANDIDATES = {
+    "translation": {
+        "strip_html + 5x re.sub (old)": old_per_ayah,
+        "clean_text per ayah": clean_per_ayah,
+        "clean_batch": clean_batch,
+    },
+    "arabic numbers": {
+        "digit by digit (old)": old_arabic,
+        "AYAH_MARKERS table": number_arabic,
+    },
+}
+
+# ======================================================
+# MEASUREMENT
+# ======================================================
+
+def time_call(func, texts, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(texts)
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark translation cleanup and Arabic ayah numbering.")
+    parser.add_argument("--input", type=str, help="UTF-8 text file, one ayah per line (default: built-in sample)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"Runs per candidate (default: {DEFAULT_REPEAT})")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, "r", encoding="utf-8") as f:
+            texts = f.read().splitlines()
+    else:
+        texts = (SAMPLE * (AYAHS // len(SAMPLE) + 1))[:AYAHS]
+    inputs = {"translation": texts, "arabic numbers": [ARABIC_SAMPLE] * len(texts)}
+
+    for group, funcs in CANDIDATES.items():
+        expected = None
+        for name, func in funcs.items():
+            out = func(inputs[group])
+            expected = expected if expected is not None else out
+            if out != expected:
+                print(f"❌ {name} output differs from the old implementation")
+                sys.exit(1)
+
+    print(f"📄 {len(texts):,} ayahs, median of {args.repeat} runs")
+    for group, funcs in CANDIDATES.items():
+        print(f"\n{group}")
+        baseline = None
+        for name, func in funcs.items():
+            seconds = time_call(func, inputs[group], max(1, args.repeat))
+            baseline = baseline or seconds
+            print(f"  {name:<30} {seconds * 1000:>8.2f} ms {len(texts) / seconds / 1e3:>8.0f}k ayah/s  x{baseline / seconds:.1f}")
+
+if __name__ == "__main__":
+    main()
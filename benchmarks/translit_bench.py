@@ -0,0 +1,90 @@
+# Micro-benchmark for uz_translit on translation-sized corpora.
+#
+# Compares the old per-character dict lookup + "".join (what
+# yt_playlist_descriptions.cyr_to_lat did) with uz_translit.to_latin (one regex
+# pass + str.translate) and with the streaming API on the same text, and
+# reports characters per second. Without --input a built-in Uzbek Cyrillic
+# sample is repeated up to --size characters.
+#
+# Usage (from the repository root):
+#   python benchmarks/translit_bench.py
+#   python benchmarks/translit_bench.py --input data/translation_uz_cyr.txt --repeat 10
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from uz_translit import UZ_CYR_TO_LAT, iter_to_latin, read_chunks, to_latin
+
+# ======================================================
+# CONFIG
+# ======================================================
+SAMPLE = (
+    "1. Бисмиллаҳир роҳманир роҳийм. Барча ҳамду санолар оламларнинг Робби Аллоҳ учундир. "
+    "Ер юзида юрган ва осмонда учган ҳар бир жонзот Унинг ризқидан ейди. "
+    "ЎША КУНИ ҳар бир жон қилган ишига яраша жазо олади, цирк ва концерт эмас, ҳаёт синовдир.\n"
+)
+DEFAULT_SIZE = 2_000_000   # characters
+DEFAULT_REPEAT = 5
+
+# ======================================================
+# CANDIDATES
+# ======================================================
+
+def per_char_join(text: str) -> str:
+    """Baseline: the previous implementation."""
+    return "".join(UZ_CYR_TO_LAT.get(c, c) for c in text)
+
+def streamed(text: str) -> str:
+    return "".join(iter_to_latin(read_chunks(io.StringIO(text))))
+
+CANDIDATES = {
+    "per-char join (old)": per_char_join,
+    "to_latin": to_latin,
+    "iter_to_latin (64k chunks)": streamed,
+}
+
+# ======================================================
+# MEASUREMENT
+# ======================================================
+
+def time_call(func, text: str, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(text)
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Uzbek Cyrillic → Latin transliteration.")
+    parser.add_argument("--input", type=str, help="UTF-8 text file to transliterate (default: built-in sample)")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE, help=f"Sample size in characters (default: {DEFAULT_SIZE})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"Runs per candidate (default: {DEFAULT_REPEAT})")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = (SAMPLE * (args.size // len(SAMPLE) + 1))[:args.size]
+
+    if streamed(text) != to_latin(text):
+        print("❌ Streaming output differs from to_latin")
+        sys.exit(1)
+
+    print(f"📄 {len(text):,} characters, median of {args.repeat} runs\n")
+    baseline = None
+    for name, func in CANDIDATES.items():
+        seconds = time_call(func, text, max(1, args.repeat))
+        baseline = baseline or seconds
+        print(f"{name:<28} {seconds * 1000:>9.1f} ms {len(text) / seconds / 1e6:>8.1f} Mchar/s  x{baseline / seconds:.1f}")
+
+if __name__ == "__main__":
+    main()
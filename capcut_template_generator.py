@@ -1,4 +1,6 @@
-# py capcut_template_generator.py   
+# py capcut_template_generator.py
+# py capcut_template_generator.py --loudness output/Mishari_Rashid_al_Afasy/audio   # also level the audio
+# py capcut_template_generator.py --audio-store   # project audio linked from cache/audio_store, not copied
 
 
 import os
@@ -9,6 +11,10 @@ import uuid
 import copy
 import argparse
 
+from audio_store import STORE_DIR as AUDIO_STORE_DIR, AudioStore, copy_or_link, set_store
+from loudness import load_report
+from uz_translit import to_latin
+
 # === CONFIG ===
 # If TEMPLATE_DIR is None the script attempts to auto-detect the CapCut projects
 # location using the %LOCALAPPDATA% environment variable. You can override the
@@ -24,47 +30,74 @@ BASE_TEMPLATE_FOLDER = "data/BASE_TEMPLATE"  # change this to your real folder n
 # If True, keep leading numbering from the names file (e.g. "1. Fatiha").
 # If False, numbers will be removed (default legacy behaviour).
 PRESERVE_NUMBERS = True
+# CapCut's volume slider stops at +20 dB
+MAX_VOLUME_DB = 20.0
 
 # =================
 
 def clean_name(name):
-    """Normalize name: optionally remove leading numbering and strip illegal chars."""
-    name = name.strip()
+    """Normalize name: Uzbek Cyrillic to Latin, optionally remove leading numbering, strip illegal chars."""
+    name = to_latin(name.strip())
     if not PRESERVE_NUMBERS:
         name = re.sub(r'^\d+\.\s*', '', name)  # remove "1. "
     return re.sub(r'[<>:"/\\|?*]', '', name).strip()
 
+def apply_audio_gain(project_path, gain_db):
+    """Set the volume of every audio segment in a project's draft_content.json to `gain_db`."""
+    draft = os.path.join(project_path, 'draft_content.json')
+    with open(draft, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    volume = round(10 ** (min(gain_db, MAX_VOLUME_DB) / 20), 6)
+    for track in data.get('tracks', []):
+        if track.get('type') != 'audio':
+            continue
+        for segment in track.get('segments', []):
+            segment['volume'] = volume
+            segment['last_nonzero_volume'] = volume
+    tmp = draft + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, draft)
+
+def resolve_template_dir(provided=None):
+    """Return the CapCut projects directory (explicit path, %LOCALAPPDATA% detection or legacy path)."""
+    # If user explicitly provided a path, validate and use it
+    if provided:
+        path = os.path.normpath(os.path.expanduser(provided))
+        if os.path.isdir(path):
+            return path
+        raise FileNotFoundError(f"Provided template directory not found: {path}")
+
+    # Try to auto-detect CapCut projects under %LOCALAPPDATA% (Windows)
+    localappdata = os.getenv('LOCALAPPDATA')
+    if localappdata:
+        candidate = os.path.join(localappdata, 'CapCut', 'User Data', 'Projects', 'com.lveditor.draft')
+        if os.path.isdir(candidate):
+            return os.path.normpath(candidate)
+        parent = os.path.join(localappdata, 'CapCut', 'User Data', 'Projects')
+        if os.path.isdir(parent):
+            entries = [d for d in os.listdir(parent) if os.path.isdir(os.path.join(parent, d)) and not d.startswith('.')]
+            if entries:
+                return os.path.normpath(os.path.join(parent, entries[0]))
+
+    # Fallback to legacy hardcoded path if present (keeps compatibility)
+    legacy = r"C:\Users\davro\AppData\Local\CapCut\User Data\Projects\com.lveditor.draft"
+    if os.path.isdir(legacy):
+        return os.path.normpath(legacy)
+
+    raise FileNotFoundError("Could not locate CapCut template directory. Pass --template-dir or ensure the folder exists under %LOCALAPPDATA%\\CapCut\\User Data\\Projects")
+
 def main():
     parser = argparse.ArgumentParser(description="Create CapCut templates from a base project folder.")
     parser.add_argument('-t', '--template-dir', help='Path to CapCut projects directory (overrides auto-detection)')
+    parser.add_argument('--loudness', help='loudness.json from loudness.py (or its folder): set each project\'s audio volume to its target gain')
+    parser.add_argument('--audio-store', nargs='?', const=AUDIO_STORE_DIR, metavar='DIR',
+                        help=f'Link the template\'s audio into each project from a shared store instead of copying it (default DIR: {AUDIO_STORE_DIR})')
     args = parser.parse_args()
 
-    def resolve_template_dir(provided):
-        # If user explicitly provided a path, validate and use it
-        if provided:
-            path = os.path.normpath(os.path.expanduser(provided))
-            if os.path.isdir(path):
-                return path
-            raise FileNotFoundError(f"Provided template directory not found: {path}")
-
-        # Try to auto-detect CapCut projects under %LOCALAPPDATA% (Windows)
-        localappdata = os.getenv('LOCALAPPDATA')
-        if localappdata:
-            candidate = os.path.join(localappdata, 'CapCut', 'User Data', 'Projects', 'com.lveditor.draft')
-            if os.path.isdir(candidate):
-                return os.path.normpath(candidate)
-            parent = os.path.join(localappdata, 'CapCut', 'User Data', 'Projects')
-            if os.path.isdir(parent):
-                entries = [d for d in os.listdir(parent) if os.path.isdir(os.path.join(parent, d)) and not d.startswith('.')]
-                if entries:
-                    return os.path.normpath(os.path.join(parent, entries[0]))
-
-        # Fallback to legacy hardcoded path if present (keeps compatibility)
-        legacy = r"C:\Users\davro\AppData\Local\CapCut\User Data\Projects\com.lveditor.draft"
-        if os.path.isdir(legacy):
-            return os.path.normpath(legacy)
-
-        raise FileNotFoundError("Could not locate CapCut template directory. Pass --template-dir or ensure the folder exists under %LOCALAPPDATA%\\CapCut\\User Data\\Projects")
+    gains = load_report(args.loudness) if args.loudness else {}
+    if args.audio_store:
+        set_store(AudioStore(args.audio_store))
 
     template_dir = resolve_template_dir(args.template_dir)
     print(f"Using template directory: {template_dir}")
@@ -157,22 +190,25 @@ def main():
     if not os.path.isdir(template_dir):
         raise FileNotFoundError(f"Resolved template directory does not exist: {template_dir}")
 
-    for name in names:
+    for surah, name in enumerate(names, start=1):
         new_project_path = os.path.join(template_dir, name)
 
         if os.path.exists(new_project_path):
             print(f"Skipping (already exists): {name}")
-            continue
-
-        shutil.copytree(base_template_path, new_project_path)
-        print(f"Created template: {name}")
+        else:
+            shutil.copytree(base_template_path, new_project_path, copy_function=copy_or_link)
+            print(f"Created template: {name}")
 
-        # We only copy the base template folder; no other modifications are performed.
+        # Besides copying, only the audio volume is changed (and only with --loudness)
+        if surah in gains:
+            apply_audio_gain(new_project_path, gains[surah])
+            print(f"🔊 {name}: audio gain {gains[surah]:+.1f} dB")
 
     print("\n✅ Done! CapCut projects created successfully.")
 
 
-# Audio modification helpers removed. This script now only duplicates the base template folders.
+# Audio is not replaced: the script duplicates the base template folders and, with
+# --loudness, sets their audio volume from a loudness.py report.
 
 
 
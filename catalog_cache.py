@@ -0,0 +1,104 @@
+# On-disk snapshots of slow-changing catalogs (reciter and translation lists).
+#
+# Listing commands and name lookups read cache/catalog/<name>.json instead of
+# calling the API on every start; a snapshot older than CATALOG_MAX_AGE (or
+# refresh=True) is refetched, and a failed refetch falls back to the stale copy.
+# With background=True a stale snapshot is returned at once and refetched in a
+# worker thread (one process per machine/share does it, guarded by a lock file).
+#
+# Usage:
+#   from catalog_cache import cached_catalog
+#   data = cached_catalog("reciters", lambda: request_json(QURANCOM_RECITERS_API))
+
+import json
+import os
+import threading
+import time
+
+from file_lock import break_if_stale, remove_lock, try_create_lock, unique_tmp_path
+
+# ======================================================
+# CONFIG
+# ======================================================
+CATALOG_DIR = os.path.join("cache", "catalog")
+CATALOG_MAX_AGE = 7 * 24 * 3600  # seconds
+REFRESH_LOCK_STALE_AFTER = 120   # a background refresh taking longer than this has died
+
+# ======================================================
+# SNAPSHOTS
+# ======================================================
+
+def snapshot_path(name: str, catalog_dir: str = CATALOG_DIR) -> str:
+    return os.path.join(catalog_dir, f"{name}.json")
+
+def load_snapshot(name: str, catalog_dir: str = CATALOG_DIR):
+    """Return (data, age_seconds), or (None, None) when there is no readable snapshot."""
+    path = snapshot_path(name, catalog_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data, time.time() - os.path.getmtime(path)
+    except (OSError, ValueError):
+        return None, None
+
+def save_snapshot(name: str, data, catalog_dir: str = CATALOG_DIR) -> str:
+    path = snapshot_path(name, catalog_dir)
+    os.makedirs(catalog_dir, exist_ok=True)
+    tmp_file = unique_tmp_path(path)
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_file, path)
+    return path
+
+def refresh_in_background(name: str, fetch, catalog_dir: str = CATALOG_DIR, on_update=None):
+    """
+    Refetch `name` in a (non-daemon) thread and store it; `on_update(data)` runs
+    afterwards. Returns the thread, or None if another process is already refreshing.
+    """
+    lock_path = snapshot_path(name, catalog_dir) + ".refresh.lock"
+    os.makedirs(catalog_dir, exist_ok=True)
+    if not try_create_lock(lock_path):
+        if not break_if_stale(lock_path, REFRESH_LOCK_STALE_AFTER) or not try_create_lock(lock_path):
+            return None
+
+    def worker():
+        try:
+            data = fetch()
+            save_snapshot(name, data, catalog_dir)
+            if on_update is not None:
+                on_update(data)
+        except Exception as e:
+            print(f"⚠️ Background refresh of the {name} list failed: {e}")
+        finally:
+            remove_lock(lock_path)
+
+    thread = threading.Thread(target=worker, name=f"catalog-refresh-{name}")
+    thread.start()
+    return thread
+
+def cached_catalog(name: str, fetch, refresh: bool = False, max_age: float = CATALOG_MAX_AGE,
+                   catalog_dir: str = CATALOG_DIR, background: bool = False, on_update=None):
+    """
+    Snapshot `name` if fresh, else `fetch()` and store it (a failed fetch falls
+    back to a stale snapshot). With background=True a stale snapshot is returned
+    immediately and refreshed by refresh_in_background. `on_update(data)` runs
+    whenever a new snapshot was stored.
+    """
+    snapshot, age = load_snapshot(name, catalog_dir)
+    if snapshot is not None and not refresh:
+        if age < max_age:
+            return snapshot
+        if background:
+            refresh_in_background(name, fetch, catalog_dir, on_update)
+            return snapshot
+    try:
+        data = fetch()
+    except Exception as e:
+        if snapshot is None:
+            raise
+        print(f"⚠️ Could not refresh the {name} list ({e}); using the cached copy.")
+        return snapshot
+    save_snapshot(name, data, catalog_dir)
+    if on_update is not None:
+        on_update(data)
+    return data
@@ -0,0 +1,281 @@
+# Fuzzy name index over the reciter / translation catalogs.
+#
+# Sources: Quran.com recitations and translations, QuranicAudio qaris. Each
+# source's snapshot (catalog_cache, cache/catalog/<name>.json) gets an index
+# file next to it, cache/catalog/<name>.index.json, holding the normalized key
+# of every entry and a character-trigram inverted index. Lookups load that file
+# (rebuilt only when the snapshot changes) and never touch the network; stale
+# snapshots are refreshed in a background thread, which also rebuilds the index.
+#
+# Usage:
+#   python catalog_index.py --search "mishary afasy"
+#   python catalog_index.py --search "sodiq" --kind translations
+#   python catalog_index.py --rebuild
+#
+#   from catalog_index import load_index
+#   entry = load_index("qaris").find("Mishari Rashid al-`Afasy")
+
+import argparse
+import json
+import os
+import threading
+import unicodedata
+from collections import Counter
+
+from catalog_cache import CATALOG_DIR, cached_catalog, load_snapshot, snapshot_path
+from file_lock import unique_tmp_path
+
+# ======================================================
+# CONFIG
+# ======================================================
+INDEX_VERSION = 1
+
+# kind -> snapshot name, URL, list field (None = top-level list), id / name fields, extra fields kept
+SOURCES = {
+    "reciters": {
+        "snapshot": "reciters",
+        "url": "https://api.quran.com/api/v4/resources/recitations",
+        "list": "recitations", "id": "id", "name": "reciter_name", "extra": ("style",),
+    },
+    "translations": {
+        "snapshot": "translations",
+        "url": "https://api.quran.com/api/v4/resources/translations",
+        "list": "translations", "id": "id", "name": "name", "extra": ("language_name", "author_name"),
+    },
+    "qaris": {
+        "snapshot": "quranicaudio_qaris",
+        "url": "https://quranicaudio.com/api/qaris",
+        "list": None, "id": "id", "name": "name", "extra": ("relative_path",),
+    },
+}
+
+FUZZY_CANDIDATES = 20  # trigram-ranked entries re-scored with SequenceMatcher
+
+# Apostrophe / ayn variants used in transliterated names
+APOSTROPHES = str.maketrans({ch: "'" for ch in "`´’‘ʻʼʿ"})
+
+# ======================================================
+# KEYS
+# ======================================================
+
+def normalize(text: str) -> str:
+    """Lowercase, unify apostrophes, drop diacritics and punctuation, collapse spaces."""
+    if not text:
+        return ""
+    s = text.strip().lower().translate(APOSTROPHES)
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    s = "".join(ch for ch in s if ch.isalnum() or ch.isspace())
+    return " ".join(s.split())
+
+def trigrams(key: str, padded: bool = True) -> set:
+    """Character trigrams of a normalized key (padded to mark word boundaries at both ends)."""
+    s = f"  {key} " if padded else key
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+# ======================================================
+# INDEX
+# ======================================================
+
+class CatalogIndex:
+    """Normalized keys and a trigram inverted index for one catalog source."""
+
+    def __init__(self, kind: str, entries, postings, source_mtime=None):
+        self.kind = kind
+        self.entries = entries          # [{"id", "name", "key", ...extra}] in catalog order
+        self.postings = postings        # trigram -> [entry positions]
+        self.source_mtime = source_mtime
+        self._by_key = {}
+        for i, e in enumerate(entries):
+            self._by_key.setdefault(e["key"], i)
+        self._by_id = {e["id"]: e for e in entries}
+        self._gram_counts = [len(trigrams(e["key"])) for e in entries]
+
+    @classmethod
+    def build(cls, kind: str, data, source_mtime=None):
+        conf = SOURCES[kind]
+        items = data if conf["list"] is None else (data or {}).get(conf["list"]) or []
+        entries, postings = [], {}
+        for item in items:
+            name = item.get(conf["name"]) or ""
+            entry = {"id": item.get(conf["id"]), "name": name, "key": normalize(name)}
+            entry.update({field: item.get(field) for field in conf["extra"]})
+            for gram in trigrams(entry["key"]):
+                postings.setdefault(gram, []).append(len(entries))
+            entries.append(entry)
+        return cls(kind, entries, postings, source_mtime)
+
+    def to_dict(self) -> dict:
+        return {"version": INDEX_VERSION, "kind": self.kind, "source_mtime": self.source_mtime,
+                "entries": self.entries, "postings": self.postings}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data["kind"], data["entries"], data["postings"], data.get("source_mtime"))
+
+    # --------------------------------------------------
+    # Lookups
+    # --------------------------------------------------
+
+    def get(self, entry_id):
+        return self._by_id.get(entry_id)
+
+    def exact(self, query: str):
+        """Entry whose key equals the normalized query, or None."""
+        i = self._by_key.get(normalize(query))
+        return self.entries[i] if i is not None else None
+
+    def find(self, query: str):
+        """First entry whose key equals the normalized query, else the first containing it."""
+        q = normalize(query)
+        if not q:
+            return None
+        if q in self._by_key:
+            return self.entries[self._by_key[q]]
+        if len(q) < 3:
+            candidates = range(len(self.entries))
+        else:
+            # Every trigram of the query must occur in a containing key
+            lists = sorted((self.postings.get(g, ()) for g in trigrams(q, padded=False)), key=len)
+            if not lists or not lists[0]:
+                return None
+            candidates = set(lists[0]).intersection(*lists[1:])
+        for i in sorted(candidates):
+            if q in self.entries[i]["key"]:
+                return self.entries[i]
+        return None
+
+    def search(self, query: str, limit: int = 5, cutoff: float = 0.0):
+        """Closest entries as [(score, entry)]: trigram overlap picks candidates, SequenceMatcher ranks them."""
+        q = normalize(query)
+        if not q:
+            return []
+        from difflib import SequenceMatcher
+
+        grams = trigrams(q)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        dice = sorted(((2 * n / (len(grams) + self._gram_counts[i]), i) for i, n in shared.items()), reverse=True)
+        scored = []
+        for _, i in dice[:max(FUZZY_CANDIDATES, limit)]:
+            ratio = SequenceMatcher(None, q, self.entries[i]["key"]).ratio()
+            if ratio >= cutoff:
+                scored.append((round(ratio, 3), self.entries[i]))
+        scored.sort(key=lambda se: -se[0])
+        return scored[:limit]
+
+    def match(self, query: str, cutoff: float = 0.6):
+        """Exact / substring match, else the closest entry scoring at least `cutoff` (or None)."""
+        entry = self.find(query)
+        if entry is not None:
+            return entry
+        best = self.search(query, limit=1, cutoff=cutoff)
+        return best[0][1] if best else None
+
+# ======================================================
+# PERSISTENCE
+# ======================================================
+
+def index_path(kind: str, catalog_dir: str = CATALOG_DIR) -> str:
+    return os.path.join(catalog_dir, f"{SOURCES[kind]['snapshot']}.index.json")
+
+def save_index(index: CatalogIndex, catalog_dir: str = CATALOG_DIR) -> str:
+    path = index_path(index.kind, catalog_dir)
+    os.makedirs(catalog_dir, exist_ok=True)
+    tmp_file = unique_tmp_path(path)
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(index.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_file, path)
+    return path
+
+def _snapshot_mtime(kind: str, catalog_dir: str):
+    try:
+        return os.path.getmtime(snapshot_path(SOURCES[kind]["snapshot"], catalog_dir))
+    except OSError:
+        return None
+
+def _read_index(kind: str, catalog_dir: str):
+    """Persisted index if it was built from the current snapshot, else None."""
+    try:
+        with open(index_path(kind, catalog_dir), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != INDEX_VERSION or data.get("source_mtime") != _snapshot_mtime(kind, catalog_dir):
+        return None
+    return CatalogIndex.from_dict(data)
+
+def rebuild_index(kind: str, data=None, catalog_dir: str = CATALOG_DIR) -> CatalogIndex:
+    """Build the index from `data` (default: the stored snapshot) and persist it."""
+    if data is None:
+        data, _ = load_snapshot(SOURCES[kind]["snapshot"], catalog_dir)
+    index = CatalogIndex.build(kind, data, _snapshot_mtime(kind, catalog_dir))
+    save_index(index, catalog_dir)
+    with _loaded_lock:
+        _loaded[(kind, catalog_dir)] = index
+    return index
+
+def default_fetch(url: str):
+    from http_scheduler import get_scheduler
+    from http_transport import get_session
+
+    r = get_scheduler().get(get_session(), url, timeout=20)
+    r.raise_for_status()
+    return r.json()
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+def load_index(kind: str, fetch=None, refresh: bool = False, catalog_dir: str = CATALOG_DIR) -> CatalogIndex:
+    """
+    Index for `kind`, loaded once per process. Needs the network only when the
+    snapshot is missing or refresh=True; a stale snapshot is served as-is while
+    a background thread refetches it and rebuilds the index.
+    """
+    key = (kind, catalog_dir)
+    if not refresh:
+        with _loaded_lock:
+            if key in _loaded:
+                return _loaded[key]
+    conf = SOURCES[kind]
+    fetch = fetch or (lambda: default_fetch(conf["url"]))
+    data = cached_catalog(conf["snapshot"], fetch, refresh=refresh, catalog_dir=catalog_dir, background=True,
+                          on_update=lambda new: rebuild_index(kind, new, catalog_dir))
+    index = _read_index(kind, catalog_dir)
+    if index is None:
+        index = rebuild_index(kind, data, catalog_dir)
+    with _loaded_lock:
+        _loaded.setdefault(key, index)
+        return _loaded[key]
+
+# ======================================================
+# CLI
+# ======================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Search or rebuild the reciter / translation name index.")
+    parser.add_argument("--search", type=str, help="Name to look up (fuzzy)")
+    parser.add_argument("--kind", choices=sorted(SOURCES), help="Only search one catalog (default: all)")
+    parser.add_argument("--limit", type=int, default=5, help="Matches to show per catalog (default: 5)")
+    parser.add_argument("--rebuild", action="store_true", help="Refetch the catalogs and rebuild their indexes")
+    args = parser.parse_args()
+
+    kinds = [args.kind] if args.kind else sorted(SOURCES)
+    if args.rebuild:
+        for kind in kinds:
+            index = load_index(kind, refresh=True)
+            print(f"✅ {kind}: {len(index.entries)} entries, {len(index.postings)} trigrams → {index_path(kind)}")
+        return
+    if not args.search:
+        parser.print_help()
+        return
+    for kind in kinds:
+        index = load_index(kind)
+        print(f"\n---- {kind.upper()} ----")
+        for score, entry in index.search(args.search, limit=args.limit):
+            extra = " | ".join(str(entry[f]) for f in SOURCES[kind]["extra"] if entry.get(f))
+            print(f"{score:.2f} | {entry['id']} | {entry['name']}" + (f" | {extra}" if extra else ""))
+
+if __name__ == "__main__":
+    main()
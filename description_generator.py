@@ -0,0 +1,242 @@
+# Batch YouTube description writer with per-ayah chapter timestamps.
+#
+# Reads ayah timings from the reciter's timing store (cache/timings/<id>.qts,
+# filled by every quran_srt_generator run), so all 114 descriptions are written
+# in one go without any network call. Each description is a template filled
+# with the surah names, the hand-written intro from data/descriptions_latin/
+# (when there is one) and a chapter list:
+#   00:00 Ayah 1
+#   00:41 Ayah 2
+#   ...
+# Chapters are merged to fit YouTube's rules: the first starts at 00:00, each
+# lasts at least 10 seconds, and the whole description stays within 5000 bytes
+# (long surahs get "Ayah 12–15" ranges).
+#
+# Usage:
+#   python description_generator.py --reciter 7
+#   python description_generator.py --reciter 7 --surahs 78-114 --offset 3.5
+#   python description_generator.py --reciter 7 --template data/description_template.txt
+#
+# Template placeholders: {number} {name_uz} {name_en} {name_ar} {ayahs} {reciter} {intro} {chapters}
+
+import argparse
+import os
+import re
+
+from catalog_cache import load_snapshot
+from catalog_index import SOURCES, CatalogIndex
+from file_lock import unique_tmp_path
+from quran_metadata import SURAH_NAMES_AR, SURAH_NAMES_EN, SURAH_NAMES_UZ, TOTAL_SURAHS, parse_surah_list
+from timing_store import TIMING_STORE_DIR, TimingStore, store_path
+
+# ======================================================
+# CONFIG
+# ======================================================
+DESCRIPTIONS_DIR = os.path.join("output", "descriptions")
+INTRO_DIR = os.path.join("data", "descriptions_latin")
+
+DEFAULT_TEMPLATE = """{number}. {name_uz} surasi | {name_en} | {name_ar}
+Qori: {reciter}
+Oyatlar soni: {ayahs}
+
+{intro}
+
+{chapters}
+
+#Quran #QuroniKarim"""
+
+CHAPTER_LABEL = "Ayah {first}"
+CHAPTER_RANGE_LABEL = "Ayah {first}–{last}"
+
+# YouTube chapter rules
+MIN_CHAPTERS = 3
+MIN_CHAPTER_MS = 10_000
+MAX_DESCRIPTION_BYTES = 5000
+MERGE_STEP = 1.25  # grow the minimum chapter length by this factor until the description fits
+
+# ======================================================
+# CHAPTERS
+# ======================================================
+
+def format_timestamp(ms: int, with_hours: bool = False) -> str:
+    seconds = int(ms) // 1000
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}:{m:02}:{s:02}" if with_hours else f"{m:02}:{s:02}"
+
+def merge_chapters(starts, ends, min_ms: int = MIN_CHAPTER_MS, offset_ms: int = 0):
+    """
+    Group ayahs into chapters of at least `min_ms`: [(start_ms, first_ayah, last_ayah)].
+    The first chapter starts at 0; the others at their first ayah's start + offset_ms.
+    """
+    chapters = []
+    i, n = 0, len(starts)
+    while i < n:
+        start = 0 if not chapters else starts[i] + offset_ms
+        j = i + 1
+        while j < n and starts[j] + offset_ms - start < min_ms:
+            j += 1
+        chapters.append([start, i + 1, j])
+        i = j
+    # A short last chapter joins the previous one
+    if len(chapters) > 1 and ends[-1] + offset_ms - chapters[-1][0] < min_ms:
+        last = chapters.pop()
+        chapters[-1][2] = last[2]
+    return [tuple(c) for c in chapters]
+
+def format_chapters(chapters, with_hours: bool = False) -> str:
+    lines = []
+    for start, first, last in chapters:
+        label = CHAPTER_LABEL if first == last else CHAPTER_RANGE_LABEL
+        lines.append(f"{format_timestamp(start, with_hours)} {label.format(first=first, last=last)}")
+    return "\n".join(lines)
+
+# ======================================================
+# DESCRIPTIONS
+# ======================================================
+
+def load_intros(intro_dir: str = INTRO_DIR) -> dict:
+    """{surah: text} from files named like "01 - 1.  FOTIHA SURASI.txt" (or "001.txt")."""
+    intros = {}
+    if not intro_dir or not os.path.isdir(intro_dir):
+        return intros
+    for name in sorted(os.listdir(intro_dir)):
+        m = re.match(r"^\d+ - (\d+)\.", name) or re.match(r"^(\d+)\.txt$", name)
+        if not m or not 1 <= int(m.group(1)) <= TOTAL_SURAHS:
+            continue
+        with open(os.path.join(intro_dir, name), "r", encoding="utf-8") as f:
+            intros.setdefault(int(m.group(1)), f.read().strip())
+    return intros
+
+def reciter_name_from_snapshot(reciter_id: int) -> str:
+    """Reciter name from the cached catalog snapshot (no network), or ""."""
+    data, _ = load_snapshot(SOURCES["reciters"]["snapshot"])
+    if data is None:
+        return ""
+    entry = CatalogIndex.build("reciters", data).get(reciter_id)
+    return entry["name"] if entry else ""
+
+def render_description(template: str, fields: dict, chapters_text: str) -> str:
+    text = template.format(chapters=chapters_text, **fields)
+    text = text.replace("<", "").replace(">", "")  # not allowed in YouTube descriptions
+    return re.sub(r"\n{3,}", "\n\n", text).strip() + "\n"
+
+def build_description(surah: int, starts, ends, template: str, reciter: str, intro: str = "",
+                      offset_ms: int = 0, limit: int = MAX_DESCRIPTION_BYTES):
+    """Return (text, chapter_count); chapters are merged until the text fits `limit` bytes."""
+    fields = {
+        "number": surah,
+        "name_uz": SURAH_NAMES_UZ[surah - 1],
+        "name_en": SURAH_NAMES_EN[surah - 1],
+        "name_ar": SURAH_NAMES_AR[surah - 1],
+        "ayahs": len(starts),
+        "reciter": reciter,
+        "intro": intro,
+    }
+    with_hours = ends[-1] + offset_ms >= 3600 * 1000
+    min_ms = MIN_CHAPTER_MS
+    while True:
+        chapters = merge_chapters(starts, ends, min_ms, offset_ms)
+        if len(chapters) < MIN_CHAPTERS:
+            # YouTube ignores chapter lists this short
+            return render_description(template, fields, ""), 0
+        text = render_description(template, fields, format_chapters(chapters, with_hours))
+        if len(text.encode("utf-8")) <= limit:
+            return text, len(chapters)
+        min_ms = int(min_ms * MERGE_STEP)
+
+def stored_timings(store: TimingStore, surah: int):
+    """(starts, ends) copied out of the store's mmap (so it can be closed), or None."""
+    arrays = store.surah(surah)
+    return None if arrays is None else (list(arrays[0]), list(arrays[1]))
+
+def format_surah_ranges(surahs) -> str:
+    """[3, 4, 5, 9] -> "3-5, 9"."""
+    parts, run = [], []
+    for s in sorted(surahs):
+        if run and s != run[-1] + 1:
+            parts.append(f"{run[0]}-{run[-1]}" if len(run) > 1 else str(run[0]))
+            run = []
+        run.append(s)
+    if run:
+        parts.append(f"{run[0]}-{run[-1]}" if len(run) > 1 else str(run[0]))
+    return ", ".join(parts)
+
+def write_if_changed(path: str, text: str) -> bool:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_file = unique_tmp_path(path)
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_file, path)
+    return True
+
+def write_descriptions(reciter_id: int, surahs, template: str = DEFAULT_TEMPLATE, reciter: str = None,
+                       intro_dir: str = INTRO_DIR, out_dir: str = DESCRIPTIONS_DIR, offset_ms: int = 0,
+                       store_dir: str = TIMING_STORE_DIR):
+    """Write <out_dir>/<reciter_id>/<surah>.txt for every surah with stored timings; return the missing surahs."""
+    reciter = reciter if reciter is not None else reciter_name_from_snapshot(reciter_id)
+    intros = load_intros(intro_dir)
+    target_dir = os.path.join(out_dir, str(reciter_id))
+    missing, written = [], 0
+    with TimingStore(store_path(reciter_id, store_dir)) as store:
+        for surah in surahs:
+            timings = stored_timings(store, surah)
+            if timings is None:
+                missing.append(surah)
+                continue
+            starts, ends = timings
+            text, count = build_description(surah, starts, ends, template, reciter,
+                                            intros.get(surah, ""), offset_ms)
+            path = os.path.join(target_dir, f"{surah:03}.txt")
+            changed = write_if_changed(path, text)
+            written += changed
+            chapters = f"{count} chapters" if count else "no chapters (too short)"
+            print(f"{'✅' if changed else '♻️'} Surah {surah}: {len(starts)} ayahs → {chapters}")
+    print(f"\n✅ {written} description(s) written to {target_dir}")
+    return missing
+
+# ======================================================
+# CLI
+# ======================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Write YouTube descriptions with ayah chapters from cached timings.")
+    parser.add_argument("--reciter", type=int, required=True, help="Reciter ID (timings from cache/timings/<id>.qts)")
+    parser.add_argument("--surahs", default=f"1-{TOTAL_SURAHS}", help="Surahs to write, e.g. 1-114 or 1,36,67")
+    parser.add_argument("--template", type=str, help="Template file with {placeholders} (default: built-in)")
+    parser.add_argument("--reciter-name", type=str, help="Reciter name for {reciter} (default: from the catalog snapshot)")
+    parser.add_argument("--intro-dir", default=INTRO_DIR, help=f"Hand-written intros for {{intro}} (default: {INTRO_DIR})")
+    parser.add_argument("--offset", type=float, default=0.0,
+                        help="Seconds of video before the recitation starts (shifts every chapter but the first)")
+    parser.add_argument("--out-dir", default=DESCRIPTIONS_DIR, help=f"Output folder (default: {DESCRIPTIONS_DIR})")
+    parser.add_argument("--store-dir", default=TIMING_STORE_DIR, help=f"Timing store directory (default: {TIMING_STORE_DIR})")
+    args = parser.parse_args()
+
+    try:
+        surahs = parse_surah_list(args.surahs)
+    except ValueError as e:
+        parser.error(str(e))
+    template = DEFAULT_TEMPLATE
+    if args.template:
+        with open(args.template, "r", encoding="utf-8") as f:
+            template = f.read()
+    if not os.path.exists(store_path(args.reciter, args.store_dir)):
+        parser.error(f"No timing store for reciter {args.reciter}: run quran_srt_generator.py --all --reciter {args.reciter} first")
+
+    try:
+        missing = write_descriptions(args.reciter, surahs, template, args.reciter_name, args.intro_dir,
+                                     args.out_dir, int(args.offset * 1000), args.store_dir)
+    except (KeyError, IndexError, ValueError) as e:
+        parser.error(f"Invalid template: {e}")
+    if missing:
+        print(f"⚠️ No timings stored for surah(s) {format_surah_ranges(missing)}; "
+              f"run quran_srt_generator.py for them first.")
+
+if __name__ == "__main__":
+    main()
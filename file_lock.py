@@ -0,0 +1,129 @@
+# Lock files that work across processes and machines (local disk or NFS).
+#
+# A lock is a file created with O_CREAT | O_EXCL, which is atomic on local
+# filesystems and on NFSv3+. It holds a small JSON note about the owner.
+# Locks whose mtime is older than `stale_after` seconds are treated as
+# abandoned (crashed node) and broken by renaming them away first, so only
+# one contender wins.
+#
+# Usage:
+#   from file_lock import exclusive_lock
+#   with exclusive_lock("cache/timings/7.qts"):
+#       ...read-modify-write the file...
+
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+# ======================================================
+# CONFIG
+# ======================================================
+LOCK_SUFFIX = ".lock"
+DEFAULT_TIMEOUT = 120      # seconds to wait for a lock
+DEFAULT_STALE_AFTER = 300  # seconds without mtime update before a lock is broken
+POLL_INTERVAL = 0.05
+
+HOSTNAME = socket.gethostname()
+
+def owner_id() -> str:
+    """Unique per host, process and thread (pids alone collide across machines)."""
+    return f"{HOSTNAME}-{os.getpid()}-{threading.get_ident()}"
+
+def unique_tmp_path(path: str) -> str:
+    """Temporary file name next to `path` that no other writer on any node will use."""
+    return f"{path}.{owner_id()}.tmp"
+
+# ======================================================
+# PRIMITIVES
+# ======================================================
+
+def try_create_lock(lock_path: str, note: dict = None) -> bool:
+    """Create `lock_path` exclusively; False if it already exists."""
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    try:
+        info = {"owner": owner_id(), "host": HOSTNAME, "pid": os.getpid(), "ts": time.time()}
+        info.update(note or {})
+        os.write(fd, json.dumps(info).encode("utf-8"))
+    finally:
+        os.close(fd)
+    return True
+
+def break_if_stale(lock_path: str, stale_after: float = DEFAULT_STALE_AFTER) -> bool:
+    """Remove `lock_path` if it has not been touched for `stale_after` seconds. True if removed."""
+    try:
+        st = os.stat(lock_path)
+    except FileNotFoundError:
+        return True
+    if time.time() - st.st_mtime < stale_after:
+        return False
+    # Rename first so the lock is checked and removed under a name only we use
+    victim = f"{lock_path}.stale.{owner_id()}"
+    try:
+        os.rename(lock_path, victim)
+    except FileNotFoundError:
+        return True
+    try:
+        renamed = os.stat(victim)
+    except FileNotFoundError:
+        return True
+    if (renamed.st_ino, renamed.st_mtime_ns) != (st.st_ino, st.st_mtime_ns):
+        # Another node broke the stale lock first and what we renamed is its
+        # fresh one: put it back (link fails rather than overwrite a newer lock)
+        try:
+            os.link(victim, lock_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            if not os.path.exists(lock_path):
+                os.rename(victim, lock_path)
+                return False
+        try:
+            os.remove(victim)
+        except FileNotFoundError:
+            pass
+        return False
+    try:
+        os.remove(victim)
+    except FileNotFoundError:
+        pass
+    return True
+
+def read_lock(lock_path: str) -> dict:
+    try:
+        with open(lock_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def remove_lock(lock_path: str):
+    try:
+        os.remove(lock_path)
+    except FileNotFoundError:
+        pass
+
+# ======================================================
+# CONTEXT MANAGER
+# ======================================================
+
+@contextmanager
+def exclusive_lock(path: str, timeout: float = DEFAULT_TIMEOUT, stale_after: float = DEFAULT_STALE_AFTER):
+    """Hold `<path>.lock` for the duration of the block; raises TimeoutError after `timeout`."""
+    lock_path = path + LOCK_SUFFIX
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    deadline = time.monotonic() + timeout
+    while not try_create_lock(lock_path):
+        if break_if_stale(lock_path, stale_after):
+            continue
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Timed out waiting for {lock_path} (held by {read_lock(lock_path).get('owner', '?')})")
+        time.sleep(POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        remove_lock(lock_path)
@@ -0,0 +1,261 @@
+# Shared request scheduler for every API / download call.
+#
+# Per host:
+#   - a token bucket caps the request rate,
+#   - an AIMD limiter caps in-flight requests: it grows by ~1 per window of
+#     fast successes and halves on 429 / 5xx / slow responses (the bucket rate
+#     follows the same rule),
+#   - 429 / 503 responses honour Retry-After and pause the whole host,
+#   - other retryable statuses and connection errors back off exponentially.
+#
+# Usage:
+#   from http_scheduler import get_scheduler
+#   r = get_scheduler().get(session, url, params=..., timeout=20)
+
+import random
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+# ======================================================
+# CONFIG
+# ======================================================
+DEFAULT_RATE = 10.0            # requests / second
+DEFAULT_BURST = 10
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 32
+MIN_RATE = 0.5
+MAX_RATE = 50.0
+SLOW_RESPONSE_SECONDS = 5.0    # metadata calls slower than this count as congestion
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+MAX_RETRY_AFTER = 120.0
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+# Starting points per host; AIMD moves them from here, up to max_concurrency
+# (http_transport sizes each host's connection pool to max_concurrency)
+HOST_LIMITS = {
+    "api.quran.com": {"rate": 10.0, "concurrency": 4, "max_concurrency": 16},
+    "api.alquran.cloud": {"rate": 5.0, "concurrency": 2, "max_concurrency": 8},
+    "verses.quran.com": {"rate": 20.0, "concurrency": 8, "max_concurrency": 32},
+    "quranicaudio.com": {"rate": 5.0, "concurrency": 2, "max_concurrency": 4},
+    "download.quranicaudio.com": {"rate": 8.0, "concurrency": 4, "max_concurrency": 8},
+}
+
+# ======================================================
+# PER-HOST STATE
+# ======================================================
+
+class HostLimiter:
+    """Token bucket + AIMD concurrency window for one host."""
+
+    def __init__(self, host: str, rate: float = DEFAULT_RATE, concurrency: int = DEFAULT_CONCURRENCY,
+                 burst: int = DEFAULT_BURST, max_concurrency: int = MAX_CONCURRENCY):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.limit = float(concurrency)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self._last_refill = time.monotonic()
+        self._cond = threading.Condition()
+        # counters (read by instrumentation / summaries)
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.retries = 0
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+
+                wait = 0.0
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.in_flight >= max(1, int(self.limit)):
+                    wait = None  # wait for a release
+                elif self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    self.requests += 1
+                    return
+                self._cond.wait(wait)
+
+    def release(self, ok: bool, latency: float, throttled: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            if ok and latency < SLOW_RESPONSE_SECONDS:
+                # additive increase: about +1 slot / +1 rps per window of successes
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / max(1.0, self.limit))
+                self.rate = min(MAX_RATE, self.rate + 1.0 / max(1.0, self.rate))
+            else:
+                # multiplicative decrease on errors and slow responses
+                self.limit = max(1.0, self.limit / 2)
+                self.rate = max(MIN_RATE, self.rate / 2)
+                if throttled:
+                    self.throttled += 1
+                elif not ok:
+                    self.errors += 1
+            self._cond.notify_all()
+
+    def count_retry(self):
+        with self._cond:
+            self.retries += 1
+
+    def pause(self, seconds: float):
+        with self._cond:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        return {
+            "host": self.host,
+            "rate": round(self.rate, 2),
+            "concurrency": round(self.limit, 2),
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "errors": self.errors,
+        }
+
+# ======================================================
+# SCHEDULER
+# ======================================================
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def hold_until_closed(response, limiter: HostLimiter, latency: float):
+    """
+    Keep a streamed response's slot until response.close() (or until it is
+    garbage collected), so body downloads count against the host's limits.
+    AIMD still judges the host by the time to the headers.
+    """
+    lock = threading.Lock()
+    held = [True]
+
+    def release():
+        with lock:
+            if not held[0]:
+                return
+            held[0] = False
+        limiter.release(ok=True, latency=latency)
+
+    close = response.close
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            release()
+
+    response.close = close_and_release
+    weakref.finalize(response, release)
+
+class RequestScheduler:
+    def __init__(self, host_limits=None, max_attempts: int = MAX_ATTEMPTS):
+        self.host_limits = dict(HOST_LIMITS if host_limits is None else host_limits)
+        self.max_attempts = max_attempts
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, url: str) -> HostLimiter:
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            limiter = self._hosts.get(host)
+            if limiter is None:
+                conf = self.host_limits.get(host, {})
+                limiter = self._hosts[host] = HostLimiter(
+                    host,
+                    rate=conf.get("rate", DEFAULT_RATE),
+                    concurrency=conf.get("concurrency", DEFAULT_CONCURRENCY),
+                    max_concurrency=conf.get("max_concurrency", MAX_CONCURRENCY),
+                )
+            return limiter
+
+    def request(self, session, method: str, url: str, **kwargs):
+        """
+        Send a request through `session` (a requests.Session or the requests module),
+        retrying 429/5xx and connection errors. Returns the final response; the
+        caller still calls raise_for_status(), and with stream=True closes the
+        response when done (the host slot is held until then).
+        """
+        limiter = self.limiter(url)
+        attempt = 0
+        while True:
+            attempt += 1
+            limiter.acquire()
+            started = time.monotonic()
+            try:
+                response = session.request(method, url, **kwargs)
+            except Exception:
+                limiter.release(ok=False, latency=time.monotonic() - started)
+                if attempt >= self.max_attempts:
+                    raise
+                limiter.count_retry()
+                time.sleep(self._backoff(attempt))
+                continue
+
+            latency = time.monotonic() - started
+            status = response.status_code
+            if status not in RETRY_STATUSES:
+                if kwargs.get("stream"):
+                    hold_until_closed(response, limiter, latency)
+                else:
+                    limiter.release(ok=True, latency=latency)
+                return response
+
+            limiter.release(ok=False, latency=latency, throttled=status == 429)
+            if attempt >= self.max_attempts:
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None and status in (429, 503):
+                delay = min(retry_after, MAX_RETRY_AFTER)
+                limiter.pause(delay)  # everyone waits, not just this thread
+            else:
+                delay = self._backoff(attempt)
+            response.close()
+            limiter.count_retry()
+            time.sleep(delay)
+
+    def get(self, session, url: str, **kwargs):
+        return self.request(session, "GET", url, **kwargs)
+
+    def _backoff(self, attempt: int) -> float:
+        return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (attempt - 1))) * (0.5 + random.random() / 2)
+
+    def summary(self):
+        with self._lock:
+            return [limiter.snapshot() for limiter in self._hosts.values()]
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+def get_scheduler() -> RequestScheduler:
+    """Process-wide scheduler shared by all modules."""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = RequestScheduler()
+        return _default_scheduler
@@ -0,0 +1,205 @@
+# Shared HTTP transport: one pooled, keep-alive client per process.
+#
+# Optional install for HTTP/2 multiplexing and brotli responses:
+#   python -m pip install "httpx[http2]" brotli
+#
+# Client selection (QURAN_HTTP_CLIENT environment variable):
+#   auto     httpx with HTTP/2 when httpx and h2 are installed, else requests (default)
+#   httpx    httpx with HTTP/2 (falls back to requests if not installed)
+#   requests requests.Session with per-host connection pools
+#
+# Both clients expose the subset of the requests API the scripts use
+# (`request`/`get`, `status_code`, `headers`, `json()`, `raise_for_status()`,
+# `iter_content()`), so http_scheduler and every caller work with either.
+#
+# Usage:
+#   from http_transport import get_session
+#   r = get_scheduler().get(get_session(), url, timeout=20)
+#
+# requests / httpx are imported when the first session is created, so CLI
+# commands that never touch the network (--help, cached listings) start fast.
+
+import os
+import threading
+from functools import lru_cache
+
+from http_scheduler import HOST_LIMITS, MAX_CONCURRENCY
+
+# ======================================================
+# CONFIG
+# ======================================================
+CLIENT_ENV = "QURAN_HTTP_CLIENT"
+DEFAULT_POOL_SIZE = 10
+USER_AGENT = "quran-srt-generator"
+# Connection errors are retried by http_scheduler (with backoff and AIMD), not
+# by the transports: retrying at both layers multiplied the attempts
+TRANSPORT_RETRIES = 0
+CLIENT_TIMEOUT = 30.0   # seconds; httpx client default for calls that pass no timeout
+
+def _has_module(name: str) -> bool:
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+@lru_cache(maxsize=None)
+def default_headers() -> dict:
+    # urllib3 and httpx only decode brotli when one of these is installed
+    has_brotli = _has_module("brotli") or _has_module("brotlicffi")
+    return {
+        "Accept-Encoding": "gzip, deflate, br" if has_brotli else "gzip, deflate",
+        "Connection": "keep-alive",
+        "User-Agent": USER_AGENT,
+    }
+
+def pool_size(host: str) -> int:
+    """Connections to keep for a host: the most the scheduler will ever run in parallel."""
+    conf = HOST_LIMITS.get(host, {})
+    return min(MAX_CONCURRENCY, conf.get("max_concurrency", DEFAULT_POOL_SIZE))
+
+# ======================================================
+# REQUESTS (HTTP/1.1)
+# ======================================================
+
+def create_requests_session(total_retries=TRANSPORT_RETRIES, backoff_factor=0.3, status_forcelist=()):
+    """requests.Session with keep-alive pools sized per known host (no retries unless asked for)."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    session.headers.update(default_headers())
+
+    def adapter(size, hosts=1):
+        retries = Retry(total=total_retries, backoff_factor=backoff_factor, status_forcelist=status_forcelist,
+                        allowed_methods=frozenset(['GET', 'POST']))
+        return HTTPAdapter(max_retries=retries, pool_connections=hosts, pool_maxsize=size)
+
+    session.mount('https://', adapter(DEFAULT_POOL_SIZE, DEFAULT_POOL_SIZE))
+    session.mount('http://', adapter(DEFAULT_POOL_SIZE, DEFAULT_POOL_SIZE))
+    # Longest prefix wins, so known hosts get their own pool sized to the scheduler's limit
+    for host in HOST_LIMITS:
+        session.mount(f"https://{host}/", adapter(pool_size(host)))
+    return session
+
+# ======================================================
+# HTTPX (HTTP/2)
+# ======================================================
+
+class Http2Response:
+    """Wraps an httpx.Response in the requests-style API used by the scripts."""
+
+    def __init__(self, response, httpx_module):
+        self._response = response
+        self._httpx = httpx_module
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def content(self) -> bytes:
+        return self._response.read()
+
+    @property
+    def text(self) -> str:
+        self._response.read()
+        return self._response.text
+
+    def json(self):
+        self._response.read()
+        return self._response.json()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            self.close()
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def iter_content(self, chunk_size=None):
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except self._httpx.HTTPError as e:
+            import requests
+            raise requests.ConnectionError(str(e))
+        finally:
+            self.close()
+
+    def close(self):
+        self._response.close()
+
+class Http2Session:
+    """httpx.Client (HTTP/2, one multiplexed connection per host) behind a requests-like `request()`."""
+
+    def __init__(self, httpx_module, total_retries=TRANSPORT_RETRIES):
+        self._httpx = httpx_module
+        limits = lambda size: httpx_module.Limits(max_connections=size, max_keepalive_connections=size)
+        transport = lambda size: httpx_module.HTTPTransport(http2=True, retries=total_retries, limits=limits(size))
+        self._client = httpx_module.Client(
+            headers=default_headers(),
+            follow_redirects=True,
+            timeout=CLIENT_TIMEOUT,
+            transport=transport(DEFAULT_POOL_SIZE),
+            mounts={f"https://{host}": transport(pool_size(host)) for host in HOST_LIMITS},
+        )
+
+    def request(self, method, url, params=None, timeout=None, stream=False, headers=None, **kwargs):
+        httpx = self._httpx
+        if timeout is not None:
+            kwargs["timeout"] = timeout  # timeout=None would disable httpx's timeout, not use the default
+        try:
+            req = self._client.build_request(method, url, params=params, headers=headers, **kwargs)
+            response = self._client.send(req, stream=True)
+            if not stream:
+                response.read()
+        except httpx.TimeoutException as e:
+            import requests
+            raise requests.Timeout(str(e))
+        except httpx.HTTPError as e:
+            import requests
+            raise requests.ConnectionError(str(e))
+        return Http2Response(response, httpx)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def close(self):
+        self._client.close()
+
+def create_http2_session(total_retries=TRANSPORT_RETRIES):
+    """Http2Session, or None when httpx / h2 are not installed."""
+    try:
+        import httpx
+        import h2  # noqa: F401  (httpx needs it for http2=True)
+    except ImportError:
+        return None
+    return Http2Session(httpx, total_retries=total_retries)
+
+# ======================================================
+# SHARED SESSION
+# ======================================================
+
+def create_session(client=None, total_retries=TRANSPORT_RETRIES, backoff_factor=0.3, status_forcelist=()):
+    """
+    New session for `client` ("auto", "httpx" or "requests"; default from
+    QURAN_HTTP_CLIENT). Custom status retries force the requests client.
+    """
+    client = (client or os.environ.get(CLIENT_ENV) or "auto").lower()
+    if client in ("auto", "httpx") and not status_forcelist:
+        session = create_http2_session(total_retries)
+        if session is not None:
+            return session
+        if client == "httpx":
+            print("⚠️ httpx[http2] is not installed; using requests (HTTP/1.1).")
+    return create_requests_session(total_retries, backoff_factor, status_forcelist)
+
+_shared_session = None
+_shared_lock = threading.Lock()
+
+def get_session():
+    """Process-wide session shared by all modules, so connections are reused everywhere."""
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
@@ -0,0 +1,191 @@
+# Run instrumentation: per-stage timers, byte counters and cache hit/miss counts.
+#
+# The generator records into the process-wide `metrics` object; with
+# --metrics-dir the run is written as JSON lines (one event per stage) and as
+# a Prometheus textfile-collector file, and --profile wraps the run in cProfile.
+#
+# Usage:
+#   from instrumentation import metrics
+#   with metrics.stage("fetch_arabic", surah=2):
+#       ...
+#   metrics.count("surah_cache_hit")
+#   metrics.add_bytes("download", len(chunk))
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# ======================================================
+# CONFIG
+# ======================================================
+EVENTS_FILE = "metrics.jsonl"
+PROMETHEUS_FILE = "quran_srt_generator.prom"
+METRIC_PREFIX = "quran_srt"
+PROFILE_TOP = 40
+
+# ======================================================
+# METRICS
+# ======================================================
+
+class Metrics:
+    """Thread-safe stage timers and counters for one run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.run_id = f"{int(self.started)}-{os.getpid()}"
+        self.stages = {}    # name -> [calls, total_seconds, max_seconds, failures]
+        self.counters = {}  # name -> int
+        self.bytes = {}     # kind -> int
+        self._events = None
+
+    def open_events(self, path: str):
+        """Append one JSON line per stage / summary event to `path`."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._events = open(path, "a", encoding="utf-8")
+
+    def event(self, kind: str, **fields):
+        if self._events is None:
+            return
+        line = json.dumps({"ts": round(time.time(), 3), "run": self.run_id, "event": kind, **fields},
+                          ensure_ascii=False)
+        with self._lock:
+            self._events.write(line + "\n")
+            self._events.flush()
+
+    @contextmanager
+    def stage(self, name: str, surah=None):
+        started = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            with self._lock:
+                entry = self.stages.setdefault(name, [0, 0.0, 0.0, 0])
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+                if not ok:
+                    entry[3] += 1
+            self.event("stage", stage=name, surah=surah, seconds=round(seconds, 4), ok=ok)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_bytes(self, kind: str, n: int):
+        with self._lock:
+            self.bytes[kind] = self.bytes.get(kind, 0) + n
+
+    def snapshot(self, http_hosts=()) -> dict:
+        with self._lock:
+            return {
+                "elapsed": round(time.time() - self.started, 3),
+                "stages": {
+                    name: {"calls": c, "seconds": round(total, 4), "max": round(mx, 4), "failures": failed}
+                    for name, (c, total, mx, failed) in self.stages.items()
+                },
+                "counters": dict(self.counters),
+                "bytes": dict(self.bytes),
+                "http": list(http_hosts),
+            }
+
+    # --------------------------------------------------
+    # Output
+    # --------------------------------------------------
+
+    def write_prometheus(self, path: str, http_hosts=()):
+        """Write all metrics in the textfile-collector format (atomically)."""
+        snap = self.snapshot(http_hosts)
+        p = METRIC_PREFIX
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{p}_{name}{{{label_text}}} {value}" if label_text else f"{p}_{name} {value}")
+
+        stages = snap["stages"]
+        metric("stage_seconds_total", "counter", "Seconds spent per stage",
+               [({"stage": s}, v["seconds"]) for s, v in stages.items()])
+        metric("stage_calls_total", "counter", "Times each stage ran",
+               [({"stage": s}, v["calls"]) for s, v in stages.items()])
+        metric("stage_failures_total", "counter", "Stage runs that raised",
+               [({"stage": s}, v["failures"]) for s, v in stages.items()])
+        metric("stage_seconds_max", "gauge", "Slowest single run of each stage",
+               [({"stage": s}, v["max"]) for s, v in stages.items()])
+        metric("events_total", "counter", "Cache hits/misses and other counted events",
+               [({"name": n}, v) for n, v in snap["counters"].items()])
+        metric("bytes_total", "counter", "Bytes received per kind",
+               [({"kind": k}, v) for k, v in snap["bytes"].items()])
+        for field in ("requests", "retries", "throttled", "errors"):
+            metric(f"http_{field}_total", "counter", f"HTTP {field} per host",
+                   [({"host": h["host"]}, h[field]) for h in snap["http"]])
+        metric("run_seconds", "gauge", "Wall time of the run", [({}, snap["elapsed"])])
+        metric("last_run_timestamp_seconds", "gauge", "When the run finished", [({}, round(time.time(), 3))])
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)
+
+    def finish(self, out_dir: str, http_hosts=()):
+        """Write the summary event and the Prometheus file into `out_dir`."""
+        http_hosts = list(http_hosts)
+        self.event("summary", **self.snapshot(http_hosts))
+        prom_path = os.path.join(out_dir, PROMETHEUS_FILE)
+        self.write_prometheus(prom_path, http_hosts)
+        if self._events is not None:
+            self._events.close()
+            self._events = None
+        return prom_path
+
+    def print_summary(self):
+        snap = self.snapshot()
+        if not snap["stages"]:
+            return
+        print(f"\n⏱️ Stage timings ({snap['elapsed']:.1f}s total):")
+        for name, v in sorted(snap["stages"].items(), key=lambda kv: -kv[1]["seconds"]):
+            print(f"   {name:<20} {v['seconds']:>9.2f}s  {v['calls']:>5} calls  max {v['max']:.2f}s")
+        for name, value in sorted(snap["counters"].items()):
+            print(f"   {name:<20} {value}")
+        for kind, value in sorted(snap["bytes"].items()):
+            print(f"   {kind + ' bytes':<20} {value / 1e6:.1f} MB")
+
+metrics = Metrics()
+
+# ======================================================
+# PROFILING
+# ======================================================
+
+def profile_call(out_path: str, func, *args, **kwargs):
+    """
+    Run func under cProfile. Writes raw stats to `out_path` (load with pstats /
+    snakeviz) and the top functions by cumulative time to `out_path`.txt.
+    """
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        profiler.dump_stats(out_path)
+        text = io.StringIO()
+        stats = pstats.Stats(profiler, stream=text)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(PROFILE_TOP)
+        stats.sort_stats("tottime").print_stats(PROFILE_TOP)
+        with open(out_path + ".txt", "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+        print(f"📈 Profile written: {out_path} (summary: {out_path}.txt)")
@@ -0,0 +1,235 @@
+# Local corpus for offline runs: API responses and audio stored on disk.
+#
+# A corpus is either a mirror directory or a single SQLite file:
+#   <root>/api/<host>/<path>/<query>.json     raw API responses
+#   <root>/audio/<host>/<path>                 verse / surah MP3s
+#   corpus.sqlite: tables api(key, body) and audio(key, data), same keys
+#
+# Responses are stored exactly as the live APIs return them (keyed by URL +
+# query), so every fetch function in quran_srt_generator works unchanged
+# offline, including the Solution A -> fallback decision.
+#
+# Usage:
+#   python quran_srt_generator.py --export-corpus cache/corpus --all --reciter 7 --download-audio
+#   python quran_srt_generator.py --offline --all --reciter 7
+#   python quran_srt_generator.py --source local:/mnt/corpus.sqlite --surah 36 --reciter 7
+
+import json
+import os
+import shutil
+import threading
+from urllib.parse import quote, urlencode, urlsplit
+
+from file_lock import unique_tmp_path
+
+# ======================================================
+# CONFIG
+# ======================================================
+DEFAULT_CORPUS = os.path.join("cache", "corpus")
+SQLITE_EXTENSIONS = (".sqlite", ".sqlite3", ".db")
+INDEX_NAME = "index"  # file name for requests without query parameters
+
+class CorpusMissError(LookupError):
+    """Raised when an offline run needs a response or file the corpus does not have."""
+
+# ======================================================
+# KEYS
+# ======================================================
+
+def request_key(url: str, params=None) -> str:
+    """Stable key for a GET request: "host/path?sorted-query"."""
+    parts = urlsplit(url)
+    query = sorted((str(k), str(v)) for k, v in (params or {}).items())
+    if parts.query:
+        query = sorted(query + [tuple(kv.split("=", 1)) for kv in parts.query.split("&") if "=" in kv])
+    key = f"{parts.hostname}{parts.path}".rstrip("/")
+    return f"{key}?{urlencode(query)}" if query else key
+
+def audio_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.hostname}{parts.path}"
+
+def _safe_relpath(key: str) -> str:
+    return "/".join(quote(part, safe="-_.,=&+") for part in key.split("/") if part not in ("", ".", ".."))
+
+# ======================================================
+# MIRROR DIRECTORY
+# ======================================================
+
+class MirrorSource:
+    """Corpus stored as plain files (easy to rsync to render nodes)."""
+
+    def __init__(self, root: str, offline: bool = True):
+        self.root = root
+        self.offline = offline
+
+    def describe(self) -> str:
+        return f"mirror {self.root}"
+
+    def _json_path(self, key: str) -> str:
+        path, _, query = key.partition("?")
+        name = quote(query, safe="-_.,=&+") or INDEX_NAME
+        return os.path.join(self.root, "api", *_safe_relpath(path).split("/"), name + ".json")
+
+    def _audio_path(self, url: str) -> str:
+        return os.path.join(self.root, "audio", *_safe_relpath(audio_key(url)).split("/"))
+
+    def get_json(self, url: str, params=None):
+        path = self._json_path(request_key(url, params))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise CorpusMissError(f"Not in local corpus: {request_key(url, params)}")
+
+    def put_json(self, url: str, params, data):
+        path = self._json_path(request_key(url, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = unique_tmp_path(path)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def has_audio(self, url: str) -> bool:
+        return os.path.exists(self._audio_path(url))
+
+    def open_audio(self, url: str):
+        """Binary file object for an audio URL."""
+        try:
+            return open(self._audio_path(url), "rb")
+        except FileNotFoundError:
+            raise CorpusMissError(f"Audio not in local corpus: {audio_key(url)}")
+
+    def copy_audio(self, url: str, out_path: str):
+        src = self._audio_path(url)
+        if not os.path.exists(src):
+            raise CorpusMissError(f"Audio not in local corpus: {audio_key(url)}")
+        tmp = unique_tmp_path(out_path)
+        try:
+            os.link(src, tmp)  # same filesystem: no copy at all
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, out_path)
+
+    def put_audio_file(self, url: str, path: str):
+        dst = self._audio_path(url)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = unique_tmp_path(dst)
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, dst)
+
+    def close(self):
+        pass
+
+# ======================================================
+# SQLITE
+# ======================================================
+
+class SQLiteSource:
+    """Corpus packed into one SQLite file (one connection per thread)."""
+
+    def __init__(self, path: str, offline: bool = True):
+        import sqlite3
+        self._sqlite3 = sqlite3
+        self.path = path
+        self.offline = offline
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        if not offline:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with sqlite3.connect(path) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS api (key TEXT PRIMARY KEY, body TEXT NOT NULL)")
+                conn.execute("CREATE TABLE IF NOT EXISTS audio (key TEXT PRIMARY KEY, data BLOB NOT NULL)")
+        elif not os.path.exists(path):
+            raise FileNotFoundError(f"Corpus not found: {path}")
+
+    def describe(self) -> str:
+        return f"sqlite {self.path}"
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.offline:
+                conn = self._sqlite3.connect(f"file:{quote(os.path.abspath(self.path))}?mode=ro", uri=True)
+            else:
+                conn = self._sqlite3.connect(self.path)
+            self._local.conn = conn
+        return conn
+
+    def _get(self, table: str, column: str, key: str):
+        row = self._conn().execute(f"SELECT {column} FROM {table} WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _put(self, table: str, column: str, key: str, value):
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute(f"INSERT OR REPLACE INTO {table} (key, {column}) VALUES (?, ?)", (key, value))
+            conn.commit()
+
+    def get_json(self, url: str, params=None):
+        body = self._get("api", "body", request_key(url, params))
+        if body is None:
+            raise CorpusMissError(f"Not in local corpus: {request_key(url, params)}")
+        return json.loads(body)
+
+    def put_json(self, url: str, params, data):
+        self._put("api", "body", request_key(url, params), json.dumps(data, ensure_ascii=False))
+
+    def has_audio(self, url: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM audio WHERE key = ?", (audio_key(url),)).fetchone() is not None
+
+    def _audio_bytes(self, url: str) -> bytes:
+        data = self._get("audio", "data", audio_key(url))
+        if data is None:
+            raise CorpusMissError(f"Audio not in local corpus: {audio_key(url)}")
+        return data
+
+    def open_audio(self, url: str):
+        from io import BytesIO
+        return BytesIO(self._audio_bytes(url))
+
+    def copy_audio(self, url: str, out_path: str):
+        tmp = unique_tmp_path(out_path)
+        with open(tmp, "wb") as f:
+            f.write(self._audio_bytes(url))
+        os.replace(tmp, out_path)
+
+    def put_audio_file(self, url: str, path: str):
+        with open(path, "rb") as f:
+            self._put("audio", "data", audio_key(url), f.read())
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+# ======================================================
+# ACTIVE SOURCE
+# ======================================================
+
+def open_source(spec: str, offline: bool = True):
+    """
+    Open "local:/path" (or a bare path). Paths ending in .sqlite/.sqlite3/.db are
+    SQLite corpora, anything else a mirror directory. offline=False opens the
+    corpus for recording (export).
+    """
+    path = spec[len("local:"):] if spec.startswith("local:") else spec
+    if not path:
+        raise ValueError(f"Invalid source '{spec}'. Expected local:/path/to/corpus")
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        return SQLiteSource(path, offline=offline)
+    if offline and not os.path.isdir(path):
+        raise FileNotFoundError(f"Corpus not found: {path} (fill it with --export-corpus)")
+    return MirrorSource(path, offline=offline)
+
+_active_source = None
+
+def set_source(source):
+    """Make `source` the corpus used by every fetch (None = live APIs only)."""
+    global _active_source
+    _active_source = source
+
+def get_source():
+    return _active_source
@@ -0,0 +1,438 @@
+# EBU R128 / ITU-R BS.1770 loudness analysis of full-surah audio files.
+#
+# Install:
+#   python -m pip install numpy scipy mutagen     (and ffmpeg on PATH for decoding)
+#
+# Usage:
+#   python loudness.py output/Mishari_Rashid_al_Afasy/audio
+#   python loudness.py Telegram/Maher_al-Muaiqly --workers 4
+#   python loudness.py output/Mishari_Rashid_al_Afasy/audio --no-tags --target -16
+#
+# Every folder's surah files (001.mp3 ... 114.mp3; per-verse files are skipped)
+# are decoded by ffmpeg into a pipe and measured chunk by chunk: K-weighting
+# with scipy's sosfilt, 400 ms gated blocks, and the true peak from a 4x
+# oversampled signal. Files run in parallel in a process pool. Results are
+# cached in cache/loudness.json by a hash of the audio data (tags excluded, so
+# writing ReplayGain tags does not invalidate them). Each folder gets:
+#   - ReplayGain 2.0 track / album tags (REPLAYGAIN_* TXXX frames, MP3 only)
+#   - loudness.json: per-file loudness, peaks and the gain that brings each
+#     surah to --target LUFS; capcut_template_generator.py --loudness reads it.
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from audio_store import unshare
+from file_lock import unique_tmp_path
+
+# ======================================================
+# CONFIG
+# ======================================================
+CACHE_FILE = os.path.join("cache", "loudness.json")
+REPORT_NAME = "loudness.json"
+ANALYSIS_VERSION = 1
+
+SURAH_FILE_RE = re.compile(r"^(\d{1,3})\.(mp3|m4a|aac|opus|ogg|flac|wav)$", re.IGNORECASE)
+
+SAMPLE_RATE = 48000          # everything is resampled to 48 kHz
+MAX_CHANNELS = 2             # mono stays mono (one channel, like ffmpeg's ebur128); surround is downmixed
+CHUNK_SECONDS = 10           # decoded audio held in memory per read
+SUBBLOCK = SAMPLE_RATE // 10 # 100 ms: 400 ms gating blocks overlap by 75%
+
+ABSOLUTE_GATE = -70.0        # LUFS
+RELATIVE_GATE = -10.0        # LU below the abs-gated loudness
+HIST_STEP = 0.1              # LU per histogram bin (album loudness)
+
+OVERSAMPLE = 4               # true-peak oversampling factor
+TP_MARGIN = 2.0              # skip oversampling chunks whose sample peak is below 1/TP_MARGIN of the peak so far
+TP_EDGE = 16                 # input samples kept around chunk edges for the interpolation filter
+
+REPLAYGAIN_REFERENCE = -18.0 # LUFS (ReplayGain 2.0)
+DEFAULT_TARGET = -14.0       # LUFS for video (YouTube plays at -14)
+PEAK_CEILING = -1.0          # dBTP: target gains never push the true peak above this
+
+# BS.1770 K-weighting at 48 kHz: high-shelf pre-filter + RLB high-pass, as second-order sections
+K_WEIGHTING_SOS = (
+    (1.53512485958697, -2.69169618940638, 1.19839281085285, 1.0, -1.69065929318241, 0.73248077421585),
+    (1.0, -2.0, 1.0, 1.0, -1.99004745483398, 0.99007225036621),
+)
+
+# ======================================================
+# HASHING
+# ======================================================
+
+def audio_sha256(path: str) -> str:
+    """SHA-256 of the audio data only: a leading ID3v2 tag and a trailing ID3v1 tag are skipped."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = 0
+        head = f.read(10)
+        if len(head) == 10 and head[:3] == b"ID3":
+            tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+            start = 10 + tag_size + (10 if head[5] & 0x10 else 0)
+        end = size
+        if size - start >= 128:
+            f.seek(size - 128)
+            if f.read(3) == b"TAG":
+                end = size - 128
+        h = hashlib.sha256()
+        f.seek(start)
+        remaining = max(0, end - start)
+        while remaining:
+            block = f.read(min(remaining, 1 << 20))
+            if not block:
+                break
+            h.update(block)
+            remaining -= len(block)
+    return h.hexdigest()
+
+# ======================================================
+# ANALYSIS (worker processes)
+# ======================================================
+
+def energy_to_lufs(energy: float) -> float:
+    return -0.691 + 10 * math.log10(energy) if energy > 0 else float("-inf")
+
+def probe_channels(path: str) -> int:
+    """Channel count to decode to (1 or 2)."""
+    import mutagen
+
+    try:
+        info = mutagen.File(path).info
+        return max(1, min(MAX_CHANNELS, int(info.channels)))
+    except Exception:
+        return MAX_CHANNELS
+
+def decode_chunks(path: str, ffmpeg: str, channels: int, sample_rate: int = SAMPLE_RATE):
+    """Yield float32 (frames, channels) arrays decoded by ffmpeg through a pipe."""
+    import numpy as np
+
+    cmd = [ffmpeg, "-v", "error", "-nostdin", "-i", path, "-map", "0:a:0",
+           "-f", "f32le", "-ac", str(channels), "-ar", str(sample_rate), "-"]
+    frame_bytes = 4 * channels
+    chunk_bytes = CHUNK_SECONDS * sample_rate * frame_bytes
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        pending = b""
+        while True:
+            data = proc.stdout.read(chunk_bytes)
+            if not data:
+                break
+            data = pending + data
+            usable = len(data) - len(data) % frame_bytes
+            pending = data[usable:]
+            if usable:
+                yield np.frombuffer(data[:usable], dtype="<f4").reshape(-1, channels)
+        stderr = proc.stderr.read().decode("utf-8", "replace").strip()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed on {path}: {stderr[-300:]}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+class TruePeakMeter:
+    """Running true peak over a chunked signal (polyphase 4x oversampling)."""
+
+    def __init__(self, channels: int):
+        import numpy as np
+        self._np = np
+        self.peak = 0.0
+        self._hist = np.zeros((0, channels), dtype=np.float32)
+
+    def _scan(self, buf, first: int, last: int):
+        from scipy.signal import resample_poly
+
+        if last <= first:
+            return
+        up = resample_poly(buf, OVERSAMPLE, 1, axis=0)
+        self.peak = max(self.peak, float(self._np.abs(up[OVERSAMPLE * first:OVERSAMPLE * last]).max()))
+
+    def add(self, x):
+        np = self._np
+        sample_peak = float(np.abs(x).max()) if len(x) else 0.0
+        self.peak = max(self.peak, sample_peak)
+        buf = np.concatenate((self._hist, x))
+        # Inter-sample peaks exceed the sample peak by a few dB at most: quiet chunks can't raise the maximum
+        if sample_peak * TP_MARGIN > self.peak:
+            # Outputs within TP_EDGE samples of either end are distorted by the filter's zero padding;
+            # the right edge is rescanned with the next chunk (it stays in the history)
+            self._scan(buf, max(0, len(self._hist) - TP_EDGE), len(buf) - TP_EDGE)
+        self._hist = buf[-2 * TP_EDGE:]
+
+    def finish(self) -> float:
+        self._scan(self._hist, max(0, len(self._hist) - TP_EDGE), len(self._hist))
+        return self.peak
+
+def analyze_file(path: str, ffmpeg: str) -> dict:
+    """Integrated loudness, true peak, duration and a block-loudness histogram for one file."""
+    import numpy as np
+    from scipy.signal import sosfilt
+
+    channels = probe_channels(path)
+    sos = np.array(K_WEIGHTING_SOS)
+    zi = np.zeros((len(sos), 2, channels))
+    carry = np.zeros((0, channels))
+    subblocks = []
+    meter = TruePeakMeter(channels)
+    frames = 0
+
+    for x in decode_chunks(path, ffmpeg, channels):
+        frames += len(x)
+        meter.add(x)
+        y, zi = sosfilt(sos, x, axis=0, zi=zi)
+        y = np.concatenate((carry, y))
+        whole = len(y) // SUBBLOCK * SUBBLOCK
+        if whole:
+            # Mean square per 100 ms, summed over channels (L/R weights are 1.0)
+            sq = np.square(y[:whole]).reshape(-1, SUBBLOCK, channels)
+            subblocks.append(sq.mean(axis=1).sum(axis=1))
+        carry = y[whole:]
+
+    s = np.concatenate(subblocks) if subblocks else np.zeros(0)
+    blocks = np.convolve(s, np.full(4, 0.25), mode="valid") if len(s) >= 4 else s[:0]
+    with np.errstate(divide="ignore"):
+        block_lufs = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[block_lufs >= ABSOLUTE_GATE]
+    integrated = float("-inf")
+    if len(gated):
+        threshold = energy_to_lufs(float(gated.mean())) + RELATIVE_GATE
+        kept = blocks[block_lufs >= max(ABSOLUTE_GATE, threshold)]
+        integrated = energy_to_lufs(float(kept.mean()))
+
+    # Histogram of abs-gated blocks for album loudness: bin -> [count, energy sum]
+    bins = np.floor((block_lufs[block_lufs >= ABSOLUTE_GATE] - ABSOLUTE_GATE) / HIST_STEP).astype(int)
+    counts = np.bincount(bins) if len(bins) else np.zeros(0, dtype=int)
+    sums = np.bincount(bins, weights=gated) if len(bins) else np.zeros(0)
+    hist = [[int(b), int(counts[b]), float(sums[b])] for b in np.flatnonzero(counts)]
+
+    true_peak = meter.finish()
+    return {
+        "version": ANALYSIS_VERSION,
+        "duration_s": round(frames / SAMPLE_RATE, 3),
+        "integrated_lufs": round(integrated, 2) if integrated != float("-inf") else None,
+        "true_peak": round(true_peak, 6),
+        "true_peak_dbtp": round(20 * math.log10(true_peak), 2) if true_peak > 0 else None,
+        "hist": hist,
+    }
+
+def analyze_job(job):
+    try:
+        return job, analyze_file(job["path"], job["ffmpeg"]), None
+    except Exception as e:
+        return job, None, str(e)
+
+# ======================================================
+# GAINS
+# ======================================================
+
+def album_loudness(hists) -> float:
+    """Integrated loudness over every file's blocks, from their histograms (0.1 LU resolution at the gate)."""
+    counts, sums = {}, {}
+    for hist in hists:
+        for b, n, e in hist:
+            counts[b] = counts.get(b, 0) + n
+            sums[b] = sums.get(b, 0.0) + e
+    total = sum(counts.values())
+    if not total:
+        return None
+    threshold = energy_to_lufs(sum(sums.values()) / total) + RELATIVE_GATE
+    kept = [b for b in counts if ABSOLUTE_GATE + (b + 0.5) * HIST_STEP >= threshold]
+    n = sum(counts[b] for b in kept)
+    return round(energy_to_lufs(sum(sums[b] for b in kept) / n), 2) if n else None
+
+def gain_to(target: float, lufs, true_peak: float, ceiling: float = PEAK_CEILING):
+    """Gain in dB that moves `lufs` to `target` without the true peak passing `ceiling` dBTP."""
+    if lufs is None:
+        return 0.0
+    gain = target - lufs
+    if true_peak > 0:
+        gain = min(gain, ceiling - 20 * math.log10(true_peak))
+    return round(gain, 2)
+
+# ======================================================
+# CACHE / TAGS / REPORT
+# ======================================================
+
+def load_cache(path: str = CACHE_FILE) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache.setdefault("files", {})    # abs path -> {"size", "mtime", "sha256"}
+    cache.setdefault("results", {})  # sha256 -> analysis
+    return cache
+
+def save_json(path: str, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_file = unique_tmp_path(path)
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_file, path)
+
+def file_hash(cache: dict, path: str) -> str:
+    """Audio hash, reused from the cache while size and mtime are unchanged."""
+    st = os.stat(path)
+    key = os.path.abspath(path)
+    known = cache["files"].get(key)
+    if known and known["size"] == st.st_size and known["mtime"] == st.st_mtime:
+        return known["sha256"]
+    sha = audio_sha256(path)
+    cache["files"][key] = {"size": st.st_size, "mtime": st.st_mtime, "sha256": sha}
+    return sha
+
+def write_replaygain_tags(path: str, track_gain: float, track_peak: float, album_gain: float, album_peak: float) -> bool:
+    """Write REPLAYGAIN_* TXXX frames into an MP3 (other formats are left alone)."""
+    if not path.lower().endswith(".mp3"):
+        return False
+    from mutagen.id3 import ID3, TXXX, ID3NoHeaderError
+
+    unshare(path)  # do not retag a blob shared through the audio store
+    try:
+        tags = ID3(path)
+    except ID3NoHeaderError:
+        tags = ID3()
+    values = {
+        "REPLAYGAIN_TRACK_GAIN": f"{track_gain:+.2f} dB",
+        "REPLAYGAIN_TRACK_PEAK": f"{track_peak:.6f}",
+        "REPLAYGAIN_ALBUM_GAIN": f"{album_gain:+.2f} dB",
+        "REPLAYGAIN_ALBUM_PEAK": f"{album_peak:.6f}",
+        "REPLAYGAIN_REFERENCE_LOUDNESS": f"{REPLAYGAIN_REFERENCE:.1f} LUFS",
+    }
+    for desc, value in values.items():
+        tags.delall(f"TXXX:{desc}")
+        tags.add(TXXX(encoding=3, desc=desc, text=value))
+    tags.save(path)
+    return True
+
+def build_report(folder: str, results: dict, target: float) -> dict:
+    """loudness.json content for one folder; `results` maps file name -> analysis (+ sha256)."""
+    album = album_loudness(r["hist"] for r in results.values())
+    album_peak = max((r["true_peak"] for r in results.values()), default=0.0)
+    files = {}
+    for name, r in sorted(results.items()):
+        files[name] = {
+            "surah": int(SURAH_FILE_RE.match(name).group(1)),
+            "sha256": r["sha256"],
+            "duration_s": r["duration_s"],
+            "integrated_lufs": r["integrated_lufs"],
+            "true_peak_dbtp": r["true_peak_dbtp"],
+            "replaygain_track_gain_db": gain_to(REPLAYGAIN_REFERENCE, r["integrated_lufs"], 0.0),
+            "target_gain_db": gain_to(target, r["integrated_lufs"], r["true_peak"]),
+        }
+    return {
+        "version": ANALYSIS_VERSION,
+        "folder": os.path.abspath(folder),
+        "target_lufs": target,
+        "peak_ceiling_dbtp": PEAK_CEILING,
+        "replaygain_reference_lufs": REPLAYGAIN_REFERENCE,
+        "album": {
+            "integrated_lufs": album,
+            "true_peak_dbtp": round(20 * math.log10(album_peak), 2) if album_peak > 0 else None,
+            "replaygain_album_gain_db": gain_to(REPLAYGAIN_REFERENCE, album, 0.0),
+        },
+        "files": files,
+    }
+
+def load_report(path: str) -> dict:
+    """{surah: target_gain_db} from a loudness.json (path to the file or its folder)."""
+    if os.path.isdir(path):
+        path = os.path.join(path, REPORT_NAME)
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    return {entry["surah"]: entry["target_gain_db"] for entry in report["files"].values()}
+
+# ======================================================
+# BATCH
+# ======================================================
+
+def surah_files(folder: str):
+    return sorted(name for name in os.listdir(folder) if SURAH_FILE_RE.match(name))
+
+def analyze_folders(folders, workers: int = None, target: float = DEFAULT_TARGET, tags: bool = True,
+                    force: bool = False, cache_path: str = CACHE_FILE):
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not found on PATH")
+    cache = load_cache(cache_path)
+    results = {folder: {} for folder in folders}
+    jobs, cached = [], 0
+    for folder in folders:
+        for name in surah_files(folder):
+            path = os.path.join(folder, name)
+            sha = file_hash(cache, path)
+            known = cache["results"].get(sha)
+            if known and known.get("version") == ANALYSIS_VERSION and not force:
+                results[folder][name] = dict(known, sha256=sha)
+                cached += 1
+            else:
+                jobs.append({"folder": folder, "name": name, "path": path, "sha256": sha, "ffmpeg": ffmpeg})
+
+    print(f"🔊 {len(jobs)} file(s) to analyse, {cached} from cache")
+    started, failed = time.time(), 0
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in as_completed([pool.submit(analyze_job, job) for job in jobs]):
+                job, result, error = future.result()
+                if error:
+                    failed += 1
+                    print(f"❌ {job['path']}: {error}")
+                    continue
+                cache["results"][job["sha256"]] = result
+                results[job["folder"]][job["name"]] = dict(result, sha256=job["sha256"])
+                print(f"✅ {job['path']}: {result['integrated_lufs']} LUFS, {result['true_peak_dbtp']} dBTP")
+        save_json(cache_path, cache)
+        print(f"⏱️ Analysed {len(jobs) - failed} file(s) in {time.time() - started:.1f}s")
+
+    for folder, folder_results in results.items():
+        if not folder_results:
+            print(f"⚠️ No surah audio files in {folder}")
+            continue
+        report = build_report(folder, folder_results, target)
+        save_json(os.path.join(folder, REPORT_NAME), report)
+        album = report["album"]
+        print(f"📄 {os.path.join(folder, REPORT_NAME)}: album {album['integrated_lufs']} LUFS, "
+              f"{album['true_peak_dbtp']} dBTP")
+        if tags:
+            album_peak = max(r["true_peak"] for r in folder_results.values())
+            tagged = 0
+            for name, r in folder_results.items():
+                path = os.path.join(folder, name)
+                entry = report["files"][name]
+                tagged += write_replaygain_tags(path, entry["replaygain_track_gain_db"], r["true_peak"],
+                                                album["replaygain_album_gain_db"], album_peak)
+                file_hash(cache, path)  # tags changed size/mtime, not the audio hash
+            print(f"🏷️ ReplayGain tags written to {tagged} file(s)")
+    save_json(cache_path, cache)
+    return results
+
+# ======================================================
+# CLI
+# ======================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure EBU R128 loudness of surah audio and write ReplayGain tags.")
+    parser.add_argument("folders", nargs="+", help="Folders with 001.mp3 ... 114.mp3 (output/<reciter>/audio, Telegram downloads)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count)")
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET,
+                        help=f"Loudness for target_gain_db in the report, LUFS (default: {DEFAULT_TARGET})")
+    parser.add_argument("--no-tags", action="store_true", help="Only write the report, leave the files untouched")
+    parser.add_argument("--force", action="store_true", help="Re-analyse files already in the cache")
+    parser.add_argument("--cache", default=CACHE_FILE, help=f"Analysis cache (default: {CACHE_FILE})")
+    args = parser.parse_args()
+
+    for folder in args.folders:
+        if not os.path.isdir(folder):
+            parser.error(f"Folder not found: {folder}")
+    analyze_folders(args.folders, args.workers, args.target, not args.no_tags, args.force, args.cache)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+# Static Quran structure: ayah counts, cumulative ayah offsets, juz boundaries,
+# the Madani mushaf page each surah and juz starts on, and surah names (Uzbek,
+# English, Arabic). Used to validate input and plan juz / range / shard work
+# without any network lookups. Page data is limited to those surah and juz
+# start pages: there is no per-page (page -> first ayah) table for the 604 pages.
+#
+# The data lives in data/quran_metadata.tsv (editable source) and is packed into
+# data/quran_metadata.bin, which is read on first use (a few KB, one struct pass):
+#   python quran_metadata.py --build      # rebuild the .bin after editing the .tsv
+#   python quran_metadata.py --check      # verify the .bin matches the .tsv
+#   python quran_metadata.py --surah 36   # print one surah's metadata
+#
+# Constants such as AYAH_COUNTS or SURAH_NAMES_UZ are loaded lazily on first
+# attribute access (`from quran_metadata import AYAH_COUNTS` works as before).
+
+import argparse
+import os
+import struct
+import sys
+from bisect import bisect_right
+from functools import lru_cache
+
+# ======================================================
+# CONFIG
+# ======================================================
+TOTAL_SURAHS = 114
+TOTAL_JUZ = 30
+TOTAL_PAGES = 604
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SOURCE_FILE = os.path.join(DATA_DIR, "quran_metadata.tsv")
+PACKED_FILE = os.path.join(DATA_DIR, "quran_metadata.bin")
+
+MAGIC = b"QMD1"
+_HEADER = struct.Struct("<4sHH")        # magic, surahs, juz
+_SURAH = struct.Struct("<HHH")          # ayahs, start page, ayahs before this surah
+_JUZ = struct.Struct("<HHH")            # start surah, start ayah, start page
+
+NAME_LANGUAGES = ("uz", "en", "ar")
+ALBUM_TITLE = "The Holy Qur'an | Quroni Karim | القرآن الكريم"
+
+# ======================================================
+# LOADING
+# ======================================================
+
+class _Metadata:
+    def __init__(self, surahs, juz):
+        # surahs: [(ayahs, start_page, name_uz, name_en, name_ar)], juz: [(surah, ayah, start_page)]
+        self.ayah_counts = tuple(s[0] for s in surahs)
+        self.surah_start_pages = tuple(s[1] for s in surahs)
+        self.names = {lang: tuple(s[2 + k] for s in surahs) for k, lang in enumerate(NAME_LANGUAGES)}
+        offsets, total = [], 0
+        for count in self.ayah_counts:
+            offsets.append(total)
+            total += count
+        self.ayah_offsets = tuple(offsets)
+        self.total_ayahs = total
+        self.juz_starts = tuple((s, a) for s, a, _ in juz)
+        self.juz_start_pages = tuple(p for _, _, p in juz)
+        if len(surahs) != TOTAL_SURAHS or len(juz) != TOTAL_JUZ:
+            raise ValueError(f"Metadata must have {TOTAL_SURAHS} surahs and {TOTAL_JUZ} juz")
+
+def read_source(path: str = SOURCE_FILE):
+    """Parse the TSV source into (surahs, juz) row lists."""
+    surahs, juz = [], []
+    section = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("["):
+                section, header = line.strip("[]"), True
+                continue
+            if header:  # column names
+                header = False
+                continue
+            cols = line.split("\t")
+            if section == "surahs":
+                surahs.append((int(cols[1]), int(cols[2]), cols[3], cols[4], cols[5]))
+            elif section == "juz":
+                juz.append((int(cols[1]), int(cols[2]), int(cols[3])))
+    return surahs, juz
+
+def pack(surahs, juz) -> bytes:
+    out = bytearray(_HEADER.pack(MAGIC, len(surahs), len(juz)))
+    before = 0
+    for ayahs, page, *_ in surahs:
+        out += _SURAH.pack(ayahs, page, before)
+        before += ayahs
+    for row in juz:
+        out += _JUZ.pack(*row)
+    # Names: one length-prefixed UTF-8 string per surah and language
+    for lang_index in range(len(NAME_LANGUAGES)):
+        for row in surahs:
+            encoded = row[2 + lang_index].encode("utf-8")
+            out += struct.pack("<B", len(encoded)) + encoded
+    return bytes(out)
+
+def unpack(data: bytes):
+    magic, n_surahs, n_juz = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a Quran metadata file")
+    pos = _HEADER.size
+    numbers = [_SURAH.unpack_from(data, pos + i * _SURAH.size) for i in range(n_surahs)]
+    pos += n_surahs * _SURAH.size
+    juz = [_JUZ.unpack_from(data, pos + i * _JUZ.size) for i in range(n_juz)]
+    pos += n_juz * _JUZ.size
+    names = []
+    for _ in NAME_LANGUAGES:
+        column = []
+        for _ in range(n_surahs):
+            length = data[pos]
+            column.append(data[pos + 1:pos + 1 + length].decode("utf-8"))
+            pos += 1 + length
+        names.append(column)
+    surahs = [(ayahs, page) + tuple(col[i] for col in names) for i, (ayahs, page, _) in enumerate(numbers)]
+    return surahs, juz
+
+@lru_cache(maxsize=None)
+def _meta() -> _Metadata:
+    try:
+        with open(PACKED_FILE, "rb") as f:
+            return _Metadata(*unpack(f.read()))
+    except FileNotFoundError:
+        return _Metadata(*read_source())
+
+_LAZY = {
+    "AYAH_COUNTS": lambda m: m.ayah_counts,
+    "AYAH_OFFSETS": lambda m: m.ayah_offsets,
+    "TOTAL_AYAHS": lambda m: m.total_ayahs,
+    "JUZ_STARTS": lambda m: m.juz_starts,
+    "JUZ_START_PAGES": lambda m: m.juz_start_pages,
+    "SURAH_START_PAGES": lambda m: m.surah_start_pages,
+    "SURAH_NAMES_UZ": lambda m: m.names["uz"],
+    "SURAH_NAMES_EN": lambda m: m.names["en"],
+    "SURAH_NAMES_AR": lambda m: m.names["ar"],
+}
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = _LAZY[name](_meta())
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ======================================================
+# LOOKUPS
+# ======================================================
+
+def validate_surah(surah: int):
+    if not 1 <= surah <= TOTAL_SURAHS:
+        raise ValueError(f"Surah must be 1-{TOTAL_SURAHS}, got {surah}")
+
+
+def ayah_count(surah: int) -> int:
+    validate_surah(surah)
+    return _meta().ayah_counts[surah - 1]
+
+
+def validate_verse(surah: int, ayah: int):
+    if not 1 <= ayah <= ayah_count(surah):
+        raise ValueError(f"Surah {surah} has {ayah_count(surah)} ayahs, got ayah {ayah}")
+
+
+def surah_name(surah: int, lang: str = "uz") -> str:
+    validate_surah(surah)
+    return _meta().names[lang][surah - 1]
+
+
+def surah_title(surah: int) -> str:
+    """Trilingual track title: "036. Ya-Sin | Yosin surasi | يس"."""
+    validate_surah(surah)
+    names = _meta().names
+    return f"{surah:03}. {names['en'][surah - 1]} | {names['uz'][surah - 1]} surasi | {names['ar'][surah - 1]}"
+
+
+def ayah_index(surah: int, ayah: int) -> int:
+    """0-based position of an ayah in the whole Quran (0..6235)."""
+    validate_verse(surah, ayah)
+    return _meta().ayah_offsets[surah - 1] + ayah - 1
+
+
+def verse_at_index(index: int):
+    """Inverse of ayah_index: (surah, ayah) for a 0-based global ayah index."""
+    m = _meta()
+    if not 0 <= index < m.total_ayahs:
+        raise ValueError(f"Ayah index must be 0-{m.total_ayahs - 1}, got {index}")
+    surah = bisect_right(m.ayah_offsets, index)
+    return surah, index - m.ayah_offsets[surah - 1] + 1
+
+
+def juz_of(surah: int, ayah: int = 1) -> int:
+    validate_verse(surah, ayah)
+    return bisect_right(_meta().juz_starts, (surah, ayah))
+
+
+def surah_start_page(surah: int) -> int:
+    """Madani mushaf page on which a surah begins."""
+    validate_surah(surah)
+    return _meta().surah_start_pages[surah - 1]
+
+
+def juz_start_page(juz: int) -> int:
+    if not 1 <= juz <= TOTAL_JUZ:
+        raise ValueError(f"Juz must be 1-{TOTAL_JUZ}, got {juz}")
+    return _meta().juz_start_pages[juz - 1]
+
+
+def juz_bounds(juz: int):
+    """Return ((start_surah, start_ayah), (end_surah, end_ayah)) for a juz (inclusive)."""
+    if not 1 <= juz <= TOTAL_JUZ:
+        raise ValueError(f"Juz must be 1-{TOTAL_JUZ}, got {juz}")
+    m = _meta()
+    start = m.juz_starts[juz - 1]
+    if juz == TOTAL_JUZ:
+        return start, (TOTAL_SURAHS, m.ayah_counts[-1])
+    next_surah, next_ayah = m.juz_starts[juz]
+    if next_ayah > 1:
+        return start, (next_surah, next_ayah - 1)
+    return start, (next_surah - 1, m.ayah_counts[next_surah - 2])
+
+
+def parse_range(value: str):
+    """Parse "78:1-114:6" (or "78-114" for whole surahs) into ((s, a), (s, a))."""
+    try:
+        left, right = value.strip().split("-")
+        start = [int(x) for x in left.split(":")]
+        end = [int(x) for x in right.split(":")]
+    except ValueError:
+        raise ValueError(f"Invalid range '{value}'. Expected e.g. 78:1-114:6")
+    if len(start) == 1:
+        start.append(1)
+    if len(end) == 1:
+        end.append(ayah_count(end[0]))
+    start, end = tuple(start), tuple(end)
+    validate_verse(*start)
+    validate_verse(*end)
+    if start > end:
+        raise ValueError(f"Range start {start[0]}:{start[1]} is after end {end[0]}:{end[1]}")
+    return start, end
+
+
+def parse_surah_list(value: str):
+    """Parse "1-114", "1,36,67" or "78-80,112" into a sorted list of surah numbers."""
+    surahs = set()
+    for part in (value or "").split(","):
+        part = part.strip()
+        if "-" in part:
+            lo, hi = (int(x) for x in part.split("-"))
+            surahs.update(range(lo, hi + 1))
+        elif part:
+            surahs.add(int(part))
+    if any(not 1 <= s <= TOTAL_SURAHS for s in surahs):
+        raise ValueError(f"Surahs must be 1-{TOTAL_SURAHS}")
+    return sorted(surahs)
+
+
+def iter_range_segments(start, end):
+    """Yield (surah, first_ayah, last_ayah) for every surah touched by an inclusive range."""
+    counts = _meta().ayah_counts
+    (s0, a0), (s1, a1) = start, end
+    for surah in range(s0, s1 + 1):
+        first = a0 if surah == s0 else 1
+        last = a1 if surah == s1 else counts[surah - 1]
+        yield surah, first, last
+
+# ======================================================
+# CLI
+# ======================================================
+
+def build(source: str = SOURCE_FILE, target: str = PACKED_FILE) -> str:
+    data = pack(*read_source(source))
+    _Metadata(*unpack(data))  # validate before replacing
+    tmp = target + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, target)
+    return target
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, check or query the packed Quran metadata.")
+    parser.add_argument("--build", action="store_true", help=f"Pack {SOURCE_FILE} into {PACKED_FILE}")
+    parser.add_argument("--check", action="store_true", help="Verify the packed file matches the TSV source")
+    parser.add_argument("--surah", type=int, help="Print metadata for one surah")
+    args = parser.parse_args()
+
+    if args.build:
+        path = build()
+        print(f"✅ Wrote {path} ({os.path.getsize(path)} bytes)")
+    elif args.check:
+        with open(PACKED_FILE, "rb") as f:
+            packed = f.read()
+        if packed != pack(*read_source()):
+            print(f"❌ {PACKED_FILE} is out of date; run: python quran_metadata.py --build")
+            sys.exit(1)
+        print(f"✅ {PACKED_FILE} matches {SOURCE_FILE}")
+    elif args.surah:
+        s = args.surah
+        try:
+            count = ayah_count(s)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"{s}. {surah_name(s, 'uz')} | {surah_name(s, 'en')} | {surah_name(s, 'ar')}")
+        print(f"   Ayahs: {count} (global {ayah_index(s, 1) + 1}-{ayah_index(s, count) + 1})")
+        print(f"   Juz: {juz_of(s, 1)}-{juz_of(s, count)}, starts on page {surah_start_page(s)}")
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
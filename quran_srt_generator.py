@@ -11,6 +11,10 @@
 #   python quran_srt_generator.py --h
 #   python quran_srt_generator.py --list-reciters
 #   python quran_srt_generator.py --list-translations
+#   python quran_srt_generator.py --export-corpus cache/corpus --all --reciter 7 --download-audio
+#   python quran_srt_generator.py --offline --all --reciter 7
+#   python quran_srt_generator.py --all --reciter 7 --download-audio --audio-store
+#   python quran_srt_generator.py --all --reciter 7 --bundle sqlite
 
 # Reciter IDs reference (from Quran.com API):
 # | ID | Reciter Name               | Style    |
@@ -30,17 +34,32 @@
 
 import argparse
 import csv
+import io
 import os
 import re
+import shutil
+import threading
 import time
 import json
-import requests
-import tempfile
-from io import BytesIO
-from mutagen import File as MutagenFile
 from urllib.parse import urljoin
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from contextlib import nullcontext
+
+from audio_store import STORE_DIR as AUDIO_STORE_DIR, AudioStore, get_store, set_store
+from catalog_cache import cached_catalog
+from catalog_index import CatalogIndex, load_index
+from file_lock import exclusive_lock, unique_tmp_path
+from http_scheduler import get_scheduler
+from http_transport import TRANSPORT_RETRIES, create_session, get_session
+from instrumentation import EVENTS_FILE as METRICS_EVENTS_FILE, metrics, profile_call
+from local_source import DEFAULT_CORPUS, get_source, open_source, set_source
+from uz_translit import to_latin
+from quran_metadata import TOTAL_JUZ, TOTAL_SURAHS, ayah_count, iter_range_segments, juz_bounds, parse_range
+from subtitle_bundle import BUNDLE_FORMATS, BundleCollector, bundle_path
+from sharding import WorkClaims, WorkQueue, assign_shards, options_key, parse_shard, plan_items
+from subtitle_formats import SUPPORTED_FORMATS, emit_subtitles, ms_to_srt, parse_formats, write_surah_subtitles
+from subtitle_wrap import DEFAULT_MAX_LINES, wrap_tracks
+from text_normalize import clean_batch, number_arabic, rules_for, rules_tag, strip_html_batch
+from timing_store import save_surah_timings, store_path as timing_store_path
 
 # ======================================================
 # CONFIG
@@ -70,6 +89,10 @@ _translation_lookup_cache = {}
 # Duration Cache (Fallback mode)
 CACHE_DIR = "cache"
 DURATION_CACHE_FILE = os.path.join(CACHE_DIR, "audio_durations.json")
+_duration_cache_lock = threading.Lock()
+
+# Per-surah texts + timings, reused by later runs and by --juz / --range
+SURAH_CACHE_DIR = os.path.join(CACHE_DIR, "surahs")
 
 # ======================================================
 # UTILITIES
@@ -79,31 +102,41 @@ def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
 
-def create_session_with_retries(total_retries=3, backoff_factor=0.3, status_forcelist=(500, 502, 504)):
-    session = requests.Session()
-    retries = Retry(total=total_retries, backoff_factor=backoff_factor, status_forcelist=status_forcelist, allowed_methods=frozenset(['GET', 'POST']))
-    adapter = HTTPAdapter(max_retries=retries)
-    session.mount('https://', adapter)
-    session.mount('http://', adapter)
-    return session
-
-def ms_to_srt(ms: int) -> str:
-    s = ms // 1000
-    ms = ms % 1000
-    m = s // 60
-    s = s % 60
-    h = m // 60
-    m = m % 60
-    return f"{h:02}:{m:02}:{s:02},{ms:03}"
+def create_session_with_retries(total_retries=TRANSPORT_RETRIES, backoff_factor=0.3, status_forcelist=()):
+    # No transport retries by default: connection errors, HTTP 429/5xx (and
+    # Retry-After) are retried by http_scheduler, which also adapts per-host rate
+    # and concurrency.
+    # The client (HTTP/2 via httpx, or requests) is picked by http_transport.
+    return create_session(total_retries=total_retries, backoff_factor=backoff_factor, status_forcelist=status_forcelist)
 
 def request_json(url: str, params=None, timeout=DEFAULT_TIMEOUT, session=None):
-    sess = session or requests
-    r = sess.get(url, params=params, timeout=timeout)
+    # Offline: answer from the local corpus (a miss raises like a failed request)
+    source = get_source()
+    if source is not None and source.offline:
+        return source.get_json(url, params)
+    sess = session or get_session()
+    r = get_scheduler().get(sess, url, params=params, timeout=timeout)
     r.raise_for_status()
-    return r.json()
+    metrics.add_bytes("api", len(r.content))
+    data = r.json()
+    if source is not None:  # --export-corpus: record the raw response
+        source.put_json(url, params, data)
+    return data
 
-def strip_html(text: str) -> str:
-    return re.sub(r"<[^>]+>", "", text or "").strip()
+def fetch_paginated(url: str, key: str, expected: int, params=None, session=None):
+    """
+    Collect `key` items across result pages. The expected count comes from the
+    bundled metadata, so a complete first page needs no further requests.
+    """
+    items, page = [], 1
+    while True:
+        data = request_json(url, params={**(params or {}), "page": page}, session=session)
+        batch = data.get(key) or []
+        items.extend(batch)
+        next_page = (data.get("pagination") or {}).get("next_page")
+        if len(items) >= expected or not batch or not next_page:
+            return items
+        page = next_page
 
 def safe_folder_name(name: str) -> str:
     if not name:
@@ -139,7 +172,7 @@ def normalize_verse_audio_url(url_path: str) -> str:
     return BASE_VERSES_AUDIO + url_path
 
 # ======================================================
-# CACHE (Fallback durations)
+# CACHE (Fallback durations, per-surah texts + timings)
 # ======================================================
 
 def load_duration_cache():
@@ -153,33 +186,54 @@ def load_duration_cache():
         return {}
 
 def save_duration_cache(cache: dict):
-    ensure_dir(CACHE_DIR)
-    tmp_file = DURATION_CACHE_FILE + ".tmp"
-    with open(tmp_file, "w", encoding="utf-8") as f:
-        json.dump(cache, f, ensure_ascii=False, indent=2)
-    os.replace(tmp_file, DURATION_CACHE_FILE)
+    # Parallel surahs each hold their own copy: merge with what is on disk
+    # (and, for a cache/ folder shared between nodes, with other processes via a lock file)
+    with _duration_cache_lock, exclusive_lock(DURATION_CACHE_FILE):
+        merged = load_duration_cache()
+        merged.update(cache)
+        tmp_file = unique_tmp_path(DURATION_CACHE_FILE)
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, DURATION_CACHE_FILE)
+
+def surah_cache_path(surah: int, reciter_id: int, translation_id: int, clean_translation=True, add_numbers=True,
+                     latin=False) -> str:
+    variant = (("clean" + rules_tag(rules_for(translation_id))) if clean_translation else "raw") \
+        + ("_numbered" if add_numbers else "") + ("_latin" if latin else "")
+    return os.path.join(SURAH_CACHE_DIR, str(reciter_id), str(translation_id), variant, f"{surah:03}.json")
 
 # ======================================================
-# CLEAN TRANSLATION TEXT
+# CATALOG SNAPSHOTS
 # ======================================================
 
-def clean_translation_text(text: str) -> str:
-    if not text:
-        return ""
-    text = strip_html(text)
-    # Remove square-bracket footnotes but preserve parenthetical text
-    text = re.sub(r"\[.*?\]", "", text)
-    text = re.sub(r"[¹²³⁴⁵⁶⁷⁸⁹⁰]+", "", text)
-    text = re.sub(r"\s*\d+\s*$", "", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+def fetch_catalog(name: str, url: str, session=None, refresh=False):
+    """
+    Reciter / translation list from its snapshot in cache/catalog/ (see
+    catalog_cache; a stale one is served while it is refetched in the
+    background). A local corpus (--offline / --export-corpus) always goes
+    through request_json instead.
+    """
+    if get_source() is not None:
+        return request_json(url, session=session)
+    return cached_catalog(name, lambda: request_json(url, session=session), refresh=refresh, background=True)
+
+def get_catalog_index(kind: str, session=None, refresh=False) -> CatalogIndex:
+    """
+    Name index for "reciters" or "translations" (see catalog_index); lookups
+    need no network once the snapshot exists. Built in memory from the corpus
+    with --offline / --export-corpus.
+    """
+    url = QURANCOM_RECITERS_API if kind == "reciters" else QURANCOM_TRANSLATIONS_API
+    if get_source() is not None:
+        return CatalogIndex.build(kind, request_json(url, session=session))
+    return load_index(kind, fetch=lambda: request_json(url, session=session), refresh=refresh)
 
 # ======================================================
 # RECITERS
 # ======================================================
 
-def list_reciters(session=None):
-    data = request_json(QURANCOM_RECITERS_API, session=session)
+def list_reciters(session=None, refresh=False):
+    data = fetch_catalog("reciters", QURANCOM_RECITERS_API, session=session, refresh=refresh)
     reciters = data.get("recitations") or []
     print("\n---- RECITERS (QURAN.COM) ----")
     for r in reciters:
@@ -192,14 +246,12 @@ def get_reciter_name(reciter_id: int, session=None) -> str:
     if reciter_id in _reciter_name_cache:
         return _reciter_name_cache[reciter_id]
 
-    data = request_json(QURANCOM_RECITERS_API, session=session)
-    reciters = data.get("recitations") or []
-    name = f"reciter_{reciter_id}"
-    for r in reciters:
-        if r.get("id") == reciter_id:
-            name = r.get("reciter_name") or name
-            break
+    entry = get_catalog_index("reciters", session=session).get(reciter_id)
+    if entry is None and get_source() is None:
+        # A reciter added after the snapshot was taken triggers one refetch
+        entry = get_catalog_index("reciters", session=session, refresh=True).get(reciter_id)
 
+    name = (entry or {}).get("name") or f"reciter_{reciter_id}"
     _reciter_name_cache[reciter_id] = name
     return name
 
@@ -207,8 +259,8 @@ def get_reciter_name(reciter_id: int, session=None) -> str:
 # TRANSLATIONS
 # ======================================================
 
-def list_translations(session=None):
-    data = request_json(QURANCOM_TRANSLATIONS_API, session=session)
+def list_translations(session=None, refresh=False):
+    data = fetch_catalog("translations", QURANCOM_TRANSLATIONS_API, session=session, refresh=refresh)
     translations = data.get("translations") or []
     print("\n---- TRANSLATIONS (ALL LANGUAGES) ----")
     for t in translations:
@@ -219,28 +271,26 @@ def find_translation_id(translator_query: str, session=None):
     if key in _translation_lookup_cache:
         return _translation_lookup_cache[key]
 
-    data = request_json(QURANCOM_TRANSLATIONS_API, session=session)
-    translations = data.get("translations") or []
-    if not translations:
+    # Exact name first, then the first name containing the query (both normalized)
+    index = get_catalog_index("translations", session=session)
+    t = index.find(translator_query)
+    if t is None and get_source() is None:
+        # A translation added after the snapshot was taken triggers one refetch
+        index = get_catalog_index("translations", session=session, refresh=True)
+        t = index.find(translator_query)
+    if not index.entries:
         raise RuntimeError("No translations returned from Quran.com.")
-
-    q = key
-
-    for t in translations:
-        name = (t.get("name") or "").strip().lower()
-        if name == q:
-            result = (t["id"], t["name"], t.get("language_name", ""))
-            _translation_lookup_cache[key] = result
-            return result
-
-    for t in translations:
-        name = (t.get("name") or "").strip().lower()
-        if q in name:
-            result = (t["id"], t["name"], t.get("language_name", ""))
-            _translation_lookup_cache[key] = result
-            return result
+    if t is not None:
+        result = (t["id"], t["name"], t.get("language_name") or "")
+        _translation_lookup_cache[key] = result
+        return result
 
     print(f"\n❌ Translation not found for query: {translator_query}")
+    suggestions = index.search(translator_query, limit=5, cutoff=0.4)
+    if suggestions:
+        print("Did you mean:")
+        for _, s in suggestions:
+            print(f"   {s['id']:>5} | {s.get('language_name') or ''} | {s['name']}")
     print("Try listing translations:")
     print("   python quran_srt_generator.py --list-translations")
     raise RuntimeError("Translation not found.")
@@ -253,36 +303,28 @@ def fetch_arabic_uthmani(surah: int, add_numbers=True, session=None):
     ar_url = f"https://api.alquran.cloud/v1/surah/{surah}/quran-uthmani"
     ar_data = request_json(ar_url, session=session)
 
-    result = []
-    for i, a in enumerate(ar_data["data"]["ayahs"], start=1):
-        text = a["text"]
-        if add_numbers:
-            # Arabic-style ayah number (١،٢،٣…)
-            arabic_num = "".join(
-                chr(0x0660 + int(d)) for d in str(i)
-            )
-            text = f"{text} ﴿{arabic_num}﴾"
-        result.append(text)
-
+    result = [a["text"] for a in ar_data["data"]["ayahs"]]
+    if add_numbers:
+        # Arabic-style ayah number (﴿١﴾, ﴿٢﴾, ﴿٣﴾…)
+        result = number_arabic(result)
     return result
 
 
-def fetch_translation_qurancom(surah: int, translation_id: int, clean=True, add_numbers=True, session=None):
+def fetch_translation_qurancom(surah: int, translation_id: int, clean=True, add_numbers=True, session=None, latin=False):
     params = {"translations": translation_id, "per_page": 300}
-    data = request_json(f"{QURANCOM_VERSES_API}/{surah}", params=params, session=session)
-
-    verses = data.get("verses") or []
+    verses = fetch_paginated(f"{QURANCOM_VERSES_API}/{surah}", "verses", ayah_count(surah), params, session=session)
     if not verses:
         raise RuntimeError(f"No verses returned from Quran.com for surah {surah}")
 
-    result = []
-    for i, v in enumerate(verses, start=1):
+    raw = []
+    for v in verses:
         tr_list = v.get("translations") or []
-        tr_text = tr_list[0].get("text") if tr_list else ""
-        text = clean_translation_text(tr_text) if clean else strip_html(tr_text)
-        if add_numbers:
-            text = f"{i}. {text}"
-        result.append(text)
+        raw.append(tr_list[0].get("text") if tr_list else "")
+    result = clean_batch(raw, rules_for(translation_id)) if clean else strip_html_batch(raw)
+    if latin:
+        result = [to_latin(text) for text in result]
+    if add_numbers:
+        result = [f"{i}. {text}" for i, text in enumerate(result, start=1)]
     return result
 
 # ======================================================
@@ -322,9 +364,7 @@ def fetch_chapter_audio_timings(reciter_id: int, surah: int, session=None):
 
 def fetch_audio_files(reciter_id: int, surah: int, session=None):
     url = f"{QURANCOM_VERSE_AUDIO_API}/{reciter_id}/by_chapter/{surah}"
-    data = request_json(url, params={"per_page": 500}, session=session)
-
-    audio_files = data.get("audio_files") or []
+    audio_files = fetch_paginated(url, "audio_files", ayah_count(surah), {"per_page": 500}, session=session)
     if not audio_files:
         raise RuntimeError(f"No audio_files returned for surah {surah}, reciter {reciter_id}")
     return audio_files
@@ -332,8 +372,12 @@ def fetch_audio_files(reciter_id: int, surah: int, session=None):
 def compute_timings_from_audio(audio_files, session=None, duration_cache=None):
     timings = []
     cumulative_ms = 0
-    sess = session or requests
+    from mutagen import File as MutagenFile
+    import tempfile
+
+    sess = session or get_session()
     duration_cache = duration_cache or {}
+    source = get_source()
 
     for idx, af in enumerate(audio_files, start=1):
         url_path = af.get("url")
@@ -341,18 +385,36 @@ def compute_timings_from_audio(audio_files, session=None, duration_cache=None):
             raise RuntimeError(f"Missing audio URL for verse {idx}")
 
         full_url = normalize_verse_audio_url(url_path)
+        # When exporting a corpus, verse audio is fetched even if its duration is cached
+        recording = source is not None and not source.offline and not source.has_audio(full_url)
 
-        if full_url in duration_cache:
+        if full_url in duration_cache and not recording:
             duration_ms = duration_cache[full_url]
+            metrics.count("duration_cache_hit")
+        elif source is not None and source.offline:
+            metrics.count("duration_cache_miss")
+            with source.open_audio(full_url) as f:
+                audio = MutagenFile(f)
+            if not audio or not hasattr(audio.info, "length"):
+                raise RuntimeError(f"Cannot determine duration for verse {idx} ({full_url})")
+            duration_ms = int(audio.info.length * 1000)
+            duration_cache[full_url] = duration_ms
         else:
+            metrics.count("duration_cache_miss")
             # Stream to temporary file to avoid keeping entire file in memory
             with tempfile.NamedTemporaryFile(delete=False) as tmp:
                 tmp_path = tmp.name
-                r = sess.get(full_url, timeout=DEFAULT_TIMEOUT, stream=True)
-                r.raise_for_status()
-                for chunk in r.iter_content(chunk_size=1024 * 128):
-                    if chunk:
-                        tmp.write(chunk)
+                r = get_scheduler().get(sess, full_url, timeout=DEFAULT_TIMEOUT, stream=True)
+                try:
+                    r.raise_for_status()
+                    for chunk in r.iter_content(chunk_size=1024 * 128):
+                        if chunk:
+                            tmp.write(chunk)
+                            metrics.add_bytes("verse_audio", len(chunk))
+                finally:
+                    r.close()
+            if recording:
+                source.put_audio_file(full_url, tmp_path)
 
             audio = MutagenFile(tmp_path)
             if not audio or not hasattr(audio.info, "length"):
@@ -392,16 +454,21 @@ def build_output_paths(reciter_name: str, translation_name: str):
 
     return base, csv_dir, arabic_srt_dir, tr_srt_dir, audio_dir
 
-def write_csv(csv_dir: str, surah: int, arabic_texts, translated_texts):
+def write_csv(csv_dir: str, label, verse_keys, arabic_texts, translated_texts, writer=None):
+    """Write <csv_dir>/<label>.csv (UTF-8 with BOM); `writer` as in emit_subtitles."""
+    out_path = os.path.join(csv_dir, f"{label}.csv")
+    buf = io.StringIO(newline="")
+    rows = csv.writer(buf)
+    rows.writerow(["Ayah", "Arabic", "Translation"])
+    for key, ar, tr in zip(verse_keys, arabic_texts, translated_texts):
+        rows.writerow([key, ar, tr])
+
+    if writer is not None:
+        writer(out_path, buf.getvalue(), "utf-8-sig")
+        return out_path
     ensure_dir(csv_dir)
-    out_path = os.path.join(csv_dir, f"{surah}.csv")
-
     with open(out_path, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Ayah", "Arabic", "Translation"])
-        for i in range(min(len(arabic_texts), len(translated_texts))):
-            writer.writerow([f"{surah}:{i+1}", arabic_texts[i], translated_texts[i]])
-
+        f.write(buf.getvalue())
     return out_path
 
 def write_srt(output_dir: str, file_name: str, timings, texts, bom: bool = False):
@@ -409,36 +476,158 @@ def write_srt(output_dir: str, file_name: str, timings, texts, bom: bool = False
 
     By default (bom=False) files are written as UTF-8 without BOM.
     """
-    ensure_dir(output_dir)
     out_path = os.path.join(output_dir, file_name)
-
-    encoding = "utf-8-sig" if bom else "utf-8"
-    with open(out_path, "w", encoding=encoding) as f:
-        for i, t in enumerate(timings):
-            start = ms_to_srt(t["from"])
-            end = ms_to_srt(t["to"])
-            line = texts[i] if i < len(texts) else ""
-            f.write(f"{i+1}\n{start} --> {end}\n{line}\n\n")
-
+    emit_subtitles(timings, [("srt", texts, {"srt": out_path})], bom=bom)
     return out_path
 
+def write_subtitle_tracks(base_dir: str, label, timings, tracks: dict, formats=None,
+                          wrap_width=None, max_lines=DEFAULT_MAX_LINES, writer=None):
+    """Write {track: texts} in all formats, optionally wrapped to `wrap_width` px first."""
+    formats = parse_formats(formats)
+    if not wrap_width:
+        return write_surah_subtitles(base_dir, label, timings, tracks, formats=formats, bom=False, writer=writer)
+
+    wrapped = wrap_tracks(timings, tracks, wrap_width, max_lines=max_lines)
+    if all(track_timings is timings for track_timings, _ in wrapped.values()):
+        # No cue was split: all tracks still share one timeline (single pass)
+        texts = {track: track_texts for track, (_, track_texts) in wrapped.items()}
+        return write_surah_subtitles(base_dir, label, timings, texts, formats=formats, bom=False, writer=writer)
+
+    paths = {}
+    for track, (track_timings, track_texts) in wrapped.items():
+        paths.update(write_surah_subtitles(base_dir, label, track_timings, {track: track_texts}, formats=formats,
+                                           bom=False, writer=writer))
+    return paths
+
+def record_existing_audio(url: str, path: str) -> bool:
+    """While exporting a corpus, record an MP3 that is already on disk; True if it was added."""
+    source = get_source()
+    if source is None or source.offline or source.has_audio(url):
+        return False
+    source.put_audio_file(url, path)
+    return True
+
 def download_file(url: str, out_path: str, session=None):
     ensure_dir(os.path.dirname(out_path))
-    sess = session or requests
-    r = sess.get(url, timeout=DEFAULT_TIMEOUT, stream=True)
-    r.raise_for_status()
-    with open(out_path, "wb") as f:
-        for chunk in r.iter_content(chunk_size=1024 * 128):
-            if chunk:
-                f.write(chunk)
+    source = get_source()
+    if source is not None and source.offline:
+        source.copy_audio(url, out_path)
+        return
+    store = get_store()
+    if store is not None and store.fetch(url, out_path):
+        metrics.count("audio_store_hit")
+        return
+    sess = session or get_session()
+    r = get_scheduler().get(sess, url, timeout=DEFAULT_TIMEOUT, stream=True)
+    # Download to a temporary name so an interrupted file is never mistaken for a finished one
+    tmp_path = out_path + ".part"
+    try:
+        r.raise_for_status()
+        with open(tmp_path, "wb") as f:
+            for chunk in r.iter_content(chunk_size=1024 * 128):
+                if chunk:
+                    f.write(chunk)
+                    metrics.add_bytes("download", len(chunk))
+    finally:
+        r.close()
+    os.replace(tmp_path, out_path)
+    if source is not None:
+        source.put_audio_file(url, out_path)
+    if store is not None:
+        store.add(out_path, url=url)
 
 # ======================================================
 # MAIN PROCESSING
 # ======================================================
 
+def load_surah_artifacts(surah: int, reciter_id: int, translation_id: int,
+                         clean_translation=True, add_numbers=True, session=None, refresh=False, latin=False):
+    """
+    Return texts + timings for one surah, from the per-surah cache when available.
+
+    Result keys: audio_url (Solution A only), verse_audio_urls (fallback only),
+    timings, arabic, translation, cached.
+    """
+    cache_path = surah_cache_path(surah, reciter_id, translation_id, clean_translation, add_numbers, latin)
+    if not refresh and os.path.exists(cache_path):
+        try:
+            with metrics.stage("cache_load", surah):
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    artifacts = json.load(f)
+            artifacts["cached"] = True
+            metrics.count("surah_cache_hit")
+            return artifacts
+        except Exception:
+            pass
+    metrics.count("surah_cache_miss")
+
+    session = session or get_session()
+
+    with metrics.stage("fetch_arabic", surah):
+        arabic_texts = fetch_arabic_uthmani(
+            surah,
+            add_numbers=add_numbers,
+            session=session
+        )
+    with metrics.stage("fetch_translation", surah):
+        tr_texts = fetch_translation_qurancom(
+            surah,
+            translation_id,
+            clean=clean_translation,
+            add_numbers=add_numbers,
+            session=session,
+            latin=latin
+        )
+
+    # ✅ Try Solution A first
+    audio_url = None
+    timings = None
+    verse_audio_urls = None
+
+    try:
+        with metrics.stage("solution_a", surah):
+            audio_url, timings = fetch_chapter_audio_timings(reciter_id, surah, session=session)
+        print("✅ Using Solution A: true timestamps from chapter_recitations (perfect sync).")
+    except Exception as e:
+        print(f"⚠️ Solution A not available for this reciter/surah → Falling back. Reason: {e}")
+        # Fallback mode with caching
+        with metrics.stage("fallback", surah):
+            duration_cache = load_duration_cache()
+            audio_files = fetch_audio_files(reciter_id, surah, session=session)
+            timings = compute_timings_from_audio(audio_files, session=session, duration_cache=duration_cache)
+            save_duration_cache(duration_cache)
+        verse_audio_urls = [normalize_verse_audio_url(af.get("url")) for af in audio_files]
+        print("✅ Using fallback: per-verse MP3 durations (may drift on full MP3).")
+
+    min_len = min(len(timings), len(arabic_texts), len(tr_texts), ayah_count(surah))
+    if min_len < ayah_count(surah):
+        print(f"⚠️ Surah {surah} has {ayah_count(surah)} ayahs but only {min_len} have text and timings "
+              f"(arabic={len(arabic_texts)}, translation={len(tr_texts)}, timings={len(timings)}).")
+    artifacts = {
+        "audio_url": audio_url,
+        "verse_audio_urls": verse_audio_urls,
+        "timings": timings[:min_len],
+        "arabic": arabic_texts[:min_len],
+        "translation": tr_texts[:min_len],
+    }
+
+    with metrics.stage("cache_write", surah):
+        # Keep a binary copy of the timings for fast "which ayah at t" lookups
+        save_surah_timings(reciter_id, surah, artifacts["timings"])
+
+        ensure_dir(os.path.dirname(cache_path))
+        tmp_file = unique_tmp_path(cache_path)
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(artifacts, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_path)
+
+    artifacts["cached"] = False
+    return artifacts
+
 def process_surah(surah: int, reciter_id: int, translator_query: str,
-                 clean_translation=True, add_numbers=True, download_audio=False, session=None):
-    session = session or requests.Session()
+                 clean_translation=True, add_numbers=True, download_audio=False, session=None,
+                 formats=None, refresh=False, wrap_width=None, max_lines=DEFAULT_MAX_LINES, latin=False, bundle=None):
+    session = session or get_session()
 
     reciter_name = get_reciter_name(reciter_id, session=session)
     translation_id, translation_name, translation_lang = find_translation_id(translator_query, session=session)
@@ -448,53 +637,54 @@ def process_surah(surah: int, reciter_id: int, translator_query: str,
     print(f"\n📥 Processing Surah {surah}")
     print(f"🎧 Reciter: {reciter_name} (id={reciter_id})")
     print(f"🌍 Translation: {translation_name} (id={translation_id}) [{translation_lang}]")
-    print(f"📂 Output folder: {base_dir}")
+    collector = BundleCollector(base_dir, bundle_path(base_dir, bundle)) if bundle else None
+    print(f"📂 Output {'bundle' if bundle else 'folder'}: {collector.path if bundle else base_dir}")
 
-    arabic_texts = fetch_arabic_uthmani(
-    surah,
-    add_numbers=add_numbers,
-    session=session
-    )
-    tr_texts = fetch_translation_qurancom(
+    artifacts = load_surah_artifacts(
         surah,
+        reciter_id,
         translation_id,
-        clean=clean_translation,
+        clean_translation=clean_translation,
         add_numbers=add_numbers,
-        session=session
+        session=session,
+        refresh=refresh,
+        latin=latin
     )
-
-    # ✅ Try Solution A first
-    audio_url = None
-    timings = None
-
-    try:
-        audio_url, timings = fetch_chapter_audio_timings(reciter_id, surah, session=session)
-        print("✅ Using Solution A: true timestamps from chapter_recitations (perfect sync).")
-    except Exception as e:
-        print(f"⚠️ Solution A not available for this reciter/surah → Falling back. Reason: {e}")
-        # Fallback mode with caching
-        duration_cache = load_duration_cache()
-        audio_files = fetch_audio_files(reciter_id, surah, session=session)
-        timings = compute_timings_from_audio(audio_files, session=session, duration_cache=duration_cache)
-        save_duration_cache(duration_cache)
-        print("✅ Using fallback: per-verse MP3 durations (may drift on full MP3).")
-
-    min_len = min(len(timings), len(arabic_texts), len(tr_texts))
-    timings = timings[:min_len]
-    arabic_texts = arabic_texts[:min_len]
-    tr_texts = tr_texts[:min_len]
-
-    csv_path = write_csv(csv_dir, surah, arabic_texts, tr_texts)
-    ar_srt_path = write_srt(arabic_srt_dir, f"{surah}_arabic.srt", timings, arabic_texts, bom=False)
-    # Ensure translation SRT is saved explicitly without BOM
-    tr_srt_path = write_srt(tr_srt_dir, f"{surah}_translation.srt", timings, tr_texts, bom=False)
+    if artifacts["cached"]:
+        print("♻️ Using cached texts and timings (pass --refresh to refetch).")
+
+    audio_url = artifacts["audio_url"]
+    timings = artifacts["timings"]
+    arabic_texts = artifacts["arabic"]
+    tr_texts = artifacts["translation"]
+    min_len = len(timings)
+
+    verse_keys = [f"{surah}:{i + 1}" for i in range(min(len(arabic_texts), len(tr_texts)))]
+    with metrics.stage("write_csv", surah):
+        csv_path = write_csv(csv_dir, surah, verse_keys, arabic_texts, tr_texts, writer=collector)
+    # All subtitle formats for both tracks come out of one pass (no BOM)
+    with metrics.stage("write_subtitles", surah):
+        subtitle_paths = write_subtitle_tracks(
+            base_dir,
+            surah,
+            timings,
+            {"arabic": arabic_texts, "translation": tr_texts},
+            formats=formats,
+            wrap_width=wrap_width,
+            max_lines=max_lines,
+            writer=collector
+        )
+        if collector is not None:
+            collector.commit()
 
     # Ensure audio directory exists for any audio downloads
     ensure_dir(audio_dir)
 
-    print(f"✅ CSV: {csv_path}")
-    print(f"✅ Arabic SRT: {ar_srt_path}")
-    print(f"✅ Translation SRT: {tr_srt_path}")
+    shown = collector.member if collector is not None else (lambda path: path)
+    print(f"✅ CSV: {shown(csv_path)}")
+    for (track, fmt), path in subtitle_paths.items():
+        print(f"✅ {track.capitalize()} {fmt.upper()}: {shown(path)}")
+    print(f"✅ Timing store: {timing_store_path(reciter_id)}")
     print(f"✅ Total ayahs: {min_len}")
 
     if audio_url:
@@ -503,38 +693,294 @@ def process_surah(surah: int, reciter_id: int, translator_query: str,
             audio_path = os.path.join(audio_dir, f"{surah:03}.mp3")
             if os.path.exists(audio_path):
                 print(f"ℹ️ Full surah MP3 already exists: {audio_path}")
+                if record_existing_audio(audio_url, audio_path):
+                    print("📦 Added to the local corpus.")
             else:
                 print(f"⬇️ Downloading full surah MP3 to: {audio_path}")
-                download_file(audio_url, audio_path, session=session)
+                with metrics.stage("download_audio", surah):
+                    download_file(audio_url, audio_path, session=session)
                 print("✅ Audio downloaded.")
     else:
         # Fallback: optionally save per-verse MP3s into the audio folder
         if download_audio:
             print(f"⬇️ Downloading per-verse MP3s to: {audio_dir}")
-            # audio_files may be available from fallback; fetch if not
-            if 'audio_files' not in locals():
+            verse_audio_urls = artifacts.get("verse_audio_urls")
+            if not verse_audio_urls:
                 try:
                     audio_files = fetch_audio_files(reciter_id, surah, session=session)
+                    verse_audio_urls = [normalize_verse_audio_url(af.get("url")) for af in audio_files]
                 except Exception as e:
                     print(f"⚠️ Could not fetch per-verse audio files: {e}")
-                    audio_files = []
+                    verse_audio_urls = []
 
-            for idx, af in enumerate(audio_files, start=1):
-                url_path = af.get('url')
-                if not url_path:
+            for idx, full_url in enumerate(verse_audio_urls, start=1):
+                if not full_url:
                     print(f"⚠️ Missing URL for verse {idx}, skipping")
                     continue
-                full_url = normalize_verse_audio_url(url_path)
                 out_path = os.path.join(audio_dir, f"{surah:03}_{idx:03}.mp3")
                 if os.path.exists(out_path):
                     print(f"ℹ️ Verse {idx} already exists, skipping: {out_path}")
+                    record_existing_audio(full_url, out_path)
                     continue
                 try:
-                    download_file(full_url, out_path, session=session)
+                    with metrics.stage("download_verse_audio", surah):
+                        download_file(full_url, out_path, session=session)
                 except Exception as e:
                     print(f"⚠️ Failed to download verse {idx}: {e}")
             print("✅ Per-verse audio download finished.")
 
+    return artifacts
+
+# ======================================================
+# JUZ / AYAH RANGES (composed from cached per-surah artifacts)
+# ======================================================
+
+def audio_duration_ms(path: str):
+    from mutagen import File as MutagenFile
+    audio = MutagenFile(path)
+    if not audio or not hasattr(audio.info, "length"):
+        return None
+    return int(audio.info.length * 1000)
+
+def join_audio_segments(segments, out_path: str):
+    """
+    Join (path, start_ms, end_ms) segments into one MP3 without re-encoding.
+
+    Uses the ffmpeg concat demuxer (inpoint/outpoint trim partial surahs).
+    Without ffmpeg only whole files can be joined, by appending MP3 frames.
+    """
+    ensure_dir(os.path.dirname(out_path))
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        import subprocess
+        list_path = out_path + ".concat.txt"
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path, start_ms, end_ms in segments:
+                escaped = os.path.abspath(path).replace("\\", "/").replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+                if start_ms:
+                    f.write(f"inpoint {start_ms / 1000:.3f}\n")
+                if end_ms is not None:
+                    f.write(f"outpoint {end_ms / 1000:.3f}\n")
+        try:
+            subprocess.run(
+                [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                 "-i", list_path, "-c", "copy", out_path],
+                check=True
+            )
+        finally:
+            os.remove(list_path)
+        return out_path
+
+    if any(start_ms or end_ms is not None for _, start_ms, end_ms in segments):
+        raise RuntimeError("ffmpeg is required to cut partial surahs; install it or use whole-surah ranges")
+    with open(out_path, "wb") as out:
+        for path, _, _ in segments:
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+    return out_path
+
+def build_range_output(label: str, start, end, reciter_id: int, translator_query: str,
+                       clean_translation=True, add_numbers=True, download_audio=False,
+                       session=None, formats=None, refresh=False, wrap_width=None, max_lines=DEFAULT_MAX_LINES,
+                       latin=False, bundle=None):
+    """
+    Build one continuous timeline (subtitles, CSV and optional joined audio) for an
+    inclusive ayah range, shifting each surah's cached timings by a cumulative offset.
+    """
+    session = session or get_session()
+
+    reciter_name = get_reciter_name(reciter_id, session=session)
+    translation_id, translation_name, _ = find_translation_id(translator_query, session=session)
+    base_dir, _, _, _, audio_dir = build_output_paths(reciter_name, translation_name)
+    range_dir = os.path.join(base_dir, "ranges")
+
+    print(f"\n📚 Building {label}: {start[0]}:{start[1]} → {end[0]}:{end[1]}")
+
+    timings, arabic_texts, tr_texts, verse_keys = [], [], [], []
+    audio_segments = []
+    offset_ms = 0
+
+    for surah, first, last in iter_range_segments(start, end):
+        artifacts = load_surah_artifacts(
+            surah,
+            reciter_id,
+            translation_id,
+            clean_translation=clean_translation,
+            add_numbers=add_numbers,
+            session=session,
+            refresh=refresh,
+            latin=latin
+        )
+        surah_timings = artifacts["timings"]
+        last = min(last, len(surah_timings))
+        if first > last:
+            print(f"⚠️ Surah {surah}: no ayahs {first}-{last} available, skipping")
+            continue
+
+        whole_start = first == 1
+        whole_end = last == len(surah_timings)
+        seg_start = 0 if whole_start else surah_timings[first - 1]["from"]
+        seg_end = surah_timings[last - 1]["to"]
+
+        # Whole-surah segments keep the full audio (intro + trailing silence)
+        if artifacts["audio_url"]:
+            surah_audio = os.path.join(audio_dir, f"{surah:03}.mp3")
+            if download_audio and not os.path.exists(surah_audio):
+                print(f"⬇️ Downloading full surah MP3 to: {surah_audio}")
+                download_file(artifacts["audio_url"], surah_audio, session=session)
+            if whole_end and os.path.exists(surah_audio):
+                seg_end = audio_duration_ms(surah_audio) or seg_end
+            audio_segments.append((surah_audio, seg_start or None, None if whole_end else seg_end))
+        else:
+            # Fallback timings are cumulative per-verse durations: join the verse files
+            verse_audio_urls = artifacts.get("verse_audio_urls") or []
+            for idx in range(first, last + 1):
+                verse_audio = os.path.join(audio_dir, f"{surah:03}_{idx:03}.mp3")
+                verse_url = verse_audio_urls[idx - 1] if idx <= len(verse_audio_urls) else None
+                if download_audio and verse_url and not os.path.exists(verse_audio):
+                    download_file(verse_url, verse_audio, session=session)
+                audio_segments.append((verse_audio, None, None))
+
+        for idx in range(first, last + 1):
+            t = surah_timings[idx - 1]
+            timings.append({
+                "verse_key": f"{surah}:{idx}",
+                "from": t["from"] - seg_start + offset_ms,
+                "to": t["to"] - seg_start + offset_ms,
+            })
+            verse_keys.append(f"{surah}:{idx}")
+            arabic_texts.append(artifacts["arabic"][idx - 1])
+            tr_texts.append(artifacts["translation"][idx - 1])
+
+        offset_ms += seg_end - seg_start
+
+    if not timings:
+        raise RuntimeError(f"No ayahs available for {label}")
+
+    collector = BundleCollector(base_dir, bundle_path(base_dir, bundle)) if bundle else None
+    csv_path = write_csv(os.path.join(range_dir, "csv"), label, verse_keys, arabic_texts, tr_texts, writer=collector)
+    subtitle_paths = write_subtitle_tracks(
+        range_dir,
+        label,
+        timings,
+        {"arabic": arabic_texts, "translation": tr_texts},
+        formats=formats,
+        wrap_width=wrap_width,
+        max_lines=max_lines,
+        writer=collector
+    )
+    if collector is not None:
+        collector.commit()
+
+    shown = collector.member if collector is not None else (lambda path: path)
+    print(f"✅ CSV: {shown(csv_path)}")
+    for (track, fmt), path in subtitle_paths.items():
+        print(f"✅ {track.capitalize()} {fmt.upper()}: {shown(path)}")
+    print(f"✅ Total ayahs: {len(timings)} ({ms_to_srt(offset_ms)})")
+
+    missing = [path for path, _, _ in audio_segments if not os.path.exists(path)]
+    if missing:
+        print(f"ℹ️ Skipping joined audio: {len(missing)} source MP3(s) not downloaded (use --download-audio).")
+    elif audio_segments:
+        audio_path = os.path.join(audio_dir, "ranges", f"{label}.mp3")
+        try:
+            join_audio_segments(audio_segments, audio_path)
+            print(f"🎵 Joined audio: {audio_path}")
+        except Exception as e:
+            print(f"⚠️ Could not join audio for {label}: {e}")
+
+# ======================================================
+# BATCH (parallel surahs + retry queue)
+# ======================================================
+
+def process_surahs(surahs, reciter_id: int, translator_query: str, jobs: int = 1, session=None,
+                   shard=None, claims_dir=None, **kwargs):
+    """
+    Process many surahs with up to `jobs` worker threads (the request scheduler
+    keeps the upstream APIs within their limits). Surahs that fail are queued
+    and retried once at the end of the run. Returns the surahs that still failed.
+
+    `shard` = (i, N) keeps this node to its ayah-balanced share; with `claims_dir`
+    every surah is claimed through a lock file first, and a node that runs out
+    of work steals unclaimed surahs from the other shards.
+    """
+    session = session or get_session()
+    # Resolve the reciter and translation once, before the workers start
+    get_reciter_name(reciter_id, session=session)
+    translation_id = find_translation_id(translator_query, session=session)[0]
+
+    plan = plan_items(surahs, shard=shard, steal=bool(claims_dir))
+    if shard:
+        own = len(assign_shards(surahs, shard[1])[shard[0] - 1])
+        print(f"🧩 Shard {shard[0]}/{shard[1]}: {own} surah(s)" + (", then stealing from other shards" if claims_dir else ""))
+
+    def run(surah):
+        try:
+            with metrics.stage("surah", surah):
+                process_surah(surah, reciter_id, translator_query, session=session, **kwargs)
+            return True
+        except Exception as e:
+            print(f"❌ Surah {surah} failed: {e}")
+            return False
+
+    def drain(queue, failed):
+        while True:
+            surah = queue.next()
+            if surah is None:
+                return
+            ok = run(surah)
+            queue.finished(surah, ok)
+            if not ok:
+                failed.append(surah)
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    claims = None
+    if claims_dir:
+        # A refresh run (and --export-corpus, which forces one) redoes items done by earlier runs
+        claims = WorkClaims(claims_dir, done_since=time.time() if kwargs.get("refresh") else None)
+    options = {k: v for k, v in kwargs.items() if k not in ("refresh", "session")}
+    options["source"] = "export" if get_source() is not None and not get_source().offline else None
+    variant = options_key(options)
+    key = lambda s: f"r{reciter_id}-t{translation_id}-{variant}-s{s:03}"
+    with claims or nullcontext():
+        failed = []
+        queue = WorkQueue(plan, claims, key)
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            workers = [pool.submit(drain, queue, failed) for _ in range(max(1, jobs))]
+            for worker in workers:
+                worker.result()
+
+        if failed:
+            print(f"\n🔁 Retrying {len(failed)} failed surah(s): {', '.join(map(str, sorted(failed)))}")
+            retry, failed = sorted(failed), []
+            drain(WorkQueue(retry, claims, key), failed)
+
+    for host in get_scheduler().summary():
+        print(f"📊 {host['host']}: {host['requests']} requests, {host['retries']} retries, "
+              f"{host['throttled']} throttled (rate {host['rate']}/s, concurrency {host['concurrency']})")
+    if failed:
+        print(f"❌ Still failing after retry: {', '.join(map(str, sorted(failed)))}")
+    return failed
+
+def parse_juz_list(value: str):
+    """Parse "30", "1,2,3", "1-30" or "all" into a list of juz numbers."""
+    if value.strip().lower() == "all":
+        return list(range(1, TOTAL_JUZ + 1))
+    juz_numbers = []
+    for part in value.split(","):
+        part = part.strip()
+        if "-" in part:
+            lo, hi = (int(x) for x in part.split("-"))
+            juz_numbers.extend(range(lo, hi + 1))
+        elif part:
+            juz_numbers.append(int(part))
+    for j in juz_numbers:
+        if not 1 <= j <= TOTAL_JUZ:
+            raise ValueError(f"Juz must be 1-{TOTAL_JUZ}, got {j}")
+    return juz_numbers
+
 # ======================================================
 # CLI
 # ======================================================
@@ -550,42 +996,173 @@ def main():
     parser.add_argument("--all", action="store_true", help="Process all surahs")
     parser.add_argument("--no-clean", action="store_true", help="Do NOT clean translation text")
     parser.add_argument("--no-numbers", action="store_true", help="Do NOT add numbering to translation lines")
+    parser.add_argument("--bundle", choices=BUNDLE_FORMATS,
+                        help="Write CSV and subtitles into one output/<reciter>/<translation>.sqlite|.zip "
+                             "instead of separate files (read them with subtitle_bundle.py)")
+    parser.add_argument("--latin", action="store_true",
+                        help="Transliterate Uzbek Cyrillic translation text to Latin (uz_translit)")
     parser.add_argument("--list-reciters", action="store_true", help="List all reciters and exit")
     parser.add_argument("--list-translations", action="store_true", help="List all translations and exit")
     parser.add_argument("--download-audio", action="store_true", help="Download full surah MP3 when Solution A is used")
+    parser.add_argument("--audio-store", type=str, nargs="?", const=AUDIO_STORE_DIR, metavar="DIR",
+                        help=f"Keep downloaded MP3s once in a content-addressed store and link them into output/ "
+                             f"(default DIR: {AUDIO_STORE_DIR})")
+    parser.add_argument("--formats", type=str, default="srt",
+                        help=f"Comma-separated subtitle formats to write: {','.join(SUPPORTED_FORMATS)} (default: srt)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Surahs processed in parallel with --all (default: 1); API rate limits adapt automatically")
+    parser.add_argument("--shard", type=str,
+                        help="With --all: process only shard i of N (e.g. 1/4), balanced by ayah count")
+    parser.add_argument("--claims-dir", type=str,
+                        help="With --all: shared folder for per-surah claim/done files; idle nodes steal unclaimed surahs")
+    parser.add_argument("--juz", type=str,
+                        help="Build continuous outputs for juz: a number, list/range (e.g. 29,30 or 1-30) or 'all'")
+    parser.add_argument("--range", dest="ayah_range", type=str,
+                        help="Build one continuous output for an ayah range, e.g. 78:1-114:6")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Refetch texts and timings even if they are cached in cache/surahs/ (and the reciter/translation lists in cache/catalog/ for --list-*)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run an HTTP service returning SRT/VTT/JSON for /reciter/{id}/translation/{id}/surah/{n}")
+    parser.add_argument("--serve-host", type=str, default="127.0.0.1", help="Host for --serve (default: 127.0.0.1)")
+    parser.add_argument("--serve-port", type=int, default=8080, help="Port for --serve (default: 8080)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for --serve (default: 1)")
+    parser.add_argument("--wrap-width", type=int,
+                        help="Wrap subtitle lines to this width in pixels, measured with the fonts in data/fonts")
+    parser.add_argument("--max-lines", type=int, default=DEFAULT_MAX_LINES,
+                        help=f"Max lines per cue when wrapping; longer cues are split in time (default: {DEFAULT_MAX_LINES})")
+    parser.add_argument("--metrics-dir", type=str,
+                        help="Write per-stage timings as JSON lines and a Prometheus textfile (.prom) to this folder")
+    parser.add_argument("--profile", type=str, metavar="FILE",
+                        help="Run under cProfile; writes FILE (pstats) and FILE.txt (top functions). Profiles the main thread, so use --jobs 1")
+    parser.add_argument("--offline", action="store_true",
+                        help=f"Read texts, timings and audio only from the local corpus in {DEFAULT_CORPUS} (no network)")
+    parser.add_argument("--source", type=str, metavar="local:PATH",
+                        help="Read only from a local corpus: a mirror folder or a .sqlite file (implies --offline)")
+    parser.add_argument("--export-corpus", type=str, nargs="?", const=DEFAULT_CORPUS, metavar="PATH",
+                        help=f"Fetch live and record every API response (and audio with --download-audio) into a "
+                             f"local corpus for --offline; PATH is a folder or a .sqlite file (default: {DEFAULT_CORPUS})")
 
     args = parser.parse_args()
-    session = create_session_with_retries()
 
+    if args.export_corpus and (args.offline or args.source):
+        parser.error("--export-corpus cannot be combined with --offline or --source")
+    try:
+        if args.export_corpus:
+            set_source(open_source(args.export_corpus, offline=False))
+            args.refresh = True  # every surah must actually be fetched to be recorded
+        elif args.source or args.offline:
+            set_source(open_source(args.source or DEFAULT_CORPUS, offline=True))
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if get_source() is not None:
+        print(f"📦 {'Recording to' if args.export_corpus else 'Offline, reading from'} {get_source().describe()}")
+    if args.audio_store:
+        set_store(AudioStore(args.audio_store))
+        print(f"📦 Linking audio from the {get_store().describe()}")
+
+    if args.serve:
+        from subtitle_server import serve
+        serve(host=args.serve_host, port=args.serve_port, workers=args.workers)
+        return
+
+    if args.metrics_dir:
+        metrics.open_events(os.path.join(args.metrics_dir, METRICS_EVENTS_FILE))
+    try:
+        if args.profile:
+            profile_call(args.profile, run, args, parser)
+        else:
+            run(args, parser)
+    finally:
+        metrics.print_summary()
+        if args.metrics_dir:
+            prom_path = metrics.finish(args.metrics_dir, get_scheduler().summary())
+            print(f"📈 Metrics: {os.path.join(args.metrics_dir, METRICS_EVENTS_FILE)}, {prom_path}")
+
+def run(args, parser):
+    """Run the CLI command selected by `args` (everything except --serve)."""
     if args.list_reciters:
-        list_reciters(session=session)
+        list_reciters(refresh=args.refresh)
         return
 
     if args.list_translations:
-        list_translations(session=session)
+        list_translations(refresh=args.refresh)
         return
 
+    session = get_session()
+
     clean_translation = not args.no_clean
     add_numbers = not args.no_numbers
-
-    if args.all:
-        for s in range(1, 115):
+    try:
+        formats = parse_formats(args.formats)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.surah is not None and not 1 <= args.surah <= TOTAL_SURAHS:
+        parser.error(f"--surah must be 1-{TOTAL_SURAHS}")
+    if (args.shard or args.claims_dir) and not args.all:
+        parser.error("--shard and --claims-dir require --all")
+    try:
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.juz or args.ayah_range:
+        jobs = []
+        try:
+            if args.juz:
+                for j in parse_juz_list(args.juz):
+                    start, end = juz_bounds(j)
+                    jobs.append((f"juz_{j:02}", start, end))
+            if args.ayah_range:
+                start, end = parse_range(args.ayah_range)
+                jobs.append((f"range_{start[0]}_{start[1]}-{end[0]}_{end[1]}", start, end))
+        except ValueError as e:
+            parser.error(str(e))
+
+        for label, start, end in jobs:
             try:
-                process_surah(
-                    s,
+                build_range_output(
+                    label,
+                    start,
+                    end,
                     args.reciter,
                     args.translation,
                     clean_translation=clean_translation,
                     add_numbers=add_numbers,
                     download_audio=args.download_audio,
-                    session=session
+                    session=session,
+                    formats=formats,
+                    refresh=args.refresh,
+                    wrap_width=args.wrap_width,
+                    max_lines=args.max_lines,
+                    latin=args.latin,
+                    bundle=args.bundle
                 )
             except Exception as e:
-                print(f"❌ Surah {s} failed: {e}")
-            time.sleep(0.1)
+                print(f"❌ {label} failed: {e}")
+        return
+
+    if args.all:
+        process_surahs(
+            range(1, TOTAL_SURAHS + 1),
+            args.reciter,
+            args.translation,
+            jobs=args.jobs,
+            shard=shard,
+            claims_dir=args.claims_dir,
+            clean_translation=clean_translation,
+            add_numbers=add_numbers,
+            download_audio=args.download_audio,
+            session=session,
+            formats=formats,
+            refresh=args.refresh,
+            wrap_width=args.wrap_width,
+            max_lines=args.max_lines,
+            latin=args.latin,
+            bundle=args.bundle
+        )
     else:
         if not args.surah:
-            parser.error("You must provide --surah unless using --all")
+            parser.error("You must provide --surah unless using --all, --juz or --range")
         process_surah(
             args.surah,
             args.reciter,
@@ -593,7 +1170,13 @@ def main():
             clean_translation=clean_translation,
             add_numbers=add_numbers,
             download_audio=args.download_audio,
-            session=session
+            session=session,
+            formats=formats,
+            refresh=args.refresh,
+            wrap_width=args.wrap_width,
+            max_lines=args.max_lines,
+            latin=args.latin,
+            bundle=args.bundle
         )
 
 if __name__ == "__main__":
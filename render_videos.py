@@ -0,0 +1,296 @@
+# Render finished surah videos with ffmpeg: still background + surah MP3 +
+# burned-in Arabic and translation subtitles.
+#
+# Requires ffmpeg (with libass) on PATH. Inputs are the files written by
+# quran_srt_generator.py (run it with --download-audio first).
+#
+# Usage examples:
+#   python render_videos.py --reciter 7
+#   python render_videos.py --reciter 7 --translation "Muhammad Sodiq Muhammad Yusuf (Latin)" --surahs 78-114
+#   python render_videos.py --reciter-folder Mishari_Rashid_al_Afasy --translation-folder Muhammad_Sodiq_Muhammad_Yusuf_Latin
+#   python render_videos.py --reciter 7 --jobs 4 --threads-per-job 2 --ram-per-job 600
+#
+# Jobs are started from a queue as long as CPU slots and free RAM allow. Every
+# finished job is appended to render_journal.jsonl, so an interrupted batch
+# resumes where it stopped.
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import time
+
+from quran_metadata import parse_surah_list
+from quran_srt_generator import DEFAULT_TRANSLATOR_QUERY, OUTPUT_ROOT, safe_folder_name
+
+# ======================================================
+# CONFIG
+# ======================================================
+DEFAULT_BACKGROUND = os.path.join("data", "BG.png")
+FONTS_DIR = os.path.join("data", "fonts")
+
+VIDEO_SIZE = (1920, 1080)
+VIDEO_FPS = 10  # still image: subtitles only need ~100 ms resolution
+VIDEO_CRF = 28
+VIDEO_PRESET = "veryfast"
+AUDIO_BITRATE = "160k"
+
+ARABIC_STYLE = "FontName=KFGQPC Uthman Taha Naskh,FontSize=26,Alignment=5,MarginV=40,Outline=1,Shadow=0"
+TRANSLATION_STYLE = "FontName=Poppins,FontSize=14,Alignment=2,MarginV=40,Outline=1,Shadow=0"
+
+DEFAULT_THREADS_PER_JOB = 2
+DEFAULT_RAM_PER_JOB_MB = 512
+POLL_INTERVAL = 0.5
+
+JOURNAL_NAME = "render_journal.jsonl"
+
+# ======================================================
+# UTILITIES
+# ======================================================
+
+def filter_path(path: str) -> str:
+    """Escape a file path for use as a filter option value inside -vf."""
+    value = os.path.abspath(path).replace("\\", "/")
+    value = re.sub(r"([\\':])", r"\\\1", value)        # option-level escaping
+    return re.sub(r"([\\'\[\],;])", r"\\\1", value)    # filtergraph-level escaping
+
+def available_ram_mb():
+    """Free memory in MB (MemAvailable on Linux), or None when it cannot be read."""
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def file_signature(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_size}:{int(st.st_mtime)}"
+
+# ======================================================
+# JOBS
+# ======================================================
+
+def build_jobs(base_dir: str, audio_dir: str, video_dir: str, surahs, background: str):
+    jobs = []
+    for surah in surahs:
+        audio = os.path.join(audio_dir, f"{surah:03}.mp3")
+        arabic_srt = os.path.join(base_dir, "srt", "arabic", f"{surah}_arabic.srt")
+        tr_srt = os.path.join(base_dir, "srt", "translation", f"{surah}_translation.srt")
+        missing = [p for p in (audio, arabic_srt, tr_srt) if not os.path.exists(p)]
+        if missing:
+            print(f"⚠️ Surah {surah}: missing {', '.join(missing)} — skipping")
+            continue
+        inputs = (background, audio, arabic_srt, tr_srt)
+        signature = hashlib.sha1("|".join(f"{p}={file_signature(p)}" for p in inputs).encode()).hexdigest()
+        jobs.append({
+            "id": f"{surah:03}",
+            "surah": surah,
+            "background": background,
+            "audio": audio,
+            "arabic_srt": arabic_srt,
+            "translation_srt": tr_srt,
+            "output": os.path.join(video_dir, f"{surah:03}.mp4"),
+            "signature": signature,
+        })
+    return jobs
+
+def ffmpeg_command(job: dict, ffmpeg: str, threads: int):
+    width, height = VIDEO_SIZE
+    fonts = filter_path(FONTS_DIR)
+    vf = (
+        f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},"
+        f"subtitles=filename={filter_path(job['arabic_srt'])}:fontsdir={fonts}"
+        f":force_style='{ARABIC_STYLE}',"
+        f"subtitles=filename={filter_path(job['translation_srt'])}:fontsdir={fonts}"
+        f":force_style='{TRANSLATION_STYLE}',"
+        "format=yuv420p"
+    )
+    return [
+        ffmpeg, "-y", "-hide_banner", "-loglevel", "error",
+        "-loop", "1", "-framerate", str(VIDEO_FPS), "-i", job["background"],
+        "-i", job["audio"],
+        "-vf", vf,
+        "-c:v", "libx264", "-preset", VIDEO_PRESET, "-tune", "stillimage", "-crf", str(VIDEO_CRF),
+        "-c:a", "aac", "-b:a", AUDIO_BITRATE,
+        "-shortest", "-movflags", "+faststart",
+        "-threads", str(threads),
+        "-f", "mp4", job["output"] + ".part",
+    ]
+
+# ======================================================
+# JOURNAL
+# ======================================================
+
+def load_journal(path: str) -> dict:
+    """Return {job_id: last journal entry}; later lines win."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            done[entry["id"]] = entry
+    return done
+
+def append_journal(path: str, entry: dict):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+# ======================================================
+# SCHEDULER
+# ======================================================
+
+def run_jobs(jobs, journal_path: str, max_jobs: int, threads_per_job: int, ram_per_job_mb: int):
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not found on PATH")
+
+    journal = load_journal(journal_path)
+    pending = []
+    for job in jobs:
+        entry = journal.get(job["id"])
+        if (entry and entry.get("status") == "done" and entry.get("signature") == job["signature"]
+                and os.path.exists(job["output"])):
+            continue
+        pending.append(job)
+
+    skipped = len(jobs) - len(pending)
+    if skipped:
+        print(f"ℹ️ Resuming: {skipped} video(s) already rendered according to {journal_path}")
+    if not pending:
+        print("✅ Nothing to render.")
+        return 0, 0
+
+    # Longest audio first keeps all cores busy until the end of the batch
+    pending.sort(key=lambda j: os.path.getsize(j["audio"]), reverse=True)
+    print(f"🎬 Rendering {len(pending)} video(s) with up to {max_jobs} parallel ffmpeg job(s)")
+
+    running = {}
+    ok = failed = 0
+    while pending or running:
+        # Start new jobs while there are free slots and enough RAM
+        while pending and len(running) < max_jobs:
+            free_mb = available_ram_mb()
+            if running and free_mb is not None and free_mb < ram_per_job_mb:
+                break
+            job = pending.pop(0)
+            os.makedirs(os.path.dirname(job["output"]), exist_ok=True)
+            with open(job["output"] + ".log", "wb") as log:
+                proc = subprocess.Popen(
+                    ffmpeg_command(job, ffmpeg, threads_per_job),
+                    stdout=subprocess.DEVNULL,
+                    stderr=log,
+                )
+            running[job["id"]] = (job, proc, time.time())
+            print(f"▶️ Surah {job['surah']} started ({len(running)} running, {len(pending)} queued)")
+
+        time.sleep(POLL_INTERVAL)
+
+        for job_id, (job, proc, started) in list(running.items()):
+            if proc.poll() is None:
+                continue
+            del running[job_id]
+            elapsed = round(time.time() - started, 1)
+            log_path = job["output"] + ".log"
+            if proc.returncode == 0:
+                os.replace(job["output"] + ".part", job["output"])
+                os.remove(log_path)
+                ok += 1
+                status = "done"
+                print(f"✅ Surah {job['surah']} rendered in {elapsed}s → {job['output']}")
+            else:
+                failed += 1
+                status = "failed"
+                try:
+                    os.remove(job["output"] + ".part")
+                except FileNotFoundError:
+                    pass
+                with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+                    stderr = f.read().strip()
+                print(f"❌ Surah {job['surah']} failed (exit {proc.returncode}), log: {log_path}\n{stderr[-500:]}")
+            append_journal(journal_path, {
+                "id": job_id,
+                "status": status,
+                "signature": job["signature"],
+                "output": job["output"],
+                "seconds": elapsed,
+            })
+
+    return ok, failed
+
+def default_parallelism(threads_per_job: int, ram_per_job_mb: int) -> int:
+    cpu_slots = max(1, (os.cpu_count() or 1) // max(1, threads_per_job))
+    free_mb = available_ram_mb()
+    if free_mb is None:
+        return cpu_slots
+    return max(1, min(cpu_slots, free_mb // max(1, ram_per_job_mb)))
+
+# ======================================================
+# CLI
+# ======================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Render surah videos (background + audio + burned-in subtitles) with ffmpeg.")
+    parser.add_argument("--reciter", type=int, help="Reciter ID (resolves the output folder name via Quran.com)")
+    parser.add_argument("--translation", type=str, default=DEFAULT_TRANSLATOR_QUERY,
+                        help=f"Translator name query (default: {DEFAULT_TRANSLATOR_QUERY})")
+    parser.add_argument("--reciter-folder", help="Reciter folder under output/ (skips the Quran.com lookup)")
+    parser.add_argument("--translation-folder", help="Translation folder under output/<reciter>/")
+    parser.add_argument("--surahs", default="1-114", help="Surahs to render, e.g. 1-114 or 1,36,67 (default: 1-114)")
+    parser.add_argument("--background", default=DEFAULT_BACKGROUND, help=f"Background image (default: {DEFAULT_BACKGROUND})")
+    parser.add_argument("--jobs", type=int, help="Max parallel ffmpeg jobs (default: from CPU count and free RAM)")
+    parser.add_argument("--threads-per-job", type=int, default=DEFAULT_THREADS_PER_JOB,
+                        help=f"ffmpeg threads per job (default: {DEFAULT_THREADS_PER_JOB})")
+    parser.add_argument("--ram-per-job", type=int, default=DEFAULT_RAM_PER_JOB_MB,
+                        help=f"Estimated RAM per job in MB; new jobs wait while less is free (default: {DEFAULT_RAM_PER_JOB_MB})")
+    args = parser.parse_args()
+
+    if args.reciter_folder and args.translation_folder:
+        rec_folder, tr_folder = args.reciter_folder, args.translation_folder
+    elif args.reciter:
+        from quran_srt_generator import find_translation_id, get_reciter_name, get_session
+        session = get_session()
+        rec_folder = safe_folder_name(get_reciter_name(args.reciter, session=session))
+        tr_folder = safe_folder_name(find_translation_id(args.translation, session=session)[1])
+    else:
+        parser.error("Provide --reciter, or both --reciter-folder and --translation-folder")
+
+    if not os.path.exists(args.background):
+        parser.error(f"Background image not found: {args.background}")
+    try:
+        surahs = parse_surah_list(args.surahs)
+    except ValueError as e:
+        parser.error(str(e))
+
+    base_dir = os.path.join(OUTPUT_ROOT, rec_folder, tr_folder)
+    audio_dir = os.path.join(OUTPUT_ROOT, rec_folder, "audio")
+    video_dir = os.path.join(base_dir, "video")
+    os.makedirs(video_dir, exist_ok=True)
+
+    jobs = build_jobs(base_dir, audio_dir, video_dir, surahs, args.background)
+    max_jobs = args.jobs or default_parallelism(args.threads_per_job, args.ram_per_job)
+    ok, failed = run_jobs(
+        jobs,
+        os.path.join(video_dir, JOURNAL_NAME),
+        max_jobs=max_jobs,
+        threads_per_job=args.threads_per_job,
+        ram_per_job_mb=args.ram_per_job,
+    )
+    print(f"\n✅ Done. Rendered: {ok}, failed: {failed}, videos in: {video_dir}")
+
+if __name__ == "__main__":
+    main()
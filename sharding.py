@@ -0,0 +1,202 @@
+# Splitting batch work across nodes.
+#
+#   --shard i/N      deterministic, size-balanced split: surahs are weighted by
+#                    ayah count and assigned longest-first to the lightest shard
+#                    (LPT), so every node gets a similar amount of work.
+#   --claims-dir D   nodes claim each item with a lock file in a shared folder
+#                    before working on it and leave a .done marker afterwards.
+#                    Keys include a hash of the output options, so a run with
+#                    other options redoes the work; with --refresh, markers
+#                    older than the run are ignored.
+#                    A node that finishes its shard steals unclaimed items from
+#                    the other shards (from the end of their queues), and claims
+#                    left by a crashed node expire after CLAIM_STALE_AFTER.
+#
+# Usage (4 machines sharing /mnt/quran):
+#   python quran_srt_generator.py --all --reciter 7 --shard 1/4 --claims-dir /mnt/quran/claims
+#   python quran_srt_generator.py --all --reciter 7 --shard 2/4 --claims-dir /mnt/quran/claims
+#   ...
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from file_lock import (
+    break_if_stale, read_lock, remove_lock, try_create_lock, unique_tmp_path,
+)
+from quran_metadata import AYAH_COUNTS
+
+# ======================================================
+# CONFIG
+# ======================================================
+CLAIM_HEARTBEAT = 30          # seconds between mtime refreshes of held claims
+CLAIM_STALE_AFTER = 600       # claims not refreshed for this long are taken over
+
+# ======================================================
+# STATIC ASSIGNMENT
+# ======================================================
+
+def parse_shard(value: str):
+    """Parse "i/N" (1-based) into (i, N)."""
+    try:
+        index, count = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}'. Expected i/N, e.g. 1/4")
+    if count < 1:
+        raise ValueError(f"Shard count must be at least 1, got {count}")
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard index must be 1-{count}, got {index}")
+    return index, count
+
+def surah_weight(surah: int) -> int:
+    return AYAH_COUNTS[surah - 1]
+
+def assign_shards(items, count: int, weight=surah_weight):
+    """
+    Longest-processing-time-first split of `items` into `count` lists.
+    Deterministic (ties broken by item and shard index); each list is in
+    descending weight order.
+    """
+    shards = [[] for _ in range(count)]
+    loads = [0] * count
+    for item in sorted(items, key=lambda x: (-weight(x), x)):
+        target = min(range(count), key=lambda k: (loads[k], k))
+        shards[target].append(item)
+        loads[target] += weight(item)
+    return shards
+
+def plan_items(items, shard=None, steal: bool = False, weight=surah_weight):
+    """
+    Order of items for this node: its own shard first, then (when stealing)
+    the other shards' items, taken round-robin from the end of their queues,
+    where their owners will get to them last.
+    """
+    items = list(items)
+    if shard is None:
+        return sorted(items, key=lambda x: (-weight(x), x))
+    index, count = shard
+    shards = assign_shards(items, count, weight)
+    plan = list(shards[index - 1])
+    if steal:
+        others = [list(reversed(s)) for k, s in enumerate(shards) if k != index - 1]
+        for depth in range(max((len(s) for s in others), default=0)):
+            plan.extend(s[depth] for s in others if depth < len(s))
+    return plan
+
+# ======================================================
+# CLAIMS
+# ======================================================
+
+def options_key(options: dict) -> str:
+    """Short hash of the options that change an item's output (part of its claim key)."""
+    blob = json.dumps(options, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:10]
+
+class WorkClaims:
+    """Lock-file claims for work items in a shared directory, with heartbeats."""
+
+    def __init__(self, claims_dir: str, stale_after: float = CLAIM_STALE_AFTER,
+                 heartbeat: float = CLAIM_HEARTBEAT, done_since: float = None):
+        self.claims_dir = claims_dir
+        self.done_since = done_since  # ignore .done markers older than this (a refresh run)
+        self.stale_after = stale_after
+        self.heartbeat = heartbeat
+        self._held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(claims_dir, exist_ok=True)
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.claims_dir, f"{key}.{suffix}")
+
+    def is_done(self, key: str) -> bool:
+        try:
+            mtime = os.stat(self._path(key, "done")).st_mtime
+        except FileNotFoundError:
+            return False
+        return self.done_since is None or mtime >= self.done_since
+
+    def claim(self, key: str) -> bool:
+        """Try to take `key`; False if it is done or held by a live claim."""
+        if self.is_done(key):
+            return False
+        lock_path = self._path(key, "lock")
+        while not try_create_lock(lock_path, {"key": key}):
+            previous = read_lock(lock_path).get("owner", "?")
+            if not break_if_stale(lock_path, self.stale_after):
+                return False
+            print(f"♻️ Taking over stale claim {key} (was {previous})")
+        # The item may have finished between the done check and the claim
+        if self.is_done(key):
+            remove_lock(lock_path)
+            return False
+        with self._lock:
+            self._held.add(key)
+        return True
+
+    def done(self, key: str):
+        done_path = self._path(key, "done")
+        tmp = unique_tmp_path(done_path)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f"{time.time():.0f}\n")
+        os.replace(tmp, done_path)
+        self.release(key)
+
+    def release(self, key: str):
+        """Give up a claim without marking it done (e.g. after a failure)."""
+        with self._lock:
+            self._held.discard(key)
+        remove_lock(self._path(key, "lock"))
+
+    def _beat(self):
+        while not self._stop.wait(self.heartbeat):
+            with self._lock:
+                held = list(self._held)
+            for key in held:
+                try:
+                    os.utime(self._path(key, "lock"))
+                except FileNotFoundError:
+                    pass
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        with self._lock:
+            held = list(self._held)
+        for key in held:
+            self.release(key)
+
+class WorkQueue:
+    """Thread-safe iterator over planned items; with claims, yields only items this node claimed."""
+
+    def __init__(self, items, claims: WorkClaims = None, key=str):
+        self._items = list(items)
+        self._pos = 0
+        self._lock = threading.Lock()
+        self.claims = claims
+        self.key = key
+
+    def next(self):
+        while True:
+            with self._lock:
+                if self._pos >= len(self._items):
+                    return None
+                item = self._items[self._pos]
+                self._pos += 1
+            if self.claims is None or self.claims.claim(self.key(item)):
+                return item
+
+    def finished(self, item, ok: bool):
+        if self.claims is None:
+            return
+        if ok:
+            self.claims.done(self.key(item))
+        else:
+            self.claims.release(self.key(item))
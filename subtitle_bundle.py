@@ -0,0 +1,251 @@
+# Packed subtitle output: one SQLite or zip bundle per reciter × translation.
+#
+# With --bundle, quran_srt_generator.py writes the CSV and subtitle files it
+# would put under output/<reciter>/<translation>/ into a single archive next to
+# that folder instead (output/<reciter>/<translation>.sqlite or .zip). Members
+# keep their usual relative names, so extracting gives the normal layout:
+#   csv/36.csv   srt/arabic/36_arabic.srt   vtt/translation/36_translation.vtt
+#   ranges/srt/arabic/juz30_arabic.srt
+#
+# SQLite bundles hold table files(name, surah, data, size) with an index on
+# surah; data is zlib-compressed. Zip bundles are plain deflated zips, rewritten
+# through a temporary copy on every update (SQLite only writes what changed).
+# Both let a reader fetch one member without unpacking the rest.
+#
+# Usage:
+#   python quran_srt_generator.py --all --reciter 7 --bundle sqlite
+#   python subtitle_bundle.py output/Mishari_Rashid_al_Afasy/Uzbek.sqlite --list --surahs 36
+#   python subtitle_bundle.py output/Mishari_Rashid_al_Afasy/Uzbek.sqlite --cat srt/arabic/36_arabic.srt
+#   python subtitle_bundle.py output/Mishari_Rashid_al_Afasy/Uzbek.zip --extract output/Mishari_Rashid_al_Afasy/Uzbek --surahs 1,36
+
+import argparse
+import os
+import re
+import sys
+import zlib
+
+from file_lock import exclusive_lock, unique_tmp_path
+
+# ======================================================
+# CONFIG
+# ======================================================
+BUNDLE_FORMATS = ("sqlite", "zip")
+BUNDLE_EXTENSIONS = {"sqlite": ".sqlite", "zip": ".zip"}
+COMPRESS_LEVEL = 6
+SQLITE_TIMEOUT = 60   # seconds a writer waits for another process's transaction
+
+# "csv/36.csv", "srt/arabic/36_arabic.srt"; files under ranges/ belong to no surah
+_SURAH_MEMBER = re.compile(r"^(?!ranges/)(?:[^/]+/)*(\d{1,3})(?:_[^/]*)?\.\w+$")
+
+# ======================================================
+# HELPERS
+# ======================================================
+
+def bundle_path(base_dir: str, fmt: str) -> str:
+    """output/<reciter>/<translation> -> output/<reciter>/<translation>.sqlite|.zip"""
+    return os.path.normpath(base_dir) + BUNDLE_EXTENSIONS[fmt]
+
+def member_surah(name: str):
+    m = _SURAH_MEMBER.match(name)
+    return int(m.group(1)) if m else None
+
+class BundleCollector:
+    """
+    File writer for subtitle_formats.emit_subtitles / write_csv that keeps the
+    encoded files in memory under their path relative to `base_dir`; commit()
+    stores them all in the bundle in one transaction.
+    """
+
+    def __init__(self, base_dir: str, path: str):
+        self.base_dir = base_dir
+        self.path = path
+        self.entries = {}
+
+    def __call__(self, out_path: str, content: str, encoding: str):
+        name = os.path.relpath(out_path, self.base_dir).replace(os.sep, "/")
+        self.entries[name] = content.encode(encoding)
+
+    def member(self, out_path: str) -> str:
+        """How an output path is shown once bundled: "<bundle>:<member>"."""
+        return f"{self.path}:{os.path.relpath(out_path, self.base_dir).replace(os.sep, '/')}"
+
+    def commit(self):
+        if self.entries:
+            write_entries(self.path, self.entries)
+            self.entries = {}
+
+# ======================================================
+# WRITE
+# ======================================================
+
+def write_entries(path: str, entries: dict):
+    """Add or replace {member name: bytes} in a bundle (created if missing)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.endswith(BUNDLE_EXTENSIONS["zip"]):
+        _write_zip(path, entries)
+    else:
+        _write_sqlite(path, entries)
+
+def _write_sqlite(path: str, entries: dict):
+    import sqlite3
+
+    conn = sqlite3.connect(path, timeout=SQLITE_TIMEOUT)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS files "
+                     "(name TEXT PRIMARY KEY, surah INTEGER, data BLOB NOT NULL, size INTEGER NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_surah ON files (surah)")
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (name, surah, data, size) VALUES (?, ?, ?, ?)",
+                [(name, member_surah(name), zlib.compress(data, COMPRESS_LEVEL), len(data))
+                 for name, data in entries.items()],
+            )
+    finally:
+        conn.close()
+
+def _write_zip(path: str, entries: dict):
+    import shutil
+    import zipfile
+
+    # Zip members cannot be replaced in place: new names are appended to a copy,
+    # changed members rewrite the archive; either way the result replaces the
+    # bundle atomically, so an interrupted run never leaves a truncated zip
+    with exclusive_lock(path):
+        existing = {}
+        if os.path.exists(path):
+            with zipfile.ZipFile(path) as zf:
+                existing = {info.filename: info for info in zf.infolist()}
+        tmp_path = unique_tmp_path(path)
+        try:
+            if not existing.keys() & entries.keys():
+                if existing:
+                    shutil.copyfile(path, tmp_path)
+                with zipfile.ZipFile(tmp_path, "a", zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as zf:
+                    for name, data in entries.items():
+                        zf.writestr(name, data)
+            else:
+                with zipfile.ZipFile(path) as src, \
+                        zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as dst:
+                    for name, info in existing.items():
+                        if name not in entries:
+                            dst.writestr(info, src.read(info))
+                    for name, data in entries.items():
+                        dst.writestr(name, data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+# ======================================================
+# READ
+# ======================================================
+
+class SubtitleBundle:
+    """Read-only access to one bundle; members are read individually."""
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Bundle not found: {path}")
+        self.path = path
+        self._zip = self._db = None
+        if path.endswith(BUNDLE_EXTENSIONS["zip"]):
+            import zipfile
+            self._zip = zipfile.ZipFile(path)
+        else:
+            import sqlite3
+            from urllib.parse import quote
+            self._db = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+        if self._db is not None:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def names(self, surahs=None):
+        """Member names, optionally only those of the given surahs."""
+        if self._zip is not None:
+            names = self._zip.namelist()
+            if surahs is not None:
+                wanted = set(surahs)
+                names = [n for n in names if member_surah(n) in wanted]
+            return sorted(names)
+        if surahs is None:
+            rows = self._db.execute("SELECT name FROM files ORDER BY name")
+        else:
+            surahs = list(surahs)
+            marks = ",".join("?" * len(surahs))
+            rows = self._db.execute(f"SELECT name FROM files WHERE surah IN ({marks}) ORDER BY name", surahs)
+        return [name for name, in rows]
+
+    def read(self, name: str) -> bytes:
+        if self._zip is not None:
+            try:
+                return self._zip.read(name)
+            except KeyError:
+                raise KeyError(f"{name} not in {self.path}")
+        row = self._db.execute("SELECT data FROM files WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"{name} not in {self.path}")
+        return zlib.decompress(row[0])
+
+    def extract(self, out_dir: str, names) -> list:
+        """Write members under `out_dir` (the normal output layout); returns the paths."""
+        paths = []
+        for name in names:
+            out_path = os.path.join(out_dir, *name.split("/"))
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            tmp_path = unique_tmp_path(out_path)
+            with open(tmp_path, "wb") as f:
+                f.write(self.read(name))
+            os.replace(tmp_path, out_path)
+            paths.append(out_path)
+        return paths
+
+# ======================================================
+# CLI
+# ======================================================
+
+def main():
+    from quran_metadata import parse_surah_list
+
+    parser = argparse.ArgumentParser(description="List, read or extract files from a subtitle bundle.")
+    parser.add_argument("bundle", help="Bundle written with quran_srt_generator.py --bundle (.sqlite or .zip)")
+    parser.add_argument("--list", action="store_true", help="List member files")
+    parser.add_argument("--cat", type=str, metavar="NAME", help="Write one member to stdout")
+    parser.add_argument("--extract", type=str, metavar="DIR", help="Extract members into DIR")
+    parser.add_argument("--surahs", type=str, help="Only these surahs, e.g. 36 or 1,78-114")
+    parser.add_argument("--name", action="append", help="Only this member (repeatable)")
+    args = parser.parse_args()
+
+    if not (args.list or args.cat or args.extract):
+        parser.error("Nothing to do: give --list, --cat NAME or --extract DIR")
+    try:
+        surahs = parse_surah_list(args.surahs) if args.surahs else None
+        bundle = SubtitleBundle(args.bundle)
+    except (ValueError, FileNotFoundError) as e:
+        parser.error(str(e))
+
+    with bundle:
+        try:
+            if args.cat:
+                sys.stdout.buffer.write(bundle.read(args.cat))
+                return
+            names = args.name or bundle.names(surahs)
+            if args.list:
+                for name in names:
+                    print(name)
+            if args.extract:
+                paths = bundle.extract(args.extract, names)
+                print(f"✅ {len(paths)} file(s) extracted to {args.extract}")
+        except KeyError as e:
+            parser.error(str(e.args[0]))
+
+if __name__ == "__main__":
+    main()
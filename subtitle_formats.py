@@ -0,0 +1,202 @@
+# Single-pass subtitle emitter: SRT, WebVTT, ASS, JSON and LRC.
+#
+# All tracks (e.g. Arabic + translation) and all requested formats are built in
+# one loop over the cues. Timestamps are formatted once per distinct value
+# (consecutive ayahs share from/to values) and every file is written with a
+# single buffered write.
+
+import json
+import os
+from functools import lru_cache
+
+# ======================================================
+# CONFIG
+# ======================================================
+SUPPORTED_FORMATS = ("srt", "vtt", "ass", "json", "lrc")
+DEFAULT_FORMATS = ("srt",)
+
+FORMAT_EXTENSIONS = {"srt": "srt", "vtt": "vtt", "ass": "ass", "json": "json", "lrc": "lrc"}
+
+WRITE_BUFFER_SIZE = 1024 * 256
+
+# ASS styles; fonts match the ones bundled in data/fonts
+ASS_STYLES = {
+    "arabic": ("KFGQPC Uthman Taha Naskh", 64),
+    "translation": ("Poppins", 40),
+}
+ASS_DEFAULT_STYLE = ("Poppins", 40)
+
+# ======================================================
+# TIMESTAMPS
+# ======================================================
+
+def _split_ms(ms: int):
+    s, ms = divmod(int(ms), 1000)
+    m, s = divmod(s, 60)
+    h, m = divmod(m, 60)
+    return h, m, s, ms
+
+@lru_cache(maxsize=4096)
+def ms_to_srt(ms: int) -> str:
+    h, m, s, ms = _split_ms(ms)
+    return f"{h:02}:{m:02}:{s:02},{ms:03}"
+
+@lru_cache(maxsize=4096)
+def ms_to_vtt(ms: int) -> str:
+    h, m, s, ms = _split_ms(ms)
+    return f"{h:02}:{m:02}:{s:02}.{ms:03}"
+
+@lru_cache(maxsize=4096)
+def ms_to_ass(ms: int) -> str:
+    h, m, s, ms = _split_ms(ms)
+    return f"{h}:{m:02}:{s:02}.{ms // 10:02}"
+
+@lru_cache(maxsize=4096)
+def ms_to_lrc(ms: int) -> str:
+    total_s, ms = divmod(int(ms), 1000)
+    m, s = divmod(total_s, 60)
+    return f"[{m:02}:{s:02}.{ms // 10:02}]"
+
+def parse_formats(value) -> list:
+    """Parse a comma-separated format list (e.g. "srt,vtt") into a validated list."""
+    if not value:
+        return list(DEFAULT_FORMATS)
+    if isinstance(value, str):
+        value = value.split(",")
+    formats = []
+    for fmt in value:
+        fmt = fmt.strip().lower()
+        if not fmt:
+            continue
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported subtitle format '{fmt}'. Choose from: {', '.join(SUPPORTED_FORMATS)}")
+        if fmt not in formats:
+            formats.append(fmt)
+    return formats or list(DEFAULT_FORMATS)
+
+# ======================================================
+# FORMAT HEADERS / CUES
+# ======================================================
+
+def _ass_header(track: str) -> str:
+    font, size = ASS_STYLES.get(track, ASS_DEFAULT_STYLE)
+    return (
+        "[Script Info]\n"
+        "ScriptType: v4.00+\n"
+        "PlayResX: 1920\n"
+        "PlayResY: 1080\n"
+        "WrapStyle: 0\n"
+        "\n"
+        "[V4+ Styles]\n"
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding\n"
+        f"Style: Default,{font},{size},&H00FFFFFF,&H000000FF,&H00000000,&H64000000,"
+        "0,0,0,0,100,100,0,0,1,2,0,2,60,60,60,1\n"
+        "\n"
+        "[Events]\n"
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+    )
+
+def _ass_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("{", "(").replace("}", ")").replace("\n", "\\N")
+
+_HEADERS = {
+    "srt": lambda track: "",
+    "vtt": lambda track: "WEBVTT\n\n",
+    "ass": _ass_header,
+    "lrc": lambda track: "",
+}
+
+# ======================================================
+# EMIT
+# ======================================================
+
+def render_subtitles(timings, tracks):
+    """Render every track in every requested format in a single pass over the cues.
+
+    `tracks` is a list of (track_name, texts, formats) tuples.
+    Returns {(track_name, format): content}.
+    """
+    buffers = []
+    json_cues = []
+    for track, texts, formats in tracks:
+        for fmt in formats:
+            if fmt not in SUPPORTED_FORMATS:
+                raise ValueError(f"Unsupported subtitle format '{fmt}'")
+            if fmt == "json":
+                json_cues.append((track, texts, []))
+                continue
+            buffers.append((track, fmt, texts, [_HEADERS[fmt](track)]))
+
+    for i, t in enumerate(timings):
+        start_ms, end_ms = t["from"], t["to"]
+        number = i + 1
+        for track, fmt, texts, parts in buffers:
+            line = texts[i] if i < len(texts) else ""
+            if fmt == "srt":
+                parts.append(f"{number}\n{ms_to_srt(start_ms)} --> {ms_to_srt(end_ms)}\n{line}\n\n")
+            elif fmt == "vtt":
+                parts.append(f"{number}\n{ms_to_vtt(start_ms)} --> {ms_to_vtt(end_ms)}\n{line}\n\n")
+            elif fmt == "ass":
+                parts.append(
+                    f"Dialogue: 0,{ms_to_ass(start_ms)},{ms_to_ass(end_ms)},Default,,0,0,0,,{_ass_text(line)}\n"
+                )
+            else:  # lrc: one line per cue, multi-line cues joined with " / "
+                parts.append(f"{ms_to_lrc(start_ms)}{line.replace(chr(10), ' / ')}\n")
+        for _, texts, cues in json_cues:
+            cues.append({
+                "ayah": number,
+                "verse_key": t.get("verse_key", ""),
+                "from": start_ms,
+                "to": end_ms,
+                "text": texts[i] if i < len(texts) else "",
+            })
+
+    rendered = {}
+    for track, fmt, _, parts in buffers:
+        if fmt == "lrc" and timings:
+            # LRC has no end times; close the last cue with an empty line
+            parts.append(f"{ms_to_lrc(timings[-1]['to'])}\n")
+        rendered[(track, fmt)] = "".join(parts)
+    for track, _, cues in json_cues:
+        rendered[(track, "json")] = json.dumps({"track": track, "cues": cues}, ensure_ascii=False, indent=2)
+    return rendered
+
+def emit_subtitles(timings, tracks, bom: bool = False, writer=None):
+    """Write every track in every requested format in a single pass over the cues.
+
+    `tracks` is a list of (track_name, texts, {format: out_path}) tuples.
+    `writer(out_path, content, encoding)` replaces the file write (e.g. a bundle).
+    Returns {(track_name, format): out_path}.
+    """
+    rendered = render_subtitles(timings, [(track, texts, list(outputs)) for track, texts, outputs in tracks])
+    encoding = "utf-8-sig" if bom else "utf-8"
+    writer = writer or _write_text
+    written = {}
+    for track, _, outputs in tracks:
+        for fmt, out_path in outputs.items():
+            # JSON is always written without BOM
+            writer(out_path, rendered[(track, fmt)], "utf-8" if fmt == "json" else encoding)
+            written[(track, fmt)] = out_path
+    return written
+
+def _write_text(out_path: str, content: str, encoding: str):
+    directory = os.path.dirname(out_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(out_path, "w", encoding=encoding, buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(content)
+
+def subtitle_path(base_dir: str, fmt: str, track: str, surah: int) -> str:
+    """Standard output location, e.g. <base>/srt/arabic/1_arabic.srt."""
+    return os.path.join(base_dir, fmt, track, f"{surah}_{track}.{FORMAT_EXTENSIONS[fmt]}")
+
+def write_surah_subtitles(base_dir: str, surah: int, timings, tracks: dict, formats=DEFAULT_FORMATS, bom: bool = False,
+                          writer=None):
+    """Write {track_name: texts} for one surah in all `formats` under `base_dir`."""
+    spec = [
+        (track, texts, {fmt: subtitle_path(base_dir, fmt, track, surah) for fmt in formats})
+        for track, texts in tracks.items()
+    ]
+    return emit_subtitles(timings, spec, bom=bom, writer=writer)
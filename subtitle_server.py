@@ -0,0 +1,286 @@
+# Small asyncio HTTP service that renders subtitles on demand.
+#
+# Started through the main script:
+#   python quran_srt_generator.py --serve --serve-port 8080 --workers 4
+#
+# Endpoints:
+#   GET /reciter/{reciter_id}/translation/{translation_id}/surah/{n}[.srt|.vtt|.json|.ass|.lrc]
+#       ?format=srt|vtt|json|ass|lrc   (default: srt, or the file extension)
+#       ?track=arabic|translation      (default: arabic; JSON without track returns both)
+#   GET /health
+#
+# Payloads are built with the same fetch / timing functions as the CLI (so the
+# per-surah disk cache is shared), kept in a bounded in-memory LRU, and
+# concurrent requests for the same payload wait on a single build.
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import socket
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Process
+from urllib.parse import parse_qs, urlsplit
+
+from subtitle_formats import SUPPORTED_FORMATS, render_subtitles
+
+# ======================================================
+# CONFIG
+# ======================================================
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_CACHE_ENTRIES = 1024
+FETCH_THREADS = 8
+MAX_HEADER_BYTES = 16 * 1024
+KEEPALIVE_TIMEOUT = 15
+
+CONTENT_TYPES = {
+    "srt": "application/x-subrip; charset=utf-8",
+    "vtt": "text/vtt; charset=utf-8",
+    "json": "application/json; charset=utf-8",
+    "ass": "text/x-ssa; charset=utf-8",
+    "lrc": "text/plain; charset=utf-8",
+}
+TRACKS = ("arabic", "translation")
+
+ROUTE = re.compile(
+    r"^/reciter/(\d+)/translation/(\d+)/surah/(\d+)(?:\.(" + "|".join(SUPPORTED_FORMATS) + r"))?/?$"
+)
+
+# ======================================================
+# LRU + COALESCING
+# ======================================================
+
+class PayloadCache:
+    """Bounded LRU of rendered payloads with single-flight builds per key."""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = self.misses = self.coalesced = 0
+
+    async def get(self, key, build):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # this waiter was cancelled
+                return await self.get(key, build)  # the builder was cancelled: build again
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            entry = await build()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        except BaseException:
+            future.cancel()  # builder cancelled (client gone, shutdown): wake the waiters
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(entry)
+
+        self._entries[key] = entry
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+# ======================================================
+# SERVICE
+# ======================================================
+
+class SubtitleService:
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        # Imported here so the main script can import this module lazily for --serve
+        import quran_srt_generator as gen
+
+        self._gen = gen
+        self._session = gen.get_session()
+        self._executor = ThreadPoolExecutor(max_workers=FETCH_THREADS)
+        self.cache = PayloadCache(max_entries)
+
+    def _build_sync(self, reciter_id: int, translation_id: int, surah: int, fmt: str, track):
+        artifacts = self._gen.load_surah_artifacts(surah, reciter_id, translation_id, session=self._session)
+        tracks = [track] if track else list(TRACKS)
+        rendered = render_subtitles(
+            artifacts["timings"],
+            [(name, artifacts[name], [fmt]) for name in tracks]
+        )
+        if len(tracks) == 1:
+            body = rendered[(tracks[0], fmt)]
+        else:
+            body = json.dumps(
+                {name: json.loads(rendered[(name, fmt)])["cues"] for name in tracks},
+                ensure_ascii=False
+            )
+        data = body.encode("utf-8")
+        return data, CONTENT_TYPES[fmt], '"' + hashlib.sha1(data).hexdigest() + '"'
+
+    async def payload(self, reciter_id: int, translation_id: int, surah: int, fmt: str, track):
+        key = (reciter_id, translation_id, surah, fmt, track)
+        loop = asyncio.get_running_loop()
+        return await self.cache.get(
+            key,
+            lambda: loop.run_in_executor(self._executor, self._build_sync, reciter_id, translation_id, surah, fmt, track)
+        )
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "cached": len(self.cache._entries),
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "coalesced": self.cache.coalesced,
+        }
+
+# ======================================================
+# HTTP
+# ======================================================
+
+_REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 502: "Bad Gateway"}
+
+def _response(status: int, body: bytes = b"", content_type: str = "text/plain; charset=utf-8",
+              headers=None, keep_alive: bool = True) -> bytes:
+    lines = [
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        "Access-Control-Allow-Origin: *",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+async def _handle_request(service: SubtitleService, method: str, target: str, headers: dict, keep_alive: bool):
+    if method not in ("GET", "HEAD"):
+        return _response(405, b"Method not allowed\n", keep_alive=keep_alive)
+
+    url = urlsplit(target)
+    if url.path == "/health":
+        body = json.dumps(service.stats()).encode()
+        return _response(200, body, CONTENT_TYPES["json"], keep_alive=keep_alive)
+
+    match = ROUTE.match(url.path)
+    if not match:
+        return _response(404, b"Not found\n", keep_alive=keep_alive)
+
+    query = parse_qs(url.query)
+    reciter_id, translation_id, surah = (int(x) for x in match.group(1, 2, 3))
+    fmt = (query.get("format", [None])[0] or match.group(4) or "srt").lower()
+    track = query.get("track", [None])[0]
+    if track is None and fmt != "json":
+        track = "arabic"
+    if fmt not in SUPPORTED_FORMATS or (track and track not in TRACKS) or not 1 <= surah <= 114:
+        return _response(400, b"Invalid format, track or surah\n", keep_alive=keep_alive)
+
+    try:
+        data, content_type, etag = await service.payload(reciter_id, translation_id, surah, fmt, track)
+    except Exception as e:
+        return _response(502, f"Upstream error: {e}\n".encode("utf-8"), keep_alive=keep_alive)
+
+    cache_headers = {"ETag": etag, "Cache-Control": "public, max-age=3600"}
+    if headers.get("if-none-match") == etag:
+        return _response(304, b"", content_type, cache_headers, keep_alive)
+    if method == "HEAD":
+        response = _response(200, data, content_type, cache_headers, keep_alive)
+        return response[:len(response) - len(data)]
+    return _response(200, data, content_type, cache_headers, keep_alive)
+
+async def _handle_connection(service: SubtitleService, reader, writer):
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                break
+            except asyncio.LimitOverrunError:
+                writer.write(_response(400, b"Headers too large\n", keep_alive=False))
+                break
+
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ", 2)
+            except ValueError:
+                writer.write(_response(400, b"Bad request line\n", keep_alive=False))
+                break
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+            writer.write(await _handle_request(service, method, target, headers, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+async def _serve_forever(host: str, port: int, max_entries: int, reuse_port: bool):
+    service = SubtitleService(max_entries)
+    server = await asyncio.start_server(
+        lambda r, w: _handle_connection(service, r, w),
+        host, port,
+        reuse_port=reuse_port or None,
+        limit=MAX_HEADER_BYTES,
+    )
+    print(f"🌐 Worker {os.getpid()} serving on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def _run_worker(host: str, port: int, max_entries: int, reuse_port: bool):
+    try:
+        asyncio.run(_serve_forever(host, port, max_entries, reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = 1,
+          max_entries: int = DEFAULT_CACHE_ENTRIES):
+    """Run the HTTP service; with workers > 1 each process binds the port with SO_REUSEPORT."""
+    if workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        print("⚠️ SO_REUSEPORT is not available on this platform; running a single worker.")
+        workers = 1
+
+    if workers == 1:
+        _run_worker(host, port, max_entries, False)
+        return
+
+    processes = [
+        Process(target=_run_worker, args=(host, port, max_entries, True), daemon=True)
+        for _ in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    try:
+        while any(p.is_alive() for p in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in processes:
+            p.terminate()
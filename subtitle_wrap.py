@@ -0,0 +1,233 @@
+# Font-metric-aware line wrapping for subtitle cues.
+#
+# Text is measured with the bundled TTFs in data/fonts: glyph advance widths
+# are read once per font (cmap + hmtx) into a flat per-codepoint table and
+# scaled once per pixel size, so measuring a word is a sum over array lookups.
+#
+# Arabic is measured with the nominal (unshaped) glyph advances. Joined forms
+# are usually narrower than isolated ones, so wrapping errs on the safe side.
+# Combining marks (harakat) have zero advance in the font and add no width.
+
+import os
+import struct
+from array import array
+from functools import lru_cache
+
+# ======================================================
+# CONFIG
+# ======================================================
+FONTS_DIR = os.path.join("data", "fonts")
+ARABIC_FONT = os.path.join(FONTS_DIR, "KFGQPC Uthman Taha Naskh Regular.ttf")
+LATIN_FONT = os.path.join(FONTS_DIR, "Poppins-Regular.ttf")
+
+DEFAULT_WRAP_WIDTH = 1600        # px, for a 1920px wide frame with margins
+DEFAULT_MAX_LINES = 2
+DEFAULT_ARABIC_FONT_SIZE = 64    # px
+DEFAULT_LATIN_FONT_SIZE = 40     # px
+
+_BMP_SIZE = 0x10000
+
+# ======================================================
+# TTF METRICS
+# ======================================================
+
+def _read_tables(data: bytes) -> dict:
+    num_tables = struct.unpack_from(">H", data, 4)[0]
+    tables = {}
+    for i in range(num_tables):
+        tag, _, offset, length = struct.unpack_from(">4sIII", data, 12 + 16 * i)
+        tables[tag.decode("latin-1")] = (offset, length)
+    return tables
+
+def _parse_cmap(data: bytes, offset: int) -> dict:
+    """Return {codepoint: glyph_id} from the best Unicode subtable (format 12 or 4)."""
+    num = struct.unpack_from(">H", data, offset + 2)[0]
+    subtables = {}
+    for i in range(num):
+        platform, encoding, sub_offset = struct.unpack_from(">HHI", data, offset + 4 + 8 * i)
+        fmt = struct.unpack_from(">H", data, offset + sub_offset)[0]
+        subtables[(platform, encoding, fmt)] = offset + sub_offset
+
+    mapping = {}
+    for key in ((3, 10, 12), (0, 4, 12), (0, 6, 12), (3, 1, 4), (0, 3, 4), (0, 1, 4), (0, 0, 4)):
+        if key not in subtables:
+            continue
+        pos = subtables[key]
+        if key[2] == 12:
+            n_groups = struct.unpack_from(">I", data, pos + 12)[0]
+            for g in range(n_groups):
+                start, end, glyph = struct.unpack_from(">III", data, pos + 16 + 12 * g)
+                for cp in range(start, end + 1):
+                    mapping[cp] = glyph + cp - start
+        else:
+            seg_x2 = struct.unpack_from(">H", data, pos + 6)[0]
+            seg = seg_x2 // 2
+            ends_pos = pos + 14
+            starts_pos = ends_pos + seg_x2 + 2
+            deltas_pos = starts_pos + seg_x2
+            ranges_pos = deltas_pos + seg_x2
+            ends = struct.unpack_from(f">{seg}H", data, ends_pos)
+            starts = struct.unpack_from(f">{seg}H", data, starts_pos)
+            deltas = struct.unpack_from(f">{seg}h", data, deltas_pos)
+            range_offsets = struct.unpack_from(f">{seg}H", data, ranges_pos)
+            for i in range(seg):
+                for cp in range(starts[i], ends[i] + 1):
+                    if cp == 0xFFFF:
+                        continue
+                    if range_offsets[i] == 0:
+                        glyph = (cp + deltas[i]) & 0xFFFF
+                    else:
+                        addr = ranges_pos + 2 * i + range_offsets[i] + 2 * (cp - starts[i])
+                        glyph = struct.unpack_from(">H", data, addr)[0]
+                        if glyph:
+                            glyph = (glyph + deltas[i]) & 0xFFFF
+                    if glyph:
+                        mapping[cp] = glyph
+        return mapping
+    return mapping
+
+@lru_cache(maxsize=None)
+def load_font_metrics(font_path: str):
+    """Return (units_per_em, {codepoint: advance_in_font_units}) for a TTF/OTF file."""
+    with open(font_path, "rb") as f:
+        data = f.read()
+    tables = _read_tables(data)
+    for required in ("head", "hhea", "hmtx", "cmap"):
+        if required not in tables:
+            raise ValueError(f"Font {font_path} has no '{required}' table")
+
+    units_per_em = struct.unpack_from(">H", data, tables["head"][0] + 18)[0]
+    num_h_metrics = struct.unpack_from(">H", data, tables["hhea"][0] + 34)[0]
+    hmtx = tables["hmtx"][0]
+    advances = struct.unpack_from(f">{num_h_metrics * 2}H", data, hmtx)[::2]
+    last_advance = advances[-1]
+
+    cmap = _parse_cmap(data, tables["cmap"][0])
+    widths = {
+        cp: advances[glyph] if glyph < num_h_metrics else last_advance
+        for cp, glyph in cmap.items()
+    }
+    return units_per_em, widths
+
+# ======================================================
+# MEASUREMENT
+# ======================================================
+
+class TextMeasurer:
+    """Pixel width of text for one font at one size, backed by a flat advance table."""
+
+    def __init__(self, font_path: str, size_px: float):
+        units_per_em, widths = load_font_metrics(font_path)
+        scale = size_px / units_per_em
+        fallback = widths.get(ord("?"), units_per_em // 2) * scale
+        table = array("f", [fallback]) * _BMP_SIZE
+        for cp, advance in widths.items():
+            if cp < _BMP_SIZE:
+                table[cp] = advance * scale
+        # Line breaks and format controls take no space
+        for cp in (0x0A, 0x0D, 0x200C, 0x200D, 0x200E, 0x200F, 0xFEFF):
+            table[cp] = 0.0
+        self.font_path = font_path
+        self.size_px = size_px
+        self._table = table
+        self._astral = {cp: w * scale for cp, w in widths.items() if cp >= _BMP_SIZE}
+        self._astral_fallback = fallback
+        self._word_cache = {}
+        self.space_width = table[0x20]
+
+    def width(self, text: str) -> float:
+        try:
+            return sum(map(self._table.__getitem__, map(ord, text)))
+        except IndexError:  # characters outside the BMP
+            return sum(
+                self._table[cp] if cp < _BMP_SIZE else self._astral.get(cp, self._astral_fallback)
+                for cp in map(ord, text)
+            )
+
+    def word_width(self, word: str) -> float:
+        w = self._word_cache.get(word)
+        if w is None:
+            w = self._word_cache[word] = self.width(word)
+        return w
+
+@lru_cache(maxsize=32)
+def get_measurer(font_path: str, size_px: float) -> TextMeasurer:
+    return TextMeasurer(font_path, size_px)
+
+# ======================================================
+# WRAPPING
+# ======================================================
+
+def wrap_text(text: str, measurer: TextMeasurer, max_width: float):
+    """Greedy word wrap; returns a list of lines. Words wider than a line get their own line."""
+    lines = []
+    for paragraph in (text or "").split("\n"):
+        words = paragraph.split()
+        if not words:
+            continue
+        line_words = [words[0]]
+        line_width = measurer.word_width(words[0])
+        for word in words[1:]:
+            w = measurer.word_width(word)
+            if line_width + measurer.space_width + w <= max_width:
+                line_words.append(word)
+                line_width += measurer.space_width + w
+            else:
+                lines.append(" ".join(line_words))
+                line_words = [word]
+                line_width = w
+        lines.append(" ".join(line_words))
+    return lines
+
+def wrap_cues(timings, texts, measurer: TextMeasurer, max_width: float, max_lines: int = DEFAULT_MAX_LINES):
+    """
+    Wrap every cue to `max_width` px. Cues that still need more than `max_lines`
+    lines are split into consecutive cues, with the cue's time divided in
+    proportion to the width of each part.
+
+    Returns (timings, texts). When no cue had to be split the original `timings`
+    object is returned, so callers can keep tracks on a shared timeline.
+    """
+    out_timings, out_texts = [], []
+    split_any = False
+    for i, t in enumerate(timings):
+        lines = wrap_text(texts[i] if i < len(texts) else "", measurer, max_width)
+        if len(lines) <= max_lines:
+            out_timings.append(t)
+            out_texts.append("\n".join(lines))
+            continue
+
+        split_any = True
+        groups = [lines[j:j + max_lines] for j in range(0, len(lines), max_lines)]
+        weights = [max(1.0, sum(measurer.width(line) for line in g)) for g in groups]
+        total = sum(weights)
+        start_ms, end_ms = t["from"], t["to"]
+        span = end_ms - start_ms
+        acc = 0.0
+        for k, group in enumerate(groups):
+            part_start = start_ms + round(span * acc / total)
+            acc += weights[k]
+            part_end = end_ms if k == len(groups) - 1 else start_ms + round(span * acc / total)
+            part = dict(t)
+            part["from"], part["to"] = part_start, part_end
+            out_timings.append(part)
+            out_texts.append("\n".join(group))
+
+    if not split_any:
+        return timings, out_texts
+    return out_timings, out_texts
+
+def wrap_tracks(timings, tracks: dict, max_width: float, max_lines: int = DEFAULT_MAX_LINES,
+                arabic_font_size: float = DEFAULT_ARABIC_FONT_SIZE, latin_font_size: float = DEFAULT_LATIN_FONT_SIZE):
+    """
+    Wrap {track_name: texts}; the "arabic" track uses the Uthmani font, others the Latin font.
+    Returns {track_name: (timings, texts)}.
+    """
+    wrapped = {}
+    for track, texts in tracks.items():
+        if track == "arabic":
+            measurer = get_measurer(ARABIC_FONT, arabic_font_size)
+        else:
+            measurer = get_measurer(LATIN_FONT, latin_font_size)
+        wrapped[track] = wrap_cues(timings, texts, measurer, max_width, max_lines)
+    return wrapped
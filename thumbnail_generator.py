@@ -0,0 +1,208 @@
+# Batch cover / thumbnail renderer for every surah.
+#
+# Install: python -m pip install pillow
+# (Arabic shaping needs Pillow built with libraqm, or: pip install arabic-reshaper python-bidi)
+#
+# Usage examples:
+#   python thumbnail_generator.py
+#   python thumbnail_generator.py --background data/BG-2.png data/BG-3.png --surahs 78-114
+#   python thumbnail_generator.py --capcut-dir data/CapCut/Mishari
+#   python thumbnail_generator.py --capcut-dir auto     # detect the CapCut projects folder
+#
+# Covers are written to output/thumbnails/<surah>.jpg and, when a CapCut
+# projects folder is given, to <project>/draft_cover.jpg for every project
+# named after quran_sura_names_uzbek.txt.
+
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont, features
+
+from capcut_template_generator import NAMES_FILE, clean_name, resolve_template_dir
+from quran_metadata import SURAH_NAMES_AR, TOTAL_SURAHS, parse_surah_list
+
+# ======================================================
+# CONFIG
+# ======================================================
+DEFAULT_BACKGROUND = os.path.join("data", "BG.png")
+THUMBNAIL_DIR = os.path.join("output", "thumbnails")
+ARABIC_FONT = os.path.join("data", "fonts", "KFGQPC Uthman Taha Naskh Regular.ttf")
+LATIN_FONT = os.path.join("data", "fonts", "Poppins-Regular.ttf")
+
+COVER_SIZE = (1280, 720)
+JPEG_QUALITY = 90
+
+TEXT_COLOR = (255, 255, 255, 255)
+STROKE_COLOR = (0, 0, 0, 200)
+SUBTITLE_TEXT = "Quroni Karim"
+LIST_NUMBER = re.compile(r"^\d+\.\s*")  # "1. Fotiha" in the names file -> "Fotiha" on the cover
+
+# ======================================================
+# CACHED RESOURCES (per worker process)
+# ======================================================
+
+_HAS_RAQM = features.check("raqm")
+
+@lru_cache(maxsize=None)
+def load_font(path: str, size: int):
+    if _HAS_RAQM:
+        return ImageFont.truetype(path, size, layout_engine=ImageFont.Layout.RAQM)
+    return ImageFont.truetype(path, size)
+
+@lru_cache(maxsize=8)
+def load_background(path: str, size):
+    """Decode a background once, scale it to cover `size` and center-crop."""
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        scale = max(size[0] / img.width, size[1] / img.height)
+        resized = img.resize((round(img.width * scale), round(img.height * scale)), Image.LANCZOS)
+    left = (resized.width - size[0]) // 2
+    top = (resized.height - size[1]) // 2
+    return resized.crop((left, top, left + size[0], top + size[1]))
+
+def shape_arabic(text: str) -> str:
+    """Return text ready for drawing: as-is with raqm, otherwise reshaped + reordered if possible."""
+    if _HAS_RAQM:
+        return text
+    try:
+        import arabic_reshaper
+        from bidi.algorithm import get_display
+    except ImportError:
+        return text
+    return get_display(arabic_reshaper.reshape(text))
+
+@lru_cache(maxsize=512)
+def render_text_layer(text: str, font_path: str, size: int, rtl: bool = False):
+    """Render text (with outline) to a tightly cropped RGBA layer."""
+    font = load_font(font_path, size)
+    stroke = max(2, size // 24)
+    kwargs = {"direction": "rtl", "language": "ar"} if rtl and _HAS_RAQM else {}
+    draw_text = shape_arabic(text) if rtl else text
+    probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = probe.textbbox((0, 0), draw_text, font=font, stroke_width=stroke, **kwargs)
+    layer = Image.new("RGBA", (right - left, bottom - top), (0, 0, 0, 0))
+    ImageDraw.Draw(layer).text(
+        (-left, -top), draw_text, font=font, fill=TEXT_COLOR,
+        stroke_width=stroke, stroke_fill=STROKE_COLOR, **kwargs
+    )
+    return layer
+
+def fit_text_layer(text: str, font_path: str, size: int, max_width: int, rtl: bool = False):
+    """Largest layer not wider than `max_width`, shrinking the font in 10% steps."""
+    while True:
+        layer = render_text_layer(text, font_path, size, rtl)
+        if layer.width <= max_width or size <= 12:
+            return layer
+        size = int(size * 0.9)
+
+# ======================================================
+# RENDER
+# ======================================================
+
+def render_cover(job: dict):
+    """Render one cover and write it to every target path. Runs in a worker process."""
+    width, height = COVER_SIZE
+    cover = load_background(job["background"], COVER_SIZE).convert("RGBA")
+    max_text_width = int(width * 0.9)
+
+    layers = [
+        fit_text_layer(f"سورة {job['arabic']}", ARABIC_FONT, 150, max_text_width, rtl=True),
+        fit_text_layer(job["title"], LATIN_FONT, 72, max_text_width),
+        render_text_layer(SUBTITLE_TEXT, LATIN_FONT, 40),
+    ]
+    gap = 24
+    y = (height - sum(layer.height for layer in layers) - gap * (len(layers) - 1)) // 2
+    for layer in layers:
+        cover.alpha_composite(layer, ((width - layer.width) // 2, y))
+        y += layer.height + gap
+
+    cover = cover.convert("RGB")
+    for target in job["targets"]:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        out = cover
+        # Keep the size CapCut already uses for this project's cover
+        if os.path.basename(target) == "draft_cover.jpg" and os.path.exists(target):
+            with Image.open(target) as existing:
+                if existing.size != cover.size:
+                    out = cover.resize(existing.size, Image.LANCZOS)
+        tmp = target + ".tmp"
+        out.save(tmp, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        os.replace(tmp, target)
+    return job["surah"], job["targets"]
+
+# ======================================================
+# JOBS
+# ======================================================
+
+def load_titles(names_file: str = NAMES_FILE):
+    """Return the names file lines ("1. Fotiha", ...) in surah order."""
+    with open(names_file, "r", encoding="utf-8") as f:
+        names = [line.strip() for line in f if line.strip()]
+    if len(names) != TOTAL_SURAHS:
+        raise ValueError(f"Expected {TOTAL_SURAHS} names in {names_file}, found {len(names)}")
+    return names
+
+def build_jobs(surahs, backgrounds, capcut_dir=None, out_dir: str = THUMBNAIL_DIR):
+    titles = load_titles()
+    jobs = []
+    for i, surah in enumerate(surahs):
+        title = titles[surah - 1]
+        targets = [os.path.join(out_dir, f"{surah:03}.jpg")]
+        if capcut_dir:
+            project = os.path.join(capcut_dir, clean_name(title))
+            if os.path.isdir(project):
+                targets.append(os.path.join(project, "draft_cover.jpg"))
+        jobs.append({
+            "surah": surah,
+            "title": f"{LIST_NUMBER.sub('', title)} surasi",
+            "arabic": SURAH_NAMES_AR[surah - 1],
+            "background": backgrounds[i % len(backgrounds)],
+            "targets": targets,
+        })
+    return jobs
+
+# ======================================================
+# CLI
+# ======================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Render surah cover thumbnails and write them into CapCut projects.")
+    parser.add_argument("--background", nargs="+", default=[DEFAULT_BACKGROUND],
+                        help="Background image(s); several are used in rotation (default: data/BG.png)")
+    parser.add_argument("--surahs", default=f"1-{TOTAL_SURAHS}", help="Surahs to render, e.g. 1-114 or 1,36,67")
+    parser.add_argument("--capcut-dir", help="CapCut projects folder to update draft_cover.jpg in ('auto' to detect)")
+    parser.add_argument("--out-dir", default=THUMBNAIL_DIR, help=f"Thumbnail output folder (default: {THUMBNAIL_DIR})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    for bg in args.background:
+        if not os.path.exists(bg):
+            parser.error(f"Background image not found: {bg}")
+    try:
+        surahs = parse_surah_list(args.surahs)
+    except ValueError as e:
+        parser.error(str(e))
+
+    capcut_dir = None
+    if args.capcut_dir:
+        capcut_dir = resolve_template_dir(None if args.capcut_dir == "auto" else args.capcut_dir)
+        print(f"Using CapCut projects folder: {capcut_dir}")
+    if not _HAS_RAQM:
+        print("ℹ️ Pillow has no raqm support; Arabic is shaped with arabic-reshaper/python-bidi if installed.")
+
+    jobs = build_jobs(surahs, args.background, capcut_dir=capcut_dir, out_dir=args.out_dir)
+    started = time.time()
+    written = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for surah, targets in pool.map(render_cover, jobs, chunksize=4):
+            written += len(targets)
+            print(f"✅ Surah {surah}: {', '.join(targets)}")
+
+    print(f"\n✅ Done. {len(jobs)} covers ({written} files) in {time.time() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
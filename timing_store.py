@@ -0,0 +1,234 @@
+# Binary ayah timing store (one file per reciter).
+#
+# Lookup example:
+#   python timing_store.py --reciter 7 --surah 2 --at 61234
+#   python timing_store.py --reciter 7 --surah 2
+#
+# File layout (little-endian), `cache/timings/<reciter_id>.qts`:
+#   header : magic b"QTS1", uint32 surah_count (always 114)
+#   index  : surah_count x (uint32 offset, uint32 count)
+#            offset = byte position of the surah's `from` array (0 if not stored)
+#   data   : per stored surah, count x uint32 `from` ms followed by count x uint32 `to` ms
+#
+# Readers mmap the file and cast the arrays in place, so opening a store costs
+# one mmap call (no parsing) and lookups are a binary search over the arrays.
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+
+from file_lock import exclusive_lock, unique_tmp_path
+
+# ======================================================
+# CONFIG
+# ======================================================
+TIMING_STORE_DIR = os.path.join("cache", "timings")
+TOTAL_SURAHS = 114
+
+MAGIC = b"QTS1"
+_HEADER = struct.Struct("<4sI")
+_INDEX_ENTRY = struct.Struct("<II")
+_DATA_START = _HEADER.size + TOTAL_SURAHS * _INDEX_ENTRY.size
+
+# memoryview.cast() uses native byte order; fall back to a copy on big-endian hosts
+_NATIVE_LE = sys.byteorder == "little"
+
+# ======================================================
+# WRITE
+# ======================================================
+
+def store_path(reciter_id: int, store_dir: str = None) -> str:
+    return os.path.join(store_dir or TIMING_STORE_DIR, f"{reciter_id}.qts")
+
+def _read_all(path: str) -> dict:
+    """Return {surah: (from_array, to_array)} for every surah present in `path`."""
+    surahs = {}
+    if not os.path.exists(path):
+        return surahs
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _DATA_START or data[:4] != MAGIC:
+        return surahs
+    for s in range(1, TOTAL_SURAHS + 1):
+        offset, count = _INDEX_ENTRY.unpack_from(data, _HEADER.size + (s - 1) * _INDEX_ENTRY.size)
+        if not count:
+            continue
+        starts = array("I", data[offset:offset + 4 * count])
+        ends = array("I", data[offset + 4 * count:offset + 8 * count])
+        if not _NATIVE_LE:
+            starts.byteswap()
+            ends.byteswap()
+        surahs[s] = (starts, ends)
+    return surahs
+
+_write_lock = threading.Lock()
+
+def save_surah_timings(reciter_id: int, surah: int, timings, store_dir: str = None) -> str:
+    """Insert or replace one surah's timings in the reciter's store file.
+
+    `timings` is the list of {"from": ms, "to": ms} dicts produced by Solution A
+    or the fallback path. The file is rewritten atomically, so readers holding
+    an older mmap keep a consistent view.
+    """
+    if not 1 <= surah <= TOTAL_SURAHS:
+        raise ValueError(f"Surah must be 1-{TOTAL_SURAHS}, got {surah}")
+
+    path = store_path(reciter_id, store_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Read-modify-write: serialise writers (threads, and processes/nodes sharing
+    # cache/ via a lock file) so parallel surahs don't drop each other's data
+    with _write_lock, exclusive_lock(path):
+        return _rewrite(path, surah, timings)
+
+def _rewrite(path: str, surah: int, timings) -> str:
+    surahs = _read_all(path)
+    surahs[surah] = (
+        array("I", (int(t["from"]) for t in timings)),
+        array("I", (int(t["to"]) for t in timings)),
+    )
+
+    index = bytearray(TOTAL_SURAHS * _INDEX_ENTRY.size)
+    body = bytearray()
+    for s in range(1, TOTAL_SURAHS + 1):
+        if s not in surahs:
+            continue
+        starts, ends = surahs[s]
+        _INDEX_ENTRY.pack_into(index, (s - 1) * _INDEX_ENTRY.size, _DATA_START + len(body), len(starts))
+        for arr in (starts, ends):
+            if not _NATIVE_LE:
+                arr = array("I", arr)
+                arr.byteswap()
+            body += arr.tobytes()
+
+    tmp_path = unique_tmp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, TOTAL_SURAHS))
+        f.write(index)
+        f.write(body)
+    os.replace(tmp_path, path)
+    return path
+
+# ======================================================
+# READ
+# ======================================================
+
+class TimingStore:
+    """Read-only, memory-mapped view of one reciter's timing store."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Empty timing store: {path}")
+        magic, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or count != TOTAL_SURAHS:
+            self.close()
+            raise ValueError(f"Not a timing store: {path}")
+        self._view = memoryview(self._mm)
+        self._cache = {}
+
+    @classmethod
+    def for_reciter(cls, reciter_id: int, store_dir: str = None):
+        return cls(store_path(reciter_id, store_dir))
+
+    def close(self):
+        """Close the file; while surah() views are still referenced the mapping stays alive until they go."""
+        self._cache.clear()
+        self._file.close()
+        try:
+            if getattr(self, "_view", None) is not None:
+                self._view.release()
+                self._view = None
+            self._mm.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def surahs(self):
+        """Surah numbers present in the store."""
+        return [s for s in range(1, TOTAL_SURAHS + 1) if self._entry(s)[1]]
+
+    def _entry(self, surah: int):
+        if not 1 <= surah <= TOTAL_SURAHS:
+            raise ValueError(f"Surah must be 1-{TOTAL_SURAHS}, got {surah}")
+        return _INDEX_ENTRY.unpack_from(self._mm, _HEADER.size + (surah - 1) * _INDEX_ENTRY.size)
+
+    def surah(self, surah: int):
+        """Return (from_ms, to_ms) sequences for a surah, or None if not stored."""
+        if surah in self._cache:
+            return self._cache[surah]
+        offset, count = self._entry(surah)
+        if not count:
+            return None
+        raw_from = self._view[offset:offset + 4 * count]
+        raw_to = self._view[offset + 4 * count:offset + 8 * count]
+        if _NATIVE_LE:
+            arrays = (raw_from.cast("I"), raw_to.cast("I"))
+        else:
+            arrays = (array("I", raw_from.tobytes()), array("I", raw_to.tobytes()))
+            for arr in arrays:
+                arr.byteswap()
+        self._cache[surah] = arrays
+        return arrays
+
+    def timings(self, surah: int):
+        """Return the surah's timings in the same dict shape `process_surah` uses."""
+        arrays = self.surah(surah)
+        if arrays is None:
+            return None
+        starts, ends = arrays
+        return [
+            {"verse_key": f"{surah}:{i + 1}", "from": starts[i], "to": ends[i]}
+            for i in range(len(starts))
+        ]
+
+    def ayah_at(self, surah: int, t_ms: int):
+        """Return the 1-based ayah playing at `t_ms`, or None (gap, before start, past end)."""
+        arrays = self.surah(surah)
+        if arrays is None:
+            return None
+        starts, ends = arrays
+        i = bisect_right(starts, t_ms) - 1
+        if i < 0 or t_ms >= ends[i]:
+            return None
+        return i + 1
+
+# ======================================================
+# CLI
+# ======================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a reciter's binary ayah timing store.")
+    parser.add_argument("--reciter", type=int, required=True, help="Reciter ID")
+    parser.add_argument("--surah", type=int, help="Surah number (1-114)")
+    parser.add_argument("--at", type=int, help="Time in ms; print the ayah playing at that time")
+    parser.add_argument("--store-dir", default=TIMING_STORE_DIR, help=f"Store directory (default: {TIMING_STORE_DIR})")
+    args = parser.parse_args()
+
+    with TimingStore.for_reciter(args.reciter, args.store_dir) as store:
+        if not args.surah:
+            print(f"Surahs stored for reciter {args.reciter}: {store.surahs()}")
+            return
+        if args.at is not None:
+            ayah = store.ayah_at(args.surah, args.at)
+            print(f"{args.surah}:{ayah}" if ayah else "No ayah at this time")
+            return
+        for t in store.timings(args.surah) or []:
+            print(f"{t['verse_key']:>8}  {t['from']:>9}  {t['to']:>9}")
+
+if __name__ == "__main__":
+    main()
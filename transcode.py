@@ -0,0 +1,283 @@
+# Parallel transcoding of surah MP3s into smaller Opus / AAC files for mobile listeners.
+#
+# Install:
+#   python -m pip install mutagen     (and ffmpeg with libopus on PATH)
+#
+# Usage:
+#   python transcode.py Telegram/Maher_al-Muaiqly
+#   python transcode.py Telegram/Maher_al-Muaiqly --variant opus:48 --variant aac:64 --max-mb 20
+#   python transcode.py output/Mishari_Rashid_al_Afasy/audio --variant opus:32 --out-dir mobile --workers 4
+#
+# Each variant "<codec>:<kbps>" writes <folder>/<codec>_<kbps>k/NNN.opus|m4a (or
+# <out-dir>/<folder name>/<codec>_<kbps>k/ with --out-dir). --max-mb lowers the
+# bitrate of long surahs so every file stays under the cap. ffmpeg workers run
+# in a process pool; the title, artist, album, track and cover written by
+# Telegram/update_metadata.py are copied from the MP3 into the new file.
+# cache/transcode.json records, per output, the source audio hash, encoder
+# settings and tags it was made from: re-runs skip unchanged files and only
+# rewrite the tags when just the tags changed.
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from file_lock import unique_tmp_path
+from loudness import file_hash, load_cache, probe_channels, save_json, surah_files
+
+# ======================================================
+# CONFIG
+# ======================================================
+CACHE_FILE = os.path.join("cache", "transcode.json")
+TRANSCODE_VERSION = 1   # bump when the ffmpeg arguments change
+
+CODECS = {
+    "opus": {"ext": ".opus", "format": "opus", "min_kbps": 16,
+             "args": ["-c:a", "libopus", "-vbr", "on", "-compression_level", "10", "-application", "audio"]},
+    "aac": {"ext": ".m4a", "format": "ipod", "min_kbps": 24,
+            "args": ["-c:a", "aac", "-movflags", "+faststart"]},
+}
+DEFAULT_VARIANTS = ["opus:48"]
+MAX_CHANNELS = 2
+SIZE_HEADROOM = 0.95    # VBR and container overhead: aim this fraction below --max-mb
+
+# ID3 frames written by update_metadata and their Vorbis comment / MP4 atom names
+TAG_MAP = {
+    "TIT2": ("title", "\xa9nam"),
+    "TPE1": ("artist", "\xa9ART"),
+    "TPE2": ("albumartist", "aART"),
+    "TALB": ("album", "\xa9alb"),
+}
+
+# ======================================================
+# TAGS
+# ======================================================
+
+def read_source_tags(path: str) -> dict:
+    """{"text": {frame: value}, "track": (n, total) or None, "cover": (mime, data) or None} from an MP3's ID3 tag."""
+    from mutagen.id3 import ID3, ID3NoHeaderError
+
+    tags = {"text": {}, "track": None, "cover": None}
+    try:
+        id3 = ID3(path)
+    except ID3NoHeaderError:
+        return tags
+    for frame in TAG_MAP:
+        if id3.getall(frame):
+            tags["text"][frame] = str(id3.getall(frame)[0].text[0])
+    if id3.getall("TRCK"):
+        number, _, total = str(id3.getall("TRCK")[0].text[0]).partition("/")
+        if number.isdigit():
+            tags["track"] = (int(number), int(total) if total.isdigit() else 0)
+    covers = id3.getall("APIC")
+    if covers:
+        tags["cover"] = (covers[0].mime, covers[0].data)
+    return tags
+
+def tags_fingerprint(tags: dict) -> str:
+    cover = tags["cover"]
+    data = json.dumps([tags["text"], tags["track"], cover[0] if cover else None], sort_keys=True).encode("utf-8")
+    return hashlib.sha1(data + (cover[1] if cover else b"")).hexdigest()
+
+def write_opus_tags(path: str, tags: dict):
+    from mutagen.flac import Picture
+    from mutagen.oggopus import OggOpus
+
+    audio = OggOpus(path)
+    audio.delete()
+    for frame, (name, _) in TAG_MAP.items():
+        if frame in tags["text"]:
+            audio[name] = tags["text"][frame]
+    if tags["track"]:
+        audio["tracknumber"] = str(tags["track"][0])
+        if tags["track"][1]:
+            audio["tracktotal"] = str(tags["track"][1])
+    if tags["cover"]:
+        picture = Picture()
+        picture.type, picture.mime, picture.desc = 3, tags["cover"][0], "Cover"
+        picture.data = tags["cover"][1]
+        audio["metadata_block_picture"] = base64.b64encode(picture.write()).decode("ascii")
+    audio.save()
+
+def write_mp4_tags(path: str, tags: dict):
+    from mutagen.mp4 import MP4, MP4Cover
+
+    audio = MP4(path)
+    audio.delete()
+    for frame, (_, atom) in TAG_MAP.items():
+        if frame in tags["text"]:
+            audio[atom] = [tags["text"][frame]]
+    if tags["track"]:
+        audio["trkn"] = [tags["track"]]
+    if tags["cover"]:
+        image_format = MP4Cover.FORMAT_PNG if tags["cover"][0] == "image/png" else MP4Cover.FORMAT_JPEG
+        audio["covr"] = [MP4Cover(tags["cover"][1], imageformat=image_format)]
+    audio.save()
+
+TAG_WRITERS = {"opus": write_opus_tags, "aac": write_mp4_tags}
+
+# ======================================================
+# ENCODING
+# ======================================================
+
+def parse_variant(text: str):
+    """"opus:48" -> ("opus", 48)."""
+    codec, _, kbps = text.lower().partition(":")
+    if codec not in CODECS or not kbps.isdigit() or int(kbps) < CODECS[codec]["min_kbps"]:
+        raise ValueError(f"Invalid variant {text!r}: expected <{'|'.join(CODECS)}>:<kbps>, "
+                         f"e.g. opus:48 (at least {CODECS['opus']['min_kbps']} kbps for opus)")
+    return codec, int(kbps)
+
+def capped_kbps(codec: str, kbps: int, duration_s: float, max_mb: float = None) -> int:
+    """Requested bitrate, lowered so `duration_s` of audio fits in `max_mb` (never below the codec minimum)."""
+    if not max_mb or duration_s <= 0:
+        return kbps
+    fit = int(max_mb * 1024 * 1024 * 8 * SIZE_HEADROOM / duration_s / 1000)
+    return max(CODECS[codec]["min_kbps"], min(kbps, fit))
+
+def audio_duration(path: str) -> float:
+    from mutagen import File
+
+    audio = File(path)
+    return audio.info.length if audio is not None else 0.0
+
+def encode(src: str, dst: str, ffmpeg: str, codec: str, kbps: int, channels: int):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp_path = unique_tmp_path(dst)
+    cmd = [ffmpeg, "-v", "error", "-nostdin", "-y", "-i", src, "-map", "0:a:0", "-map_metadata", "-1",
+           "-ac", str(channels), *CODECS[codec]["args"], "-b:a", f"{kbps}k", "-f", CODECS[codec]["format"], tmp_path]
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(proc.stderr.decode("utf-8", "replace").strip() or f"ffmpeg exited with {proc.returncode}")
+    os.replace(tmp_path, dst)
+
+def transcode_job(job):
+    """Encode (unless only the tags changed) and tag one output; returns (job, tags fingerprint, seconds, error)."""
+    started = time.time()
+    try:
+        tags = read_source_tags(job["src"])
+        if not job["retag_only"]:
+            encode(job["src"], job["dst"], job["ffmpeg"], job["codec"], job["kbps"], job["channels"])
+        TAG_WRITERS[job["codec"]](job["dst"], tags)
+        return job, tags_fingerprint(tags), time.time() - started, None
+    except Exception as e:
+        return job, None, time.time() - started, str(e)
+
+# ======================================================
+# BATCH
+# ======================================================
+
+def output_dir(folder: str, codec: str, kbps: int, out_root: str = None) -> str:
+    variant = f"{codec}_{kbps}k"
+    if out_root:
+        return os.path.join(out_root, os.path.basename(os.path.normpath(folder)), variant)
+    return os.path.join(folder, variant)
+
+def plan_jobs(cache: dict, folders, variants, ffmpeg: str, out_root: str = None, max_mb: float = None,
+              force: bool = False):
+    """Jobs for outputs that are missing or stale; returns (jobs, up_to_date)."""
+    jobs, current = [], 0
+    for folder in folders:
+        for name in surah_files(folder):
+            src = os.path.join(folder, name)
+            sha = file_hash(cache, src)
+            source = cache["sources"].setdefault(sha, {})
+            if "duration_s" not in source:
+                source["duration_s"] = audio_duration(src)
+                source["channels"] = min(probe_channels(src), MAX_CHANNELS)
+            fingerprint = tags_fingerprint(read_source_tags(src))
+            for codec, kbps in variants:
+                dst = os.path.join(output_dir(folder, codec, kbps, out_root),
+                                   os.path.splitext(name)[0] + CODECS[codec]["ext"])
+                settings = {"codec": codec, "kbps": capped_kbps(codec, kbps, source["duration_s"], max_mb),
+                            "channels": source["channels"], "version": TRANSCODE_VERSION}
+                known = cache["outputs"].get(os.path.abspath(dst))
+                same_output = False
+                if known and os.path.exists(dst):
+                    st = os.stat(dst)
+                    same_output = (known["size"], known["mtime"]) == (st.st_size, st.st_mtime)
+                encoded = same_output and known["source_sha256"] == sha and known["settings"] == settings
+                if encoded and known["tags"] == fingerprint and not force:
+                    current += 1
+                    continue
+                jobs.append({"src": src, "dst": dst, "sha256": sha, "settings": settings, "codec": codec,
+                             "kbps": settings["kbps"], "channels": settings["channels"], "ffmpeg": ffmpeg,
+                             "retag_only": encoded and not force})
+    return jobs, current
+
+def transcode_folders(folders, variants, workers: int = None, out_root: str = None, max_mb: float = None,
+                      force: bool = False, cache_path: str = CACHE_FILE):
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not found on PATH")
+    cache = load_cache(cache_path)
+    cache.pop("results", None)       # loudness analyses live in their own cache
+    cache.setdefault("sources", {})  # audio sha256 -> {"duration_s", "channels"}
+    cache.setdefault("outputs", {})  # abs output path -> {"source_sha256", "settings", "tags", "size", "mtime"}
+    jobs, current = plan_jobs(cache, folders, variants, ffmpeg, out_root, max_mb, force)
+    retags = sum(job["retag_only"] for job in jobs)
+    print(f"🎧 {len(jobs) - retags} file(s) to encode, {retags} to retag, {current} up to date")
+    if not jobs:
+        save_json(cache_path, cache)
+        return 0
+
+    started, failed, saved_bytes = time.time(), 0, 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(transcode_job, job) for job in jobs]):
+            job, fingerprint, seconds, error = future.result()
+            if error:
+                failed += 1
+                print(f"❌ {job['dst']}: {error}")
+                continue
+            st = os.stat(job["dst"])
+            cache["outputs"][os.path.abspath(job["dst"])] = {
+                "source_sha256": job["sha256"], "settings": job["settings"], "tags": fingerprint,
+                "size": st.st_size, "mtime": st.st_mtime,
+            }
+            if job["retag_only"]:
+                print(f"🏷️ {job['dst']}: tags updated")
+                continue
+            src_size = os.path.getsize(job["src"])
+            saved_bytes += src_size - st.st_size
+            print(f"✅ {job['dst']} ({job['kbps']} kbps, {src_size / 1048576:.1f} → {st.st_size / 1048576:.1f} MB, "
+                  f"{seconds:.1f}s)")
+    save_json(cache_path, cache)
+    saved = f", {saved_bytes / 1048576:.1f} MB smaller than the sources" if saved_bytes else ""
+    print(f"⏱️ {len(jobs) - failed} file(s) done in {time.time() - started:.1f}s{saved}")
+    return failed
+
+# ======================================================
+# CLI
+# ======================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcode surah MP3s to smaller Opus / AAC files, keeping their tags.")
+    parser.add_argument("folders", nargs="+", help="Folders with 001.mp3 ... 114.mp3 (Telegram downloads, output/<reciter>/audio)")
+    parser.add_argument("--variant", action="append", dest="variants",
+                        help=f"<codec>:<kbps> with codec {'/'.join(CODECS)}; repeatable (default: {' '.join(DEFAULT_VARIANTS)})")
+    parser.add_argument("--max-mb", type=float, help="Lower the bitrate of files that would exceed this size (MB)")
+    parser.add_argument("--out-dir", type=str, help="Write <out-dir>/<folder name>/<codec>_<kbps>k/ instead of inside each folder")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="ffmpeg worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Re-encode files that are up to date")
+    parser.add_argument("--cache", default=CACHE_FILE, help=f"Transcode cache (default: {CACHE_FILE})")
+    args = parser.parse_args()
+
+    try:
+        variants = list(dict.fromkeys(parse_variant(v) for v in args.variants or DEFAULT_VARIANTS))
+    except ValueError as e:
+        parser.error(str(e))
+    for folder in args.folders:
+        if not os.path.isdir(folder):
+            parser.error(f"Folder not found: {folder}")
+    if transcode_folders(args.folders, variants, args.workers, args.out_dir, args.max_mb, args.force, args.cache):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# Uzbek Cyrillic → Latin transliteration shared by every script.
+#
+# UZ_CYR_TO_LAT is compiled once into a str.translate table; the letters whose
+# spelling depends on their neighbours are fixed up first in one regex pass:
+#   Е/е  → Ye/ye at the start of a word, after a vowel and after ь/ъ
+#          (ер → yer, поезд → poyezd, подъезд → podʼyezd)
+#   Ц/ц  → Ts/ts after a vowel, S/s elsewhere (цирк → sirk, милиция → militsiya)
+#   Ш, Ч, Ё, Ю, Я, Ц in an all-caps word stay all caps (ШАҲАР → SHAHAR)
+# Text without Cyrillic letters is returned unchanged without being copied.
+#
+# Usage:
+#   python uz_translit.py input.txt -o output.txt
+#   cat input.txt | python uz_translit.py > output.txt
+#
+#   from uz_translit import to_latin
+#   to_latin("Ерга тушди")  # "Yerga tushdi"
+
+import argparse
+import os
+import re
+import sys
+
+from file_lock import unique_tmp_path
+
+# ======================================================
+# CONFIG
+# ======================================================
+UZ_CYR_TO_LAT = {
+    "А":"A","а":"a","Б":"B","б":"b","В":"V","в":"v","Г":"G","г":"g",
+    "Д":"D","д":"d","Е":"E","е":"e","Ё":"Yo","ё":"yo","Ж":"J","ж":"j",
+    "З":"Z","з":"z","И":"I","и":"i","Й":"Y","й":"y","К":"K","к":"k",
+    "Л":"L","л":"l","М":"M","м":"m","Н":"N","н":"n","О":"O","о":"o",
+    "П":"P","п":"p","Р":"R","р":"r","С":"S","с":"s","Т":"T","т":"t",
+    "У":"U","у":"u","Ф":"F","ф":"f","Х":"X","х":"x","Ц":"Ts","ц":"ts",
+    "Ч":"Ch","ч":"ch","Ш":"Sh","ш":"sh","Ъ":"ʼ","ъ":"ʼ","Ь":"","ь":"",
+    "Э":"E","э":"e","Ю":"Yu","ю":"yu","Я":"Ya","я":"ya",
+    "Ў":"Oʻ","ў":"oʻ","Қ":"Q","қ":"q","Ғ":"Gʻ","ғ":"gʻ","Ҳ":"H","ҳ":"h"
+}
+
+VOWELS = "аеёиоуэюяў"
+STREAM_CHUNK = 1 << 16   # characters read per chunk by transliterate_file
+MAX_CARRY = 4096         # longest word held back between stream chunks
+
+# str.translate table indexed by code point: a list over U+0000..U+04FF is about
+# twice as fast to look up as the dict from str.maketrans; higher code points
+# raise IndexError, which str.translate treats as "keep the character".
+TABLE = list(range(0x500))
+for _ch, _lat in UZ_CYR_TO_LAT.items():
+    TABLE[ord(_ch)] = ord(_lat) if len(_lat) == 1 else _lat
+
+# ======================================================
+# CONTEXT RULES
+# ======================================================
+
+_CYRILLIC = re.compile("[Ѐ-ӿ]")
+_UPPER = "".join(ch for ch in UZ_CYR_TO_LAT if ch.isupper())
+_MULTI_UPPER = "".join(ch for ch, lat in UZ_CYR_TO_LAT.items() if ch.isupper() and len(lat) > 1 and lat[1].isalpha())
+_VOWELS_ANY = VOWELS + VOWELS.upper()
+
+# Every branch starts with the letter itself (checks follow as lookarounds) so the
+# scan only stops at candidate letters
+_CONTEXT = re.compile(
+    rf"[Ее](?:(?<![^\W\d_][Ее])|(?<=[{_VOWELS_ANY}ЬьЪъ][Ее]))"           # ye: word start / after a vowel, ь or ъ
+    rf"|[Цц]"                                                          # ts / s
+    rf"|[{_MULTI_UPPER}](?:(?=[{_UPPER}])|(?<=[{_UPPER}][{_MULTI_UPPER}]))"  # all-caps digraphs
+)
+
+def _context_sub(m) -> str:
+    ch, s, i = m.group(), m.string, m.start()
+    prev = s[i - 1] if i else ""
+    low = ch.lower()
+    if low == "е":
+        lat = "ye"  # only matched in ye-position
+    elif low == "ц":
+        lat = "ts" if prev and prev.lower() in VOWELS else "s"
+    else:
+        lat = UZ_CYR_TO_LAT[low]
+    if ch == low:
+        return lat
+    nxt = s[i + 1] if i + 1 < len(s) else ""
+    return lat.upper() if prev.isupper() or nxt.isupper() else lat.capitalize()
+
+# ======================================================
+# API
+# ======================================================
+
+def has_cyrillic(text: str) -> bool:
+    return bool(text) and _CYRILLIC.search(text) is not None
+
+def to_latin(text: str) -> str:
+    """Transliterate Uzbek Cyrillic text to the Latin alphabet (other characters are kept)."""
+    if not has_cyrillic(text):
+        return text
+    return _CONTEXT.sub(_context_sub, text).translate(TABLE)
+
+def iter_to_latin(chunks):
+    """
+    Transliterate an iterable of text chunks, yielding Latin chunks. Each chunk is
+    cut after its last whitespace (the tail waits for the next chunk) so context
+    rules see whole words; the output equals to_latin("".join(chunks)).
+    """
+    carry = ""
+    for chunk in chunks:
+        buf = carry + chunk
+        cut = len(buf)
+        while cut and not buf[cut - 1].isspace():
+            cut -= 1
+        if not cut and len(buf) > MAX_CARRY:
+            cut = len(buf)  # no whitespace at all: not a word, flush anyway
+        carry = buf[cut:]
+        if cut:
+            yield to_latin(buf[:cut])
+    if carry:
+        yield to_latin(carry)
+
+def read_chunks(f, chunk_size: int = STREAM_CHUNK):
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+def transliterate_stream(fin, fout, chunk_size: int = STREAM_CHUNK):
+    """Copy text file object `fin` to `fout`, transliterated chunk by chunk."""
+    for piece in iter_to_latin(read_chunks(fin, chunk_size)):
+        fout.write(piece)
+
+def transliterate_file(src, dst: str, chunk_size: int = STREAM_CHUNK) -> str:
+    """Stream `src` (a path or an open text file) into `dst`, written atomically."""
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    tmp_file = unique_tmp_path(dst)
+    with open(tmp_file, "w", encoding="utf-8") as fout:
+        if isinstance(src, str):
+            with open(src, "r", encoding="utf-8") as fin:
+                transliterate_stream(fin, fout, chunk_size)
+        else:
+            transliterate_stream(src, fout, chunk_size)
+    os.replace(tmp_file, dst)
+    return dst
+
+# ======================================================
+# CLI
+# ======================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Transliterate Uzbek Cyrillic text to Latin.")
+    parser.add_argument("input", nargs="?", help="UTF-8 text file (default: stdin)")
+    parser.add_argument("-o", "--output", type=str, help="Output file (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=STREAM_CHUNK, help=f"Characters per read (default: {STREAM_CHUNK})")
+    args = parser.parse_args()
+
+    if args.output:
+        transliterate_file(args.input or sys.stdin, args.output, args.chunk_size)
+        print(f"✅ {args.input or 'stdin'} → {args.output}")
+    elif args.input:
+        with open(args.input, "r", encoding="utf-8") as fin:
+            transliterate_stream(fin, sys.stdout, args.chunk_size)
+    else:
+        transliterate_stream(sys.stdin, sys.stdout, args.chunk_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# Precomputed waveform peaks (min/max pyramids) for visualizers and editors.
+#
+# Install:
+#   python -m pip install numpy mutagen     (and ffmpeg on PATH for decoding)
+#
+# Usage:
+#   python waveform_peaks.py output/Mishari_Rashid_al_Afasy/audio
+#   python waveform_peaks.py output/Mishari_Rashid_al_Afasy/audio Telegram/Maher_al-Muaiqly --workers 4
+#   python waveform_peaks.py --info output/Mishari_Rashid_al_Afasy/audio/036.peaks
+#
+#   from waveform_peaks import WaveformPeaks
+#   with WaveformPeaks.for_audio("output/.../audio/036.mp3") as peaks:
+#       level, pairs = peaks.window(0, 60, width=1200)   # int16 min,max,min,max,...
+#
+# Every surah file is decoded once (mono, 44.1 kHz) into <name>.peaks next to it.
+# File layout (little-endian):
+#   header : magic b"QWP1", uint16 version, uint16 level_count, uint32 sample_rate,
+#            uint32 base samples per peak, uint64 frames, 32-byte SHA-256 of the
+#            audio data, uint64 source size, int64 source mtime (ns)
+#   levels : level_count x (uint32 samples_per_peak, uint32 count, uint64 offset)
+#   data   : per level, count x (int16 min, int16 max), full scale = 32767
+# Level 0 has one peak per 512 samples, each further level halves the count.
+# A file is rebuilt only when the audio hash changes (tags are not hashed);
+# readers mmap it and get the arrays without decoding or parsing.
+
+import argparse
+import mmap
+import os
+import shutil
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from file_lock import unique_tmp_path
+from loudness import SURAH_FILE_RE, audio_sha256, decode_chunks
+
+# ======================================================
+# CONFIG
+# ======================================================
+PEAKS_EXTENSION = ".peaks"
+PEAKS_RATE = 44100
+BASE_SAMPLES_PER_PEAK = 512   # ~11.6 ms per peak at level 0
+MIN_LEVEL_PEAKS = 512         # stop halving once a level has at most this many peaks
+
+MAGIC = b"QWP1"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIIQ32sQq")
+_LEVEL = struct.Struct("<IIQ")
+_STAT_OFFSET = _HEADER.size - 16  # source size + mtime, patched in place when only they changed
+
+# memoryview.cast() uses native byte order; fall back to a copy on big-endian hosts
+_NATIVE_LE = sys.byteorder == "little"
+
+# ======================================================
+# BUILD
+# ======================================================
+
+def peaks_path(audio_path: str) -> str:
+    return os.path.splitext(audio_path)[0] + PEAKS_EXTENSION
+
+def compute_base_level(audio_path: str, ffmpeg: str, samples_per_peak: int = BASE_SAMPLES_PER_PEAK):
+    """Return (mins, maxs, frames) of the finest level, decoding the file in chunks."""
+    import numpy as np
+
+    mins, maxs, frames = [], [], 0
+    carry = np.zeros(0, dtype=np.float32)
+    for x in decode_chunks(audio_path, ffmpeg, 1, PEAKS_RATE):
+        frames += len(x)
+        buf = np.concatenate((carry, x[:, 0]))
+        whole = len(buf) // samples_per_peak * samples_per_peak
+        if whole:
+            blocks = buf[:whole].reshape(-1, samples_per_peak)
+            mins.append(blocks.min(axis=1))
+            maxs.append(blocks.max(axis=1))
+        carry = buf[whole:]
+    if len(carry):
+        mins.append(np.array([carry.min()], dtype=np.float32))
+        maxs.append(np.array([carry.max()], dtype=np.float32))
+    if not mins:
+        return np.zeros(0, np.float32), np.zeros(0, np.float32), frames
+    return np.concatenate(mins), np.concatenate(maxs), frames
+
+def build_pyramid(mins, maxs, min_peaks: int = MIN_LEVEL_PEAKS):
+    """[(mins, maxs)] from finest to coarsest, each level merging pairs of the previous one."""
+    import numpy as np
+
+    levels = [(mins, maxs)]
+    while len(mins) > min_peaks:
+        if len(mins) % 2:
+            mins, maxs = np.append(mins, mins[-1]), np.append(maxs, maxs[-1])
+        mins = mins.reshape(-1, 2).min(axis=1)
+        maxs = maxs.reshape(-1, 2).max(axis=1)
+        levels.append((mins, maxs))
+    return levels
+
+def to_int16_pairs(mins, maxs) -> bytes:
+    import numpy as np
+
+    pairs = np.stack((mins, maxs), axis=1) * 32767
+    return np.clip(np.round(pairs), -32768, 32767).astype("<i2").tobytes()
+
+def write_peaks(audio_path: str, ffmpeg: str, sha256: str = None) -> str:
+    """Decode `audio_path` and write its .peaks file atomically."""
+    sha256 = sha256 or audio_sha256(audio_path)
+    st = os.stat(audio_path)
+    mins, maxs, frames = compute_base_level(audio_path, ffmpeg)
+    levels = build_pyramid(mins, maxs)
+
+    table, blobs = bytearray(), []
+    offset = _HEADER.size + len(levels) * _LEVEL.size
+    for i, (lo, hi) in enumerate(levels):
+        blob = to_int16_pairs(lo, hi)
+        table += _LEVEL.pack(BASE_SAMPLES_PER_PEAK << i, len(lo), offset)
+        blobs.append(blob)
+        offset += len(blob)
+
+    path = peaks_path(audio_path)
+    tmp_path = unique_tmp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(levels), PEAKS_RATE, BASE_SAMPLES_PER_PEAK, frames,
+                             bytes.fromhex(sha256), st.st_size, st.st_mtime_ns))
+        f.write(table)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return path
+
+def read_header(path: str):
+    try:
+        with open(path, "rb") as f:
+            data = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    header = _HEADER.unpack(data)
+    if header[0] != MAGIC or header[1] != VERSION:
+        return None
+    return header
+
+def needs_rebuild(audio_path: str):
+    """Return (rebuild, sha256 or None). A peaks file is current if it was built from the same audio data."""
+    header = read_header(peaks_path(audio_path))
+    if header is None:
+        return True, None
+    st = os.stat(audio_path)
+    if (header[7], header[8]) == (st.st_size, st.st_mtime_ns):
+        return False, header[6].hex()
+    sha256 = audio_sha256(audio_path)
+    if header[6].hex() != sha256:
+        return True, sha256
+    # Same audio, new tags or timestamp: refresh the stored stat so the next check is cheap
+    with open(peaks_path(audio_path), "r+b") as f:
+        f.seek(_STAT_OFFSET)
+        f.write(struct.pack("<Qq", st.st_size, st.st_mtime_ns))
+    return False, sha256
+
+def peaks_job(job):
+    started = time.time()
+    try:
+        return job, write_peaks(job["path"], job["ffmpeg"], job["sha256"]), time.time() - started, None
+    except Exception as e:
+        return job, None, time.time() - started, str(e)
+
+def build_folders(folders, workers: int = None, force: bool = False):
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not found on PATH")
+    jobs, current = [], 0
+    for folder in folders:
+        for name in sorted(os.listdir(folder)):
+            if not SURAH_FILE_RE.match(name):
+                continue
+            path = os.path.join(folder, name)
+            rebuild, sha256 = needs_rebuild(path)
+            if rebuild or force:
+                jobs.append({"path": path, "sha256": sha256, "ffmpeg": ffmpeg})
+            else:
+                current += 1
+
+    print(f"🌊 {len(jobs)} peak file(s) to build, {current} up to date")
+    if not jobs:
+        return 0
+    started, failed = time.time(), 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(peaks_job, job) for job in jobs]):
+            job, path, seconds, error = future.result()
+            if error:
+                failed += 1
+                print(f"❌ {job['path']}: {error}")
+            else:
+                print(f"✅ {path} ({os.path.getsize(path) // 1024} KB, {seconds:.1f}s)")
+    print(f"⏱️ Built {len(jobs) - failed} peak file(s) in {time.time() - started:.1f}s")
+    return failed
+
+# ======================================================
+# READ
+# ======================================================
+
+class WaveformPeaks:
+    """Read-only, memory-mapped view of one .peaks file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Empty peaks file: {path}")
+        header = _HEADER.unpack_from(self._mm, 0)
+        if header[0] != MAGIC or header[1] != VERSION:
+            self.close()
+            raise ValueError(f"Not a peaks file: {path}")
+        _, _, level_count, self.sample_rate, _, self.frames, digest, _, _ = header
+        self.sha256 = digest.hex()
+        self.levels = [_LEVEL.unpack_from(self._mm, _HEADER.size + i * _LEVEL.size) for i in range(level_count)]
+        self._view = memoryview(self._mm)
+
+    @classmethod
+    def for_audio(cls, audio_path: str):
+        return cls(peaks_path(audio_path))
+
+    def close(self):
+        """Close the file; while level views are still referenced the mapping stays alive until they go."""
+        self._file.close()
+        try:
+            if getattr(self, "_view", None) is not None:
+                self._view.release()
+                self._view = None
+            self._mm.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    def level(self, index: int, first: int = 0, last: int = None):
+        """Interleaved int16 (min, max) pairs of peaks [first, last) at a level (a view, or a copy on big-endian hosts)."""
+        samples_per_peak, count, offset = self.levels[index]
+        last = count if last is None else min(last, count)
+        first = max(0, min(first, last))
+        raw = self._view[offset + 4 * first:offset + 4 * last]
+        if _NATIVE_LE:
+            return raw.cast("h")
+        pairs = array("h", raw.tobytes())
+        pairs.byteswap()
+        return pairs
+
+    def best_level(self, samples_per_pixel: float) -> int:
+        """Coarsest level that still has at least one peak per pixel."""
+        best = 0
+        for i, (samples_per_peak, _, _) in enumerate(self.levels):
+            if samples_per_peak <= samples_per_pixel:
+                best = i
+        return best
+
+    def window(self, start_s: float, end_s: float, width: int):
+        """(level, pairs) covering [start_s, end_s) for a `width`-pixel wide view."""
+        start = max(0, int(start_s * self.sample_rate))
+        end = min(self.frames, int(end_s * self.sample_rate))
+        index = self.best_level(max(1, end - start) / max(1, width))
+        samples_per_peak = self.levels[index][0]
+        return index, self.level(index, start // samples_per_peak, -(-end // samples_per_peak))
+
+# ======================================================
+# CLI
+# ======================================================
+
+def print_info(path: str):
+    with WaveformPeaks(path) as peaks:
+        print(f"{path}: {peaks.duration:.1f}s at {peaks.sample_rate} Hz, audio sha256 {peaks.sha256[:16]}…")
+        for i, (samples_per_peak, count, _) in enumerate(peaks.levels):
+            print(f"  level {i:>2}: {samples_per_peak:>8} samples/peak  {count:>9} peaks")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build memory-mappable waveform peak files next to surah audio.")
+    parser.add_argument("folders", nargs="*", help="Folders with 001.mp3 ... 114.mp3 (e.g. output/<reciter>/audio)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even when the audio is unchanged")
+    parser.add_argument("--info", type=str, help="Print the levels of a .peaks file and exit")
+    args = parser.parse_args()
+
+    if args.info:
+        print_info(args.info)
+        return
+    if not args.folders:
+        parser.error("Give at least one audio folder (or --info FILE)")
+    for folder in args.folders:
+        if not os.path.isdir(folder):
+            parser.error(f"Folder not found: {folder}")
+    if build_folders(args.folders, args.workers, args.force):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
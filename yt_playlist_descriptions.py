@@ -1,63 +1,291 @@
-import subprocess
+# Save the description of every video in a YouTube playlist as Uzbek Latin text.
+#
+# Install:
+#   python -m pip install yt-dlp      # in-process API (preferred)
+#   (or just the yt-dlp executable on PATH: batched subprocesses are used instead)
+#
+# Usage:
+#   python yt_playlist_descriptions.py
+#   python yt_playlist_descriptions.py --jobs 16
+#   python yt_playlist_descriptions.py --max-age 30       # also recheck videos fetched 30+ days ago
+#   python yt_playlist_descriptions.py --force            # refetch everything
+#
+# Sync is incremental: data/descriptions_latin/.manifest.json remembers, per
+# video id, a fingerprint of its playlist entry and where its file went.
+# Unchanged videos are skipped (or just renamed when their position moved),
+# the rest are fetched in parallel and every file is written atomically.
+
+import argparse
+import hashlib
 import json
 import os
 import re
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from file_lock import unique_tmp_path
+from uz_translit import to_latin
 
+# ======================================================
+# CONFIG
+# ======================================================
 PLAYLIST_URL = "https://www.youtube.com/playlist?list=PLd4gIYSJqNQd8dPPnGst4hSj8_umevXNu"
 OUTPUT_DIR = "data/descriptions_latin"
+MANIFEST_FILE = ".manifest.json"
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+DEFAULT_JOBS = 8
+VIDEO_TIMEOUT = 120        # seconds per video for the subprocess backend
+WATCH_URL = "https://www.youtube.com/watch?v={}"
 
-# Uzbek Cyrillic → Latin map
-UZ_CYR_TO_LAT = {
-    "А":"A","а":"a","Б":"B","б":"b","В":"V","в":"v","Г":"G","г":"g",
-    "Д":"D","д":"d","Е":"E","е":"e","Ё":"Yo","ё":"yo","Ж":"J","ж":"j",
-    "З":"Z","з":"z","И":"I","и":"i","Й":"Y","й":"y","К":"K","к":"k",
-    "Л":"L","л":"l","М":"M","м":"m","Н":"N","н":"n","О":"O","о":"o",
-    "П":"P","п":"p","Р":"R","р":"r","С":"S","с":"s","Т":"T","т":"t",
-    "У":"U","у":"u","Ф":"F","ф":"f","Х":"X","х":"x","Ц":"Ts","ц":"ts",
-    "Ч":"Ch","ч":"ch","Ш":"Sh","ш":"sh","Ъ":"ʼ","ъ":"ʼ","Ь":"",
-    "Э":"E","э":"e","Ю":"Yu","ю":"yu","Я":"Ya","я":"ya",
-    "Ў":"Oʻ","ў":"oʻ","Қ":"Q","қ":"q","Ғ":"Gʻ","ғ":"gʻ","Ҳ":"H","ҳ":"h"
-}
-
-def cyr_to_lat(text):
-    return "".join(UZ_CYR_TO_LAT.get(c, c) for c in text)
+# Playlist-entry fields that change when a video is edited (whichever yt-dlp provides)
+ETAG_FIELDS = ("title", "duration", "modified_timestamp", "modified_date", "release_timestamp", "timestamp")
 
 def sanitize_filename(name):
-    name = cyr_to_lat(name)
+    name = to_latin(name)
     return re.sub(r'[\\/*?:"<>|]', "", name)
 
-print("Fetching playlist metadata using yt-dlp...")
+# ======================================================
+# YT-DLP BACKENDS
+# ======================================================
+
+def load_ytdlp_module():
+    try:
+        import yt_dlp
+        return yt_dlp
+    except ImportError:
+        return None
+
+class ApiFetcher:
+    """yt_dlp in-process: one YoutubeDL per worker thread, no process launches."""
+
+    name = "yt_dlp API"
+
+    def __init__(self, yt_dlp):
+        self._yt_dlp = yt_dlp
+        self._local = threading.local()
+
+    def _ydl(self, **extra):
+        opts = {"quiet": True, "no_warnings": True, "skip_download": True, **extra}
+        return self._yt_dlp.YoutubeDL(opts)
+
+    def playlist(self, url):
+        with self._ydl(extract_flat="in_playlist") as ydl:
+            info = ydl.extract_info(url, download=False)
+        return list(info.get("entries") or [])
+
+    def videos(self, video_ids):
+        """Yield (video_id, info or None, error or None)."""
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            ydl = self._local.ydl = self._ydl()
+        for video_id in video_ids:
+            try:
+                yield video_id, ydl.extract_info(WATCH_URL.format(video_id), download=False), None
+            except Exception as e:
+                yield video_id, None, str(e)
+
+class SubprocessFetcher:
+    """yt-dlp executable: each worker fetches a batch of videos with one `yt-dlp -j` call."""
+
+    name = "yt-dlp subprocess"
+
+    def __init__(self, executable):
+        self.executable = executable
+
+    def playlist(self, url):
+        cmd = [self.executable, "--dump-single-json", "--flat-playlist", url]
+        result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", check=True)
+        return json.loads(result.stdout).get("entries", [])
+
+    def videos(self, video_ids):
+        cmd = [self.executable, "-j", "--no-warnings", "--ignore-errors"] + [WATCH_URL.format(v) for v in video_ids]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8",
+                                    timeout=VIDEO_TIMEOUT * len(video_ids))
+        except subprocess.TimeoutExpired:
+            for video_id in video_ids:
+                yield video_id, None, "yt-dlp timed out"
+            return
+        found = {}
+        for line in result.stdout.splitlines():
+            if line.strip():
+                info = json.loads(line)
+                found[info.get("id")] = info
+        for video_id in video_ids:
+            error = None if video_id in found else (result.stderr.strip().splitlines() or ["no output"])[-1]
+            yield video_id, found.get(video_id), error
+
+def create_fetcher(backend="auto"):
+    if backend in ("auto", "api"):
+        yt_dlp = load_ytdlp_module()
+        if yt_dlp is not None:
+            return ApiFetcher(yt_dlp)
+        if backend == "api":
+            raise RuntimeError("yt_dlp is not installed: python -m pip install yt-dlp")
+    executable = shutil.which("yt-dlp")
+    if not executable:
+        raise RuntimeError("Neither the yt_dlp module nor the yt-dlp executable is available")
+    return SubprocessFetcher(executable)
+
+# ======================================================
+# MANIFEST
+# ======================================================
+
+def write_atomic(path: str, text: str):
+    tmp = unique_tmp_path(path)
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def load_manifest(output_dir: str) -> dict:
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_manifest(output_dir: str, manifest: dict):
+    write_atomic(os.path.join(output_dir, MANIFEST_FILE), json.dumps(manifest, ensure_ascii=False, indent=2))
+
+def entry_etag(entry: dict) -> str:
+    """Fingerprint of a flat playlist entry (changes when the video's listed metadata changes)."""
+    fields = {k: entry.get(k) for k in ETAG_FIELDS if entry.get(k) is not None}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+def output_path(output_dir: str, index: int, title: str) -> str:
+    return os.path.join(output_dir, f"{sanitize_filename(f'{index:02d} - {to_latin(title)}')}.txt")
+
+# ======================================================
+# SYNC
+# ======================================================
+
+def plan_sync(entries, manifest: dict, output_dir: str, force=False, max_age_days=None):
+    """
+    Split playlist entries into (to_fetch, to_rename, unchanged).
+    to_fetch: [(index, entry)]; to_rename: [(video_id, old_path, new_path)].
+    """
+    to_fetch, to_rename, unchanged = [], [], 0
+    now = time.time()
+    for index, entry in enumerate(entries, start=1):
+        known = manifest.get(entry["id"])
+        if force or not known or not os.path.exists(known.get("path", "")):
+            to_fetch.append((index, entry))
+            continue
+        expired = max_age_days is not None and now - known.get("fetched_at", 0) > max_age_days * 86400
+        if known.get("etag") != entry_etag(entry) or expired:
+            to_fetch.append((index, entry))
+            continue
+        new_path = output_path(output_dir, index, entry.get("title") or known.get("title", ""))
+        if new_path != known["path"]:
+            to_rename.append((entry["id"], known["path"], new_path))
+        else:
+            unchanged += 1
+    return to_fetch, to_rename, unchanged
+
+def sync_playlist(playlist_url=PLAYLIST_URL, output_dir=OUTPUT_DIR, jobs=DEFAULT_JOBS, force=False,
+                  max_age_days=None, backend="auto"):
+    """Fetch new / changed descriptions in parallel. Returns the number of videos that failed."""
+    os.makedirs(output_dir, exist_ok=True)
+    fetcher = create_fetcher(backend)
+
+    print(f"Fetching playlist metadata using {fetcher.name}...")
+    entries = [e for e in fetcher.playlist(playlist_url) if e and e.get("id")]
+    print(f"Found {len(entries)} videos")
+
+    manifest = load_manifest(output_dir)
+    to_fetch, to_rename, unchanged = plan_sync(entries, manifest, output_dir, force, max_age_days)
+    print(f"♻️ Unchanged: {unchanged}, moved: {len(to_rename)}, to fetch: {len(to_fetch)}")
 
-cmd = [
-    "yt-dlp",
-    "--dump-single-json",
-    "--flat-playlist",
-    PLAYLIST_URL
-]
+    # Two steps, so a file moving into a name another file is leaving never overwrites it
+    staged = []
+    for video_id, old_path, new_path in to_rename:
+        tmp = unique_tmp_path(new_path)
+        os.replace(old_path, tmp)
+        staged.append((video_id, tmp, new_path))
+    for video_id, tmp, new_path in staged:
+        os.replace(tmp, new_path)
+        manifest[video_id]["path"] = new_path
+        print(f"    Renamed → {new_path}")
 
-playlist_data = json.loads(subprocess.run(cmd, capture_output=True, text=True).stdout)
-entries = playlist_data.get("entries", [])
+    lock = threading.Lock()
+    failed = []
+    by_id = {entry["id"]: (index, entry) for index, entry in to_fetch}
 
-print(f"Found {len(entries)} videos")
+    def save(video_id, info, error):
+        index, entry = by_id[video_id]
+        if info is None:
+            with lock:
+                failed.append(video_id)
+                print(f"❌ [{index}] {WATCH_URL.format(video_id)}: {error}")
+            return
+        title = to_latin(info.get("title") or entry.get("title") or f"video_{video_id}")
+        description = to_latin(info.get("description") or "")
+        filepath = output_path(output_dir, index, title)
+        write_atomic(filepath, description)
+        with lock:
+            old_path = (manifest.get(video_id) or {}).get("path")
+            in_use = any(m.get("path") == old_path for v, m in manifest.items() if v != video_id)
+            if old_path and old_path != filepath and not in_use and os.path.exists(old_path):
+                os.remove(old_path)
+            manifest[video_id] = {
+                "index": index,
+                "title": info.get("title") or entry.get("title") or "",
+                "etag": entry_etag(entry),
+                "path": filepath,
+                "sha256": hashlib.sha256(description.encode("utf-8")).hexdigest(),
+                "fetched_at": int(time.time()),
+            }
+            print(f"[{index}] Saved → {filepath}")
 
-for i, entry in enumerate(entries, start=1):
-    video_url = f"https://www.youtube.com/watch?v={entry['id']}"
-    print(f"[{i}] Processing {video_url}")
+    def work(batch):
+        for video_id, info, error in fetcher.videos(batch):
+            save(video_id, info, error)
 
-    cmd = ["yt-dlp", "-j", video_url]
-    video_data = json.loads(subprocess.run(cmd, capture_output=True, text=True).stdout)
+    ids = [entry["id"] for _, entry in to_fetch]
+    workers = max(1, min(jobs, len(ids)))
+    # The API backend takes one video per task; the subprocess backend one batch per worker
+    batches = [[v] for v in ids] if isinstance(fetcher, ApiFetcher) else [ids[k::workers] for k in range(workers)]
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(work, batch) for batch in batches if batch]:
+                future.result()
+    finally:
+        save_manifest(output_dir, manifest)
 
-    title = cyr_to_lat(video_data.get("title", f"video_{entry['id']}"))
-    description = cyr_to_lat(video_data.get("description", ""))
+    listed = {entry["id"] for entry in entries}
+    gone = [v for v in manifest if v not in listed]
+    if gone:
+        print(f"ℹ️ {len(gone)} video(s) in the manifest are no longer in the playlist (files kept).")
+    return len(failed)
 
-    filename = sanitize_filename(f"{i:02d} - {title}")
-    filepath = os.path.join(OUTPUT_DIR, f"{filename}.txt")
+# ======================================================
+# CLI
+# ======================================================
 
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(description)
+def main():
+    parser = argparse.ArgumentParser(description="Save YouTube playlist descriptions as Uzbek Latin text files.")
+    parser.add_argument("--playlist", type=str, default=PLAYLIST_URL, help="Playlist URL")
+    parser.add_argument("--output-dir", type=str, default=OUTPUT_DIR, help=f"Output folder (default: {OUTPUT_DIR})")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help=f"Videos fetched in parallel (default: {DEFAULT_JOBS})")
+    parser.add_argument("--force", action="store_true", help="Refetch every video, ignoring the manifest")
+    parser.add_argument("--max-age", type=float, metavar="DAYS",
+                        help="Also refetch videos whose description was fetched more than DAYS ago")
+    parser.add_argument("--backend", choices=("auto", "api", "subprocess"), default="auto",
+                        help="yt_dlp Python API or yt-dlp executable (default: auto, API when installed)")
+    args = parser.parse_args()
 
-    print(f"    Saved → {filepath}")
+    try:
+        failed = sync_playlist(args.playlist, args.output_dir, jobs=args.jobs, force=args.force,
+                               max_age_days=args.max_age, backend=args.backend)
+    except (RuntimeError, subprocess.CalledProcessError) as e:
+        parser.exit(1, f"❌ {e}\n")
+    if failed:
+        print(f"⚠️ {failed} video(s) failed; run again to retry them.")
+    else:
+        print("✅ Done. All descriptions converted to Uzbek Latin.")
 
-print("✅ Done. All descriptions converted to Uzbek Latin.")
+if __name__ == "__main__":
+    main()